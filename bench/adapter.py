@@ -0,0 +1,270 @@
+"""
+Benchmarks for the LangChain adapter hot path.
+
+Measures, in isolation and end to end (against FakeQwenChatModel):
+- LangChainMessageSerializer.serialize_messages (cold and per-step with the system prompt cached)
+- fence stripping + json.loads, and the incremental streaming parser
+- schema-driven JSON repair (fix/repair.py), with the plan already compiled
+- Pydantic validation of the agent output
+- ChatLangchain.ainvoke (fix/chat.py: qwen3-coder profile, plain and streaming;
+  text strategy without repair)
+
+Reports per-call time, throughput and peak allocation (tracemalloc) for each
+output size. Save a run with --json and check later runs against it with
+--compare; the exit code is 1 when any case is slower than --max-regression.
+
+Usage:
+	python -m bench.adapter --sizes 500,5000,50000 --steps 30 --json bench.json
+	python -m bench.adapter --compare bench.json
+
+@file purpose: Catch performance regressions in the adapter layer
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from bench.fake_chat import FakeQwenChatModel, qwen_output
+from browser_use import Tools
+from browser_use.agent.message_manager.views import HistoryItem
+from browser_use.agent.prompts import SystemPrompt
+from browser_use.agent.views import AgentOutput
+from browser_use.llm.messages import UserMessage
+from fix.chat import ChatLangchain
+from fix.serializer import LangChainMessageSerializer
+from fix.profiles import ModelProfile, profile_for
+from fix.repair import repair_data
+from fix.streaming import IncrementalJSONParser
+
+
+# O modelo falso se chama 'fake-qwen': usa o perfil do Qwen3-Coder explicitamente
+QWEN_PROFILE = profile_for('qwen3-coder:30b')
+
+# O output_format e o system prompt que o Agent usa com as ações padrão
+AGENT_OUTPUT = AgentOutput.type_with_custom_actions(Tools().registry.create_action_model())
+SYSTEM_MESSAGE = SystemPrompt().system_message
+BENCH_TASK = 'Buy a white t-shirt on the Sylius shop at http://localhost:9990/en_US/ and finish the checkout.'
+
+
+@dataclass
+class BenchResult:
+	name: str
+	size: int
+	calls: int
+	mean_us: float
+	median_us: float
+	ops_per_sec: float
+	peak_kib: float
+
+
+def _agent_history(size: int, steps: int) -> str:
+	"""<agent_history> of ``steps`` finished steps, each with a memory of ~``size // 2`` characters."""
+	memory = ('The checkout form shows the Email, First name and Postcode fields. ' * (size // 120 + 1))[: size // 2]
+	items = [HistoryItem(step_number=0, action_results='Result\nNavigated to http://localhost:9990/en_US/')]
+	for number in range(1, steps + 1):
+		items.append(
+			HistoryItem(
+				step_number=number,
+				evaluation_previous_goal='Success - the previous field was filled.',
+				memory=memory,
+				next_goal="Fill the 'Postcode' field with the value '123456789'.",
+				action_results=f"Result\nTyped '123456789' into element {10 + number}.",
+			)
+		)
+	return '\n'.join(item.to_string() for item in items)
+
+
+def _state_text(size: int, step: int, history: str) -> str:
+	"""State message as AgentMessagePrompt builds it, with ~``size`` characters of interactive elements."""
+	line = f'[{step}]<input type=text placeholder=Postcode /> '
+	elements = (line * (size // len(line) + 1))[:size]
+	return (
+		f'<agent_history>\n{history}\n</agent_history>\n\n'
+		'<agent_state>\n'
+		f'<user_request>\n{BENCH_TASK}\n</user_request>\n'
+		f'<step_info>Step{step + 1} maximum:100\nToday:2026-10-17</step_info>\n'
+		'</agent_state>\n'
+		'<browser_state>\n'
+		'Current tab: 8A1F\n'
+		'Available tabs:\n'
+		'Tab 8A1F: http://localhost:9990/en_US/checkout/address - Sylius\n\n'
+		'Interactive elements:\n'
+		f'[Start of page]\n{elements}\n[End of page]\n'
+		'</browser_state>\n'
+	)
+
+
+def build_history(size: int, steps: int) -> list:
+	"""[system, state] as the Agent sends them at step ``steps``: the past steps live in <agent_history>."""
+	return [SYSTEM_MESSAGE, UserMessage(content=_state_text(size, steps, _agent_history(size, steps)))]
+
+
+def measure(name: str, size: int, fn: Callable[[], Any], min_time: float = 0.2, repeat: int = 5) -> BenchResult:
+	"""Time ``fn`` (sync or async) like timeit.autorange, then record peak allocation of one call."""
+	is_async = inspect.iscoroutinefunction(fn)
+	loop = asyncio.new_event_loop()
+
+	def run(number: int) -> float:
+		if is_async:
+
+			async def batch() -> None:
+				for _ in range(number):
+					await fn()
+
+			started = time.perf_counter()
+			loop.run_until_complete(batch())
+		else:
+			started = time.perf_counter()
+			for _ in range(number):
+				fn()
+		return time.perf_counter() - started
+
+	number = 1
+	while (elapsed := run(number)) < min_time / repeat:
+		number *= 2 if elapsed == 0 else max(2, int(min_time / repeat / elapsed))
+	per_call = [run(number) / number for _ in range(repeat)]
+
+	tracemalloc.start()
+	run(1)
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	loop.close()
+
+	mean = statistics.fmean(per_call)
+	return BenchResult(
+		name=name,
+		size=size,
+		calls=number * repeat,
+		mean_us=mean * 1e6,
+		median_us=statistics.median(per_call) * 1e6,
+		ops_per_sec=1 / mean if mean else float('inf'),
+		peak_kib=peak / 1024,
+	)
+
+
+def bench_size(size: int, steps: int) -> list[BenchResult]:
+	results = []
+	history = build_history(size, steps)
+	raw = qwen_output(size)
+	content = raw.replace('```json', '').replace('```', '').strip()
+	parsed = json.loads(content)
+	qwen = ChatLangchain(chat=FakeQwenChatModel(responses=[raw]), profile=QWEN_PROFILE)
+	fixed = repair_data(parsed, AGENT_OUTPUT)
+
+	def serialize_cold() -> None:
+		LangChainMessageSerializer.clear_cache()
+		LangChainMessageSerializer.serialize_messages(history)
+
+	results.append(measure('serialize_messages[cold]', size, serialize_cold))
+
+	# Uma mensagem de estado nova por passo; só o system prompt sai do cache
+	past = _agent_history(size, steps)
+	states = [UserMessage(content=_state_text(size, i, past)) for i in range(steps)]
+	state_index = 0
+
+	def serialize_step() -> None:
+		nonlocal state_index
+		state_index = (state_index + 1) % len(states)
+		LangChainMessageSerializer.serialize_messages([SYSTEM_MESSAGE, states[state_index]])
+
+	LangChainMessageSerializer.clear_cache()
+	results.append(measure('serialize_messages[step]', size, serialize_step))
+
+	results.append(measure('strip_fences+json.loads', size, lambda: json.loads(raw.replace('```json', '').replace('```', '').strip())))
+	# O reparo é feito no lugar: mede o parse + reparo sobre o texto original
+	results.append(measure('json.loads+repair_data', size, lambda: repair_data(json.loads(content), AGENT_OUTPUT)))
+
+	chunks = [raw[i : i + 16] for i in range(0, len(raw), 16)]
+
+	def streaming_parse() -> None:
+		parser = IncrementalJSONParser()
+		for chunk in chunks:
+			if (text := parser.feed(chunk)) is not None:
+				repair_data(json.loads(text), AGENT_OUTPUT)
+				return
+
+	results.append(measure('streaming_parser+repairs', size, streaming_parse))
+	results.append(measure('pydantic_validate', size, lambda: AGENT_OUTPUT.model_validate(fixed)))
+
+	messages = history
+	qwen_stream = ChatLangchain(chat=FakeQwenChatModel(responses=[raw]), profile=QWEN_PROFILE, stream=True)
+	# Perfil sem reparo: exige as chaves já corretas
+	clean = qwen_output(size, qwen_keys=False)
+	generic = ChatLangchain(
+		chat=FakeQwenChatModel(responses=[clean]),
+		profile=ModelProfile(name='bench-plain', structured_output='text', repair=False),
+	)
+
+	async def ainvoke_qwen() -> None:
+		await qwen.ainvoke(messages, AGENT_OUTPUT)
+
+	async def ainvoke_qwen_stream() -> None:
+		await qwen_stream.ainvoke(messages, AGENT_OUTPUT)
+
+	async def ainvoke_generic() -> None:
+		await generic.ainvoke(messages, AGENT_OUTPUT)
+
+	results.append(measure(f'chat.ainvoke[{QWEN_PROFILE.name}]', size, ainvoke_qwen))
+	results.append(measure(f'chat.ainvoke[{QWEN_PROFILE.name},stream]', size, ainvoke_qwen_stream))
+	results.append(measure('chat.ainvoke[text]', size, ainvoke_generic))
+	return results
+
+
+def print_results(results: list[BenchResult], baseline: dict[tuple[str, int], float] | None = None) -> None:
+	header = f'{"CASE":<34} {"SIZE":>7} {"MEAN µs":>11} {"MEDIAN µs":>11} {"OPS/S":>10} {"PEAK KiB":>9}'
+	if baseline is not None:
+		header += f' {"VS BASE":>8}'
+	print(header)
+	print('-' * len(header))
+	for r in results:
+		line = f'{r.name:<34} {r.size:>7} {r.mean_us:>11.1f} {r.median_us:>11.1f} {r.ops_per_sec:>10.0f} {r.peak_kib:>9.1f}'
+		if baseline is not None:
+			base = baseline.get((r.name, r.size))
+			line += f' {r.median_us / base:>7.2f}x' if base else f' {"-":>8}'
+		print(line)
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--sizes', default='500,5000,50000', help='Comma-separated output/message sizes in characters')
+	parser.add_argument('--steps', type=int, default=30, help='Agent steps in the simulated history')
+	parser.add_argument('--json', help='Write results to this JSON file')
+	parser.add_argument('--compare', help='Baseline JSON from a previous --json run')
+	parser.add_argument('--max-regression', type=float, default=1.25, help='Allowed median slowdown vs baseline')
+	args = parser.parse_args()
+
+	results: list[BenchResult] = []
+	for size in (int(s) for s in args.sizes.split(',')):
+		results.extend(bench_size(size, args.steps))
+
+	baseline = None
+	if args.compare:
+		with open(args.compare, encoding='utf-8') as f:
+			baseline = {(r['name'], r['size']): r['median_us'] for r in json.load(f)}
+
+	print_results(results, baseline)
+
+	if args.json:
+		with open(args.json, 'w', encoding='utf-8') as f:
+			json.dump([asdict(r) for r in results], f, indent=2)
+
+	if baseline is not None:
+		regressions = [
+			r for r in results if (base := baseline.get((r.name, r.size))) and r.median_us > base * args.max_regression
+		]
+		for r in regressions:
+			print(f'❌ regression: {r.name}[{r.size}] {r.median_us:.1f}µs vs {baseline[(r.name, r.size)]:.1f}µs', file=sys.stderr)
+		return 1 if regressions else 0
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
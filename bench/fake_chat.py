@@ -0,0 +1,87 @@
+"""
+Fake LangChain chat model returning canned Qwen-style outputs.
+
+Used by the benchmarks to exercise the ChatLangchain adapter without an
+inference server. Outputs mimic qwen3-coder: JSON wrapped in ```json fences,
+with the 'element'/'value' keys that fix.repair.repair_data renames.
+"""
+
+import asyncio
+import json
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel  # pyright: ignore
+from langchain_core.messages import AIMessage, AIMessageChunk  # pyright: ignore
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # pyright: ignore
+from pydantic import PrivateAttr
+
+
+def qwen_output(size: int = 1000, actions: int = 1, qwen_keys: bool = True) -> str:
+	"""Build a fenced agent-output JSON whose free-text fields total roughly ``size`` characters.
+
+	With ``qwen_keys`` the actions use 'element'/'value' (needs repair); otherwise 'index'/'text'.
+	"""
+	index_key, text_key = ('element', 'value') if qwen_keys else ('index', 'text')
+	filler = ('The checkout form shows the Email, First name and Postcode fields. ' * (size // 60 + 1))[:size]
+	data = {
+		'thinking': filler[: size // 2],
+		'evaluation_previous_goal': 'Success - the previous field was filled.',
+		'memory': filler[size // 2 :],
+		'next_goal': "Fill the 'Postcode' field with the value '123456789'.",
+		'action': [{'input': {index_key: 10 + i, text_key: '123456789'}} for i in range(actions)],
+	}
+	return '```json\n' + json.dumps(data, ensure_ascii=False, indent=2) + '\n```'
+
+
+class FakeQwenChatModel(BaseChatModel):
+	"""Cycles through ``responses``; streams them in ``chunk_size`` pieces (then a usage chunk) after ``latency`` seconds."""
+
+	responses: list[str]
+	model_name: str = 'fake-qwen'
+	chunk_size: int = 16
+	latency: float = 0.0
+	_index: int = PrivateAttr(default=0)
+
+	@property
+	def _llm_type(self) -> str:
+		return 'fake-qwen'
+
+	def _next_response(self) -> str:
+		text = self.responses[self._index % len(self.responses)]
+		self._index += 1
+		return text
+
+	def _usage(self, messages: list, text: str) -> dict[str, int]:
+		prompt = sum(len(str(m.content)) for m in messages) // 4
+		completion = len(text) // 4
+		return {'input_tokens': prompt, 'output_tokens': completion, 'total_tokens': prompt + completion}
+
+	def _generate(self, messages: list, stop: list[str] | None = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+		text = self._next_response()
+		message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+		return ChatResult(generations=[ChatGeneration(message=message)])
+
+	async def _agenerate(
+		self, messages: list, stop: list[str] | None = None, run_manager: Any = None, **kwargs: Any
+	) -> ChatResult:
+		if self.latency:
+			await asyncio.sleep(self.latency)
+		return self._generate(messages, stop, run_manager, **kwargs)
+
+	def _stream(
+		self, messages: list, stop: list[str] | None = None, run_manager: Any = None, **kwargs: Any
+	) -> Iterator[ChatGenerationChunk]:
+		text = self._next_response()
+		for i in range(0, len(text), self.chunk_size):
+			yield ChatGenerationChunk(message=AIMessageChunk(content=text[i : i + self.chunk_size]))
+		# Last chunk carries only the usage, like an OpenAI server with stream_options.include_usage
+		yield ChatGenerationChunk(message=AIMessageChunk(content='', usage_metadata=self._usage(messages, text)))
+
+	async def _astream(
+		self, messages: list, stop: list[str] | None = None, run_manager: Any = None, **kwargs: Any
+	) -> AsyncIterator[ChatGenerationChunk]:
+		if self.latency:
+			await asyncio.sleep(self.latency)
+		for chunk in self._stream(messages, stop, run_manager, **kwargs):
+			yield chunk
@@ -0,0 +1,351 @@
+"""
+Fake OpenAI-compatible inference server and static mock shop for offline load tests.
+
+One process, one port, standard library only:
+- ``POST /v1/chat/completions`` (plain and ``stream: true`` SSE, with
+  ``stream_options.include_usage``) replays recorded model outputs with a
+  simulated server: ``--slots`` parallel sequences (llama.cpp ``--parallel``),
+  time to first token, prompt processing and generation rates
+- ``GET /v1/models``, ``/health`` and ``/stats`` (request counts, queue peak)
+- every other GET serves the static Sylius stand-in in ``bench/mock_shop``
+  (home -> T-shirts/women -> product -> cart -> address -> shipping ->
+  payment -> order summary with the values SYLIUS_PURCHASE_ASSERTIONS expect)
+
+Recorded outputs (``--replay``, repeatable):
+- a trace file from LLM_TRACE_PATH (.jsonl or .jsonl.gz): the ``raw`` field
+  of each ``llm`` record
+- a response cache directory (LLM_CACHE_DIR): the ``completion`` of each entry
+- any other file: its whole text is one response
+Without ``--replay`` a synthetic qwen3-coder output is used. Requests that
+carry the agent's ``<step_info>`` get the recorded output of the same step,
+so concurrent agents each replay the run in order; ``--done-after N`` answers
+with a ``done`` action from step N on, so every scenario terminates.
+
+Usage:
+	python -m bench.fake_server --port 9990 --replay .llm_traces/run.jsonl.gz --ttft 0.2 --tps 60 --slots 8
+	BASE_URL=http://localhost:9990/v1 API_KEY=fake python runner.py --workers 16 --llm-concurrency 16
+
+@file purpose: Measure adapter and runner throughput without a GPU server or Sylius
+"""
+
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import mimetypes
+import random
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote, urlsplit
+
+SHOP_DIR = Path(__file__).parent / 'mock_shop'
+# Aproximação usada em todo o repo (fix/history.py): ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+_STEP = re.compile(r'<step_info>Step(\d+)')
+
+
+def _text(content: Any) -> str:
+	if isinstance(content, str):
+		return content
+	if isinstance(content, list):
+		return ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+	return ''
+
+
+def _tokens(text: str) -> int:
+	return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def load_responses(paths: list[str]) -> list[str]:
+	"""Recorded model outputs from trace files, response cache directories or plain text files."""
+	responses: list[str] = []
+	for source in map(Path, paths):
+		if source.is_dir():
+			for file in sorted(source.glob('*.json')):
+				completion = json.loads(file.read_text(encoding='utf-8')).get('completion')
+				if completion is not None:
+					responses.append(completion if isinstance(completion, str) else json.dumps(completion, ensure_ascii=False))
+		elif source.name.endswith(('.jsonl', '.jsonl.gz')):
+			opener = gzip.open if source.suffix == '.gz' else open
+			with opener(source, 'rt', encoding='utf-8') as f:
+				for line in f:
+					record = json.loads(line)
+					if record.get('kind') == 'llm' and record.get('raw'):
+						responses.append(record['raw'])
+		else:
+			responses.append(source.read_text(encoding='utf-8'))
+	if paths and not responses:
+		raise ValueError(f'No recorded responses found in {", ".join(paths)}')
+	return responses
+
+
+def done_output(text: str = 'Finished (fake inference server).') -> str:
+	"""A qwen3-coder style agent output that ends the run."""
+	data = {
+		'thinking': 'The task is complete.',
+		'evaluation_previous_goal': 'Success',
+		'memory': 'All steps were executed.',
+		'next_goal': 'Finish the task.',
+		'action': [{'done': {'text': text, 'success': True}}],
+	}
+	return '```json\n' + json.dumps(data, indent=2) + '\n```'
+
+
+@dataclass
+class ServerStats:
+	requests: int = 0
+	streamed: int = 0
+	injected_errors: int = 0
+	prompt_tokens: int = 0
+	completion_tokens: int = 0
+	in_flight: int = 0
+	peak_in_flight: int = 0
+	queued: int = 0
+	peak_queued: int = 0
+	static_requests: int = 0
+
+
+class FakeInferenceServer:
+	"""
+	Simulated inference server. Each request waits for one of ``slots``,
+	then takes ``ttft + prompt_tokens / prompt_tps`` before the first token and
+	``completion_tokens / tps`` to generate; streamed responses are paced chunk
+	by chunk. ``error_rate`` answers that share of requests with a 503 (as
+	llama-swap does while swapping models) to exercise retries.
+	"""
+
+	def __init__(
+		self,
+		responses: list[str],
+		ttft: float = 0.0,
+		prompt_tps: float = 0.0,
+		tps: float = 0.0,
+		slots: int = 4,
+		chunk_tokens: int = 4,
+		jitter: float = 0.0,
+		done_after: int | None = None,
+		error_rate: float = 0.0,
+		shop_dir: Path = SHOP_DIR,
+		seed: int | None = None,
+	):
+		if not responses:
+			raise ValueError('FakeInferenceServer requires at least one response')
+		self.responses = responses
+		self.ttft = ttft
+		self.prompt_tps = prompt_tps
+		self.tps = tps
+		self.slots = slots
+		self.chunk_tokens = chunk_tokens
+		self.jitter = jitter
+		self.done_after = done_after
+		self.error_rate = error_rate
+		self.shop_dir = shop_dir.resolve()
+		self.stats = ServerStats()
+		self._random = random.Random(seed)
+		self._round_robin = itertools.count()
+		self._semaphore: asyncio.Semaphore | None = None
+
+	def pick_response(self, messages: list[dict[str, Any]]) -> str:
+		last_user = next((_text(m.get('content')) for m in reversed(messages) if m.get('role') == 'user'), '')
+		match = _STEP.search(last_user)
+		if match is None:
+			return self.responses[next(self._round_robin) % len(self.responses)]
+		step = int(match.group(1))
+		if self.done_after is not None and step >= self.done_after:
+			return done_output()
+		return self.responses[(step - 1) % len(self.responses)]
+
+	def _scaled(self, seconds: float) -> float:
+		if self.jitter and seconds:
+			seconds *= self._random.uniform(1 - self.jitter, 1 + self.jitter)
+		return seconds
+
+	def _prefill_time(self, prompt_tokens: int) -> float:
+		return self._scaled(self.ttft + (prompt_tokens / self.prompt_tps if self.prompt_tps else 0.0))
+
+	def _decode_time(self, tokens: int) -> float:
+		return self._scaled(tokens / self.tps) if self.tps else 0.0
+
+	async def serve(self, host: str, port: int) -> None:
+		self._semaphore = asyncio.Semaphore(self.slots)
+		server = await asyncio.start_server(self._handle, host, port, limit=64 * 1024 * 1024)
+		print(f'🧪 Fake inference server + mock shop on http://{host}:{port} ({len(self.responses)} response(s), {self.slots} slot(s))')
+		async with server:
+			await server.serve_forever()
+
+	async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		try:
+			while request_line := await reader.readline():
+				method, target, _ = request_line.decode('latin-1').split(' ', 2)
+				headers: dict[str, str] = {}
+				while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+					name, _, value = line.decode('latin-1').partition(':')
+					headers[name.strip().lower()] = value.strip()
+				body = await reader.readexactly(int(headers.get('content-length') or 0))
+				path = unquote(urlsplit(target).path)
+
+				if method == 'POST' and path.endswith('/chat/completions'):
+					await self._chat_completions(writer, json.loads(body or b'{}'))
+				elif method == 'GET' and path.endswith('/models'):
+					self._send_json(writer, 200, {'object': 'list', 'data': [{'id': 'fake', 'object': 'model', 'owned_by': 'fake'}]})
+				elif method == 'GET' and path == '/health':
+					self._send_json(writer, 200, {'status': 'ok'})
+				elif method == 'GET' and path == '/stats':
+					self._send_json(writer, 200, asdict(self.stats))
+				elif method in ('GET', 'HEAD'):
+					self._static(writer, path, head=method == 'HEAD')
+				else:
+					self._send_json(writer, 404, {'error': {'message': f'{method} {path} not found'}})
+				await writer.drain()
+				if headers.get('connection', '').lower() == 'close':
+					break
+		except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+			pass
+		finally:
+			writer.close()
+
+	def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str, head: bool = False) -> None:
+		writer.write(
+			f'HTTP/1.1 {status} {"OK" if status < 400 else "Error"}\r\n'
+			f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n'.encode()
+		)
+		if not head:
+			writer.write(body)
+
+	def _send_json(self, writer: asyncio.StreamWriter, status: int, data: dict[str, Any]) -> None:
+		self._send(writer, status, json.dumps(data, ensure_ascii=False).encode(), 'application/json')
+
+	def _static(self, writer: asyncio.StreamWriter, path: str, head: bool) -> None:
+		self.stats.static_requests += 1
+		file = (self.shop_dir / path.lstrip('/')).resolve()
+		if file.is_dir():
+			file = file / 'index.html'
+		if not file.is_relative_to(self.shop_dir) or not file.is_file():
+			self._send(writer, 404, b'<h1>404 Not Found</h1>', 'text/html; charset=utf-8', head)
+			return
+		content_type = mimetypes.guess_type(file.name)[0] or 'application/octet-stream'
+		if content_type.startswith('text/'):
+			content_type += '; charset=utf-8'
+		self._send(writer, 200, file.read_bytes(), content_type, head)
+
+	async def _chat_completions(self, writer: asyncio.StreamWriter, payload: dict[str, Any]) -> None:
+		messages = payload.get('messages', [])
+		model = payload.get('model', 'fake')
+		text = self.pick_response(messages)
+		prompt_tokens = _tokens(''.join(_text(m.get('content')) for m in messages))
+		completion_tokens = _tokens(text)
+		stats = self.stats
+		stats.requests += 1
+
+		if self.error_rate and self._random.random() < self.error_rate:
+			stats.injected_errors += 1
+			self._send_json(writer, 503, {'error': {'message': 'Loading model', 'type': 'unavailable_error', 'code': 503}})
+			return
+
+		assert self._semaphore is not None
+		stats.queued += 1
+		stats.peak_queued = max(stats.peak_queued, stats.queued)
+		async with self._semaphore:
+			stats.queued -= 1
+			stats.in_flight += 1
+			stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+			try:
+				await asyncio.sleep(self._prefill_time(prompt_tokens))
+				usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens}
+				response_id = f'chatcmpl-{uuid.uuid4().hex[:24]}'
+				if payload.get('stream'):
+					stats.streamed += 1
+					include_usage = bool((payload.get('stream_options') or {}).get('include_usage'))
+					await self._stream(writer, response_id, model, text, usage if include_usage else None)
+				else:
+					await asyncio.sleep(self._decode_time(completion_tokens))
+					self._send_json(writer, 200, {
+						'id': response_id,
+						'object': 'chat.completion',
+						'created': int(time.time()),
+						'model': model,
+						'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+						'usage': usage,
+					})
+				stats.prompt_tokens += prompt_tokens
+				stats.completion_tokens += completion_tokens
+			finally:
+				stats.in_flight -= 1
+
+	async def _stream(
+		self, writer: asyncio.StreamWriter, response_id: str, model: str, text: str, usage: dict[str, int] | None
+	) -> None:
+		writer.write(
+			b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+			b'Cache-Control: no-cache\r\nTransfer-Encoding: chunked\r\n\r\n'
+		)
+		created = int(time.time())
+
+		def event(choices: list[dict[str, Any]], **extra: Any) -> None:
+			data = {'id': response_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model, 'choices': choices, **extra}
+			payload = f'data: {json.dumps(data, ensure_ascii=False)}\n\n'.encode()
+			writer.write(f'{len(payload):x}\r\n'.encode() + payload + b'\r\n')
+
+		step = self.chunk_tokens * CHARS_PER_TOKEN
+		for i in range(0, len(text), step):
+			delta = {'role': 'assistant', 'content': text[i : i + step]} if i == 0 else {'content': text[i : i + step]}
+			event([{'index': 0, 'delta': delta, 'finish_reason': None}])
+			await writer.drain()
+			await asyncio.sleep(self._decode_time(self.chunk_tokens))
+		event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+		if usage is not None:
+			event([], usage=usage)
+		done = b'data: [DONE]\n\n'
+		writer.write(f'{len(done):x}\r\n'.encode() + done + b'\r\n0\r\n\r\n')
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=9990, help='Port (default: the Sylius port used by the tasks)')
+	parser.add_argument('--replay', action='append', default=[], metavar='PATH', help='Trace file, cache directory or text file')
+	parser.add_argument('--slots', type=int, default=4, help='Parallel sequences; extra requests queue')
+	parser.add_argument('--ttft', type=float, default=0.0, help='Fixed time to first token, in seconds')
+	parser.add_argument('--prompt-tps', type=float, default=0.0, help='Prompt processing rate, tokens/s (0 = instant)')
+	parser.add_argument('--tps', type=float, default=0.0, help='Generation rate per sequence, tokens/s (0 = instant)')
+	parser.add_argument('--chunk-tokens', type=int, default=4, help='Tokens per streamed chunk')
+	parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- fraction applied to every delay')
+	parser.add_argument('--done-after', type=int, help='Answer with a done action from this agent step on')
+	parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+	parser.add_argument('--shop', default=str(SHOP_DIR), help='Static site directory')
+	parser.add_argument('--seed', type=int, help='Seed for jitter and injected errors')
+	args = parser.parse_args()
+
+	if args.replay:
+		responses = load_responses(args.replay)
+	else:
+		from bench.fake_chat import qwen_output
+
+		responses = [qwen_output(800)]
+
+	server = FakeInferenceServer(
+		responses,
+		ttft=args.ttft,
+		prompt_tps=args.prompt_tps,
+		tps=args.tps,
+		slots=args.slots,
+		chunk_tokens=args.chunk_tokens,
+		jitter=args.jitter,
+		done_after=args.done_after,
+		error_rate=args.error_rate,
+		shop_dir=Path(args.shop),
+		seed=args.seed,
+	)
+	try:
+		asyncio.run(server.serve(args.host, args.port))
+	except KeyboardInterrupt:
+		print(json.dumps(asdict(server.stats)))
+
+
+if __name__ == '__main__':
+	main()
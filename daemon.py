@@ -0,0 +1,187 @@
+"""
+Warm daemon for browser-use scenarios.
+
+``serve`` builds the LLM client (with its keep-alive HTTP connections) and
+launches a pool of browser sessions once, then runs the scenarios it receives
+over a local Unix socket. Each CI iteration only pays for the scenario itself:
+no interpreter start-up, no browser-use/LangChain imports, no browser launch.
+
+The client commands import nothing but the standard library.
+
+Usage:
+	python daemon.py serve --workers 2 &
+	python daemon.py run --scenarios scenarios/ --output results.json
+	python daemon.py run --task "Go to http://localhost:9990/en_US/ and ..."
+	python daemon.py stop
+
+Protocol: one JSON object per line in each direction.
+- {"op": "run", "scenarios": [{"name", "task", ...runner.Scenario fields}]}
+  or {"op": "run", "source": "<scenario file or directory>"}
+  -> {"ok": true, "results": [runner.ScenarioResult fields, ...]}
+- {"op": "ping"} -> {"ok": true}
+- {"op": "stop"} -> {"ok": true}, then the daemon exits
+Errors come back as {"ok": false, "error": "..."}.
+
+@file purpose: Keep the browser and LLM client resident between scenario runs
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+DEFAULT_SOCKET = os.getenv('BROWSER_DAEMON_SOCKET', os.path.join(tempfile.gettempdir(), 'browser-use-daemon.sock'))
+
+
+async def serve(socket_path: str, workers: int, llm_concurrency: int, headless: bool, plans_dir: str | None) -> None:
+	# Imports pesados só no processo residente
+	from dataclasses import asdict
+
+	from exec_openai import build_llm, build_router
+	from fix.plan import ActionPlanStore
+	from runner import BrowserPool, ConcurrencyLimitedChat, load_scenarios, run_scenario, scenario_from_dict
+
+	chat = build_llm()
+	if chat.pool is not None:
+		chat.pool.start_health_checks()
+	llm = ConcurrencyLimitedChat(llm=build_router(chat) or chat, semaphore=asyncio.Semaphore(llm_concurrency))
+	pool = BrowserPool(size=workers, headless=headless)
+	plans = ActionPlanStore(plans_dir) if plans_dir else None
+
+	started = time.perf_counter()
+	await pool.warm()
+	print(f'🔥 {workers} browser(s) ready in {time.perf_counter() - started:.1f}s, listening on {socket_path}')
+
+	stop = asyncio.Event()
+
+	async def handle_request(request: dict[str, Any]) -> dict[str, Any]:
+		op = request.get('op')
+		if op == 'ping':
+			return {'ok': True}
+		if op == 'stop':
+			stop.set()
+			return {'ok': True}
+		if op != 'run':
+			return {'ok': False, 'error': f'unknown op: {op!r}'}
+
+		if 'source' in request:
+			scenarios = load_scenarios(request['source'])
+		else:
+			scenarios = [scenario_from_dict(item, f'task-{i + 1}') for i, item in enumerate(request['scenarios'])]
+		results = await asyncio.gather(*(run_scenario(s, llm, pool, plans, chat.trace, chat.dom_diff) for s in scenarios))
+		if chat.metrics is not None:
+			chat.metrics.flush()
+		return {'ok': True, 'results': [asdict(r) for r in results]}
+
+	async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		try:
+			while line := await reader.readline():
+				try:
+					response = await handle_request(json.loads(line))
+				except Exception as e:
+					response = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+				writer.write(json.dumps(response, ensure_ascii=False).encode() + b'\n')
+				await writer.drain()
+		finally:
+			writer.close()
+
+	if os.path.exists(socket_path):
+		os.unlink(socket_path)
+	server = await asyncio.start_unix_server(handle, path=socket_path, limit=16 * 1024 * 1024)
+	try:
+		await stop.wait()
+	finally:
+		server.close()
+		await pool.close()
+		if chat.pool is not None:
+			chat.pool.stop_health_checks()
+		if chat.batching is not None:
+			await chat.batching.aclose()
+		if chat.trace is not None:
+			chat.trace.close()
+		if chat.metrics is not None:
+			chat.metrics.close()
+		if os.path.exists(socket_path):
+			os.unlink(socket_path)
+
+
+def request(socket_path: str, payload: dict[str, Any]) -> dict[str, Any]:
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+		sock.connect(socket_path)
+		sock.sendall(json.dumps(payload, ensure_ascii=False).encode() + b'\n')
+		with sock.makefile('rb') as stream:
+			line = stream.readline()
+	if not line:
+		raise ConnectionError('daemon closed the connection')
+	return json.loads(line)
+
+
+def print_results(results: list[dict[str, Any]], wall_time: float) -> None:
+	for r in results:
+		status = '✅' if r['success'] else '❌'
+		print(f'{status} {r["name"]} ({r["steps"]} steps, {r["duration"]:.1f}s)' + (f' {r["error"]}' if r['error'] else ''))
+		if r['final_result']:
+			print(r['final_result'])
+	passed = sum(1 for r in results if r['success'])
+	print(f'{passed}/{len(results)} passed | wall {wall_time:.1f}s')
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket path')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	serve_parser = commands.add_parser('serve', help='Start the resident daemon')
+	serve_parser.add_argument('--workers', type=int, default=1, help='Browser sessions kept open')
+	serve_parser.add_argument('--llm-concurrency', type=int, default=2, help='Max in-flight LLM calls')
+	serve_parser.add_argument('--headful', action='store_true', help='Show browser windows')
+	serve_parser.add_argument('--fast-path', metavar='DIR', help='Replay learned action plans from DIR')
+
+	run_parser = commands.add_parser('run', help='Run scenarios on the daemon')
+	source = run_parser.add_mutually_exclusive_group(required=True)
+	source.add_argument('--scenarios', help='Scenario file or directory (read by the daemon)')
+	source.add_argument('--task', help='Task text to run as a single scenario')
+	run_parser.add_argument('--output', help='Write results as JSON to this path')
+
+	commands.add_parser('ping', help='Check that the daemon is up')
+	commands.add_parser('stop', help='Shut the daemon down')
+	args = parser.parse_args()
+
+	if args.command == 'serve':
+		asyncio.run(serve(args.socket, args.workers, args.llm_concurrency, not args.headful, args.fast_path))
+		return
+
+	if args.command == 'run':
+		if args.scenarios:
+			payload: dict[str, Any] = {'op': 'run', 'source': str(Path(args.scenarios).resolve())}
+		else:
+			payload = {'op': 'run', 'scenarios': [{'name': 'task', 'task': args.task}]}
+	else:
+		payload = {'op': args.command}
+
+	started = time.perf_counter()
+	try:
+		response = request(args.socket, payload)
+	except (FileNotFoundError, ConnectionRefusedError):
+		print(f'❌ No daemon listening on {args.socket} (start it with: python daemon.py serve)', file=sys.stderr)
+		sys.exit(2)
+	if not response.get('ok'):
+		print(f'❌ {response.get("error")}', file=sys.stderr)
+		sys.exit(1)
+
+	if args.command == 'run':
+		print_results(response['results'], time.perf_counter() - started)
+		if args.output:
+			Path(args.output).write_text(json.dumps(response['results'], indent=2, ensure_ascii=False), encoding='utf-8')
+		sys.exit(0 if all(r['success'] for r in response['results']) else 1)
+	print('✅ ok')
+
+
+if __name__ == '__main__':
+	main()
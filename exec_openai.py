@@ -10,42 +10,94 @@ This example demonstrates how to:
 """
 
 import asyncio
+import dataclasses
 import os
 
-from langchain_openai import ChatOpenAI  # pyright: ignore
-
-from browser_use import Agent
-from fix.chat_qwen import ChatLangchain
+from fix.assertions import MONEY_PATTERN, INTEGER_PATTERN, Assertion, evaluate_all, format_report, page_text
+from fix.batching import BatchScheduler
+from fix.cache import ResponseCache
+from fix.dom_diff import StateDiff
+from fix.chat import ChatLangchain
+from fix.history import HistoryWindow
+from fix.metrics import ChatMetrics
+from fix.plan import ActionPlanStore, FastPathChat, task_key
+from fix.pool import build_openai_pool
+from fix.prefetch import StatePrefetcher
+from fix.profiles import profile_for
+from fix.retry import RetryPolicy
+from fix.routing import ModelRouter
+from fix.trace import TraceWriter, current_run
+from fix.vision import VisionBudget
 
 API_KEY = os.getenv("API_KEY", "")
 
 BASE_URL = os.getenv("BASE_URL", "")
-# BASE_URL = os.getenv("BASE_URL_SECUNDARIO", "")
+# Servidor secundário opcional: com ele, as chamadas são balanceadas entre os dois
+BASE_URL_SECUNDARIO = os.getenv("BASE_URL_SECUNDARIO", "")
+
+# Cache de respostas do LLM (vazio = desativado); modos: readwrite, record, replay
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "readwrite")
+
+# Janela de micro-batching entre agentes concorrentes, em ms (vazio = desativado)
+LLM_BATCH_WINDOW_MS = os.getenv("LLM_BATCH_WINDOW_MS", "")
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "8"))
+
+# Passos do histórico enviados na íntegra (os mais antigos viram resumos) e orçamento
+# de tokens do prompt; vazio = histórico completo
+LLM_HISTORY_STEPS = os.getenv("LLM_HISTORY_STEPS", "")
+LLM_HISTORY_MAX_TOKENS = os.getenv("LLM_HISTORY_MAX_TOKENS", "")
+
+# Prompt de sistema normalizado + dicas de cache de prefixo (cache_prompt) ao servidor
+LLM_STABLE_PREFIX = os.getenv("LLM_STABLE_PREFIX", "") == "1"
+# Move a tarefa para logo após o prompt de sistema (muda o layout do prompt do browser-use)
+LLM_HOIST_TASK = os.getenv("LLM_HOIST_TASK", "") == "1"
+
+# Envia só os elementos da página que mudaram desde a referência (fix/dom_diff.py)
+LLM_DOM_DIFF = os.getenv("LLM_DOM_DIFF", "") == "1"
+
+# Diretório para métricas das chamadas (calls.jsonl + metrics.prom); vazio = desativado
+LLM_METRICS_DIR = os.getenv("LLM_METRICS_DIR", "")
+
+# Tentativas por chamada em erros transitórios (padrão 0 = desativa retry, timeout e re-prompt)
+# e timeout por chamada em segundos (a troca de modelo no llama-swap pode levar minutos)
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "0"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "300"))
+
+# Trace JSONL das chamadas e passos (.gz = comprimido); vazio = desativado
+LLM_TRACE_PATH = os.getenv("LLM_TRACE_PATH", "")
+# Inclui no trace as mensagens enviadas ao modelo (bem maior)
+LLM_TRACE_PROMPTS = os.getenv("LLM_TRACE_PROMPTS", "") == "1"
 
 
 MODELO = 'qwen3-coder:30b'
 # MODELO = 'Qwen3-Coder-30B-A3B'
 # MODELO = 'Qwen3-VL-32B'
+MODELO_SECUNDARIO = os.getenv("MODELO_SECUNDARIO", MODELO)
 
-async def main():
-	"""Basic example using ChatLangchain with OpenAI through LangChain."""
+# Modelo pequeno para os passos simples (vazio = desativado); o MODELO assume nas
+# escaladas: saída inválida, baixa confiança e relatório final (fix/routing.py)
+MODELO_PEQUENO = os.getenv("MODELO_PEQUENO", "")
+BASE_URL_PEQUENO = os.getenv("BASE_URL_PEQUENO", "")
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6"))
+# Structured output, reparo, visão e limites de tokens do modelo (fix/profiles.py)
+PERFIL = profile_for(MODELO)
+MAX_TOKENS = PERFIL.max_output_tokens or 4096
 
-	langchain_model = ChatOpenAI(
-		base_url=BASE_URL,
-        model=MODELO,
-        api_key=API_KEY,
-		temperature=0.0,
-		max_tokens=4096,
-	)
+# Screenshots para modelos de visão (ex: Qwen3-VL-32B), com janela e recompressão;
+# vazio = o que o perfil do modelo indica
+USE_VISION = os.getenv("USE_VISION", "1" if PERFIL.vision else "") == "1"
 
-	llm = ChatLangchain(chat=langchain_model)
+# Planos de ação aprendidos: passos roteirizados são repetidos sem LLM; vazio = desativado
+FAST_PATH_DIR = os.getenv("FAST_PATH_DIR", "")
 
-	# task = "Acesse 'http://localhost:9990/en_US/', acesse opção de 'T-shirts' e acesse as opções disponíveis para  'women'"
+# Captura o estado do próximo passo em paralelo com o fim do passo atual (fix/prefetch.py)
+PREFETCH_STATE = os.getenv("PREFETCH_STATE", "") == "1"
 
-	# task = "Go to google.com and search for 'browser automation with Python'"
+# Avalia os critérios de aceite localmente (sem o relatório gerado pelo LLM)
+LOCAL_ASSERTIONS = os.getenv("LOCAL_ASSERTIONS", "") == "1"
 
-
-	task = """
+TASK = """
 		Context: You are a Senior QA Engineer executing an automated regression test on the Sylius application.
         Start URL: http://localhost:9990/en_US/
 
@@ -176,18 +228,192 @@ async def main():
         6. {MSG_RESULT} (In case of failure): It is MANDATORY to show the real value. Ex: "ERROR: Exp '$479.68' | Actual '$0.00' (or 'Not found')".
 	"""
 
+# Só os passos de execução do TASK; usado quando os critérios são avaliados localmente
+EXECUTION_TASK = TASK.split('Acceptance Criteria')[0] + """
+        After the last step, as soon as the order summary page is displayed, finish with done.
+        Do NOT extract or verify any value: the acceptance criteria are checked automatically.
+"""
+
+ADDRESS = ['browser use', 'browser.use', 'browser.use, 123456789', 'AUSTRALIA']
+
+# Critérios de aceite do TASK em formato estruturado (ver fix/assertions.py)
+SYLIUS_PURCHASE_ASSERTIONS = [
+	Assertion('BILLING_ADDRESS', 'Billing address', ADDRESS, match='contains', field='Billing address'),
+	Assertion('SHIPPING_ADDRESS', 'Shipping address', ADDRESS, match='contains', field='Shipping address'),
+	Assertion('ITEM', 'Item name', 'Everyday white basic T-Shirt', match='contains', field='Item'),
+	Assertion('ITEM', 'Item size', 'M', field='Everyday white basic T-Shirt', pattern=r'\b(?:XS|S|M|L|XL|XXL)\b'),
+	# Colunas da tabela de itens: o valor é lido na coluna do cabeçalho, não pela posição na página
+	Assertion('UNIT_PRICE', 'Unit price', '$94.60', field='Unit price', pattern=MONEY_PATTERN, layout='column'),
+	Assertion('QUANTITY', 'Qty', '5', field='Qty', pattern=INTEGER_PATTERN, layout='column'),
+	Assertion('SUBTOTAL', 'Subtotal', '$473.00', field='Subtotal', pattern=MONEY_PATTERN, layout='column'),
+	# Totais e pagamento: o valor vem logo após o rótulo
+	Assertion('SHIPPING_TOTAL', 'Shipping total', '$3.44', field='Shipping total:', pattern=MONEY_PATTERN, layout='next'),
+	Assertion('TAXES_TOTAL', 'Taxes total', '$0.00', field='Taxes total:', pattern=MONEY_PATTERN, layout='next'),
+	Assertion('DISCOUNT', 'Discount', '$0.00', field='Discount:', pattern=MONEY_PATTERN, layout='next'),
+	Assertion('TOTAL_FINAL', 'Total', '$476.44', field='Total:', pattern=MONEY_PATTERN, layout='next'),
+	Assertion('CASH_DELIVERY', 'Cash on delivery', '$476.44', field='Cash on delivery', pattern=MONEY_PATTERN, layout='next'),
+]
+
+
+def build_llm() -> ChatLangchain:
+	"""Build the ChatLangchain adapter pointed at the configured inference server."""
+	# Importado aqui: langchain_openai é pesado e só é preciso ao criar o cliente
+	from langchain_openai import ChatOpenAI  # pyright: ignore
+
+	pool = None
+	if BASE_URL_SECUNDARIO:
+		pool = build_openai_pool(
+			[(BASE_URL, MODELO), (BASE_URL_SECUNDARIO, MODELO_SECUNDARIO)],
+			api_key=API_KEY,
+			temperature=0.0,
+			max_tokens=MAX_TOKENS,
+		)
+		langchain_model = pool.endpoints[0].chat
+	else:
+		langchain_model = ChatOpenAI(
+			base_url=BASE_URL,
+			model=MODELO,
+			api_key=API_KEY,
+			temperature=0.0,
+			max_tokens=MAX_TOKENS,
+		)
+
+	cache = ResponseCache(LLM_CACHE_DIR, mode=LLM_CACHE_MODE) if LLM_CACHE_DIR else None
+
+	metrics = None
+	if LLM_METRICS_DIR:
+		os.makedirs(LLM_METRICS_DIR, exist_ok=True)
+		metrics = ChatMetrics(
+			jsonl_path=os.path.join(LLM_METRICS_DIR, 'calls.jsonl'),
+			prometheus_path=os.path.join(LLM_METRICS_DIR, 'metrics.prom'),
+		)
+
+	batching = None
+	if LLM_BATCH_WINDOW_MS:
+		batching = BatchScheduler(
+			pool if pool is not None else langchain_model,
+			window=float(LLM_BATCH_WINDOW_MS) / 1000,
+			max_batch_size=LLM_BATCH_SIZE,
+		)
+
+	history_window = None
+	if LLM_HISTORY_STEPS or LLM_HISTORY_MAX_TOKENS:
+		history_window = HistoryWindow(
+			keep_steps=int(LLM_HISTORY_STEPS or 6),
+			max_tokens=int(LLM_HISTORY_MAX_TOKENS) if LLM_HISTORY_MAX_TOKENS else None,
+		)
+
+	return ChatLangchain(
+		chat=langchain_model,
+		cache=cache,
+		metrics=metrics,
+		vision_budget=VisionBudget() if USE_VISION else None,
+		history_window=history_window,
+		dom_diff=StateDiff() if LLM_DOM_DIFF else None,
+		trace=TraceWriter(LLM_TRACE_PATH, include_prompts=LLM_TRACE_PROMPTS) if LLM_TRACE_PATH else None,
+		retry=RetryPolicy(max_attempts=LLM_MAX_ATTEMPTS, timeout=LLM_TIMEOUT or None) if LLM_MAX_ATTEMPTS > 0 else None,
+		stable_prefix=LLM_STABLE_PREFIX,
+		hoist_task=LLM_HOIST_TASK,
+		pool=pool,
+		batching=batching,
+	)
+
+
+def build_router(chat: ChatLangchain) -> ModelRouter | None:
+	"""Wrap ``chat`` (the large model) in a ModelRouter when MODELO_PEQUENO is set."""
+	if not MODELO_PEQUENO:
+		return None
+	from langchain_openai import ChatOpenAI  # pyright: ignore
+
+	small_model = ChatOpenAI(
+		base_url=BASE_URL_PEQUENO or BASE_URL,
+		model=MODELO_PEQUENO,
+		api_key=API_KEY,
+		temperature=0.0,
+		max_tokens=profile_for(MODELO_PEQUENO).max_output_tokens or 4096,
+	)
+	# Mesmo cache, métricas, trace e janelas; sem re-prompt: a escalada corrige a saída
+	small = dataclasses.replace(
+		chat,
+		chat=small_model,
+		profile=None,
+		pool=None,
+		batching=None,
+		retry=RetryPolicy(max_attempts=LLM_MAX_ATTEMPTS, timeout=LLM_TIMEOUT or None, reprompt_attempts=0) if LLM_MAX_ATTEMPTS > 0 else None,
+	)
+	return ModelRouter(small=small, large=chat, min_confidence=ROUTER_MIN_CONFIDENCE, metrics=chat.metrics)
+
+
+async def main():
+	"""Basic example using ChatLangchain with OpenAI through LangChain."""
+	from browser_use import Agent
+
+	llm = build_llm()
+	router = build_router(llm)
+
+	# task = "Acesse 'http://localhost:9990/en_US/', acesse opção de 'T-shirts' e acesse as opções disponíveis para  'women'"
+
+	# task = "Go to google.com and search for 'browser automation with Python'"
+
+
+	task = EXECUTION_TASK if LOCAL_ASSERTIONS else TASK
+
+	step_llm = router or llm
+	agent_llm = FastPathChat(llm=step_llm, store=ActionPlanStore(FAST_PATH_DIR), task=task) if FAST_PATH_DIR else step_llm
+
 	agent = Agent(
 		task=task,
-		llm=llm,
-		use_vision=False,
+		llm=agent_llm,
+		use_vision=USE_VISION,
 	)
+	if isinstance(agent_llm, FastPathChat):
+		agent_llm.attach(agent)
+	prefetcher = StatePrefetcher() if PREFETCH_STATE else None
+	if prefetcher is not None:
+		prefetcher.attach(agent)
 
 	print(f'🚀 Starting task: {task}')
 	print(f'🤖 Using model: {llm.name} (provider: {llm.provider})')
 
-	history = await agent.run()
+	last_page_text = None
+	current_run.set(task_key(task))
+
+	async def on_step_end(agent: Agent) -> None:
+		nonlocal last_page_text
+		if llm.trace is not None:
+			await llm.trace.record_step(agent)
+		if LOCAL_ASSERTIONS:
+			last_page_text = await page_text(agent.browser_session) or last_page_text
+
+	try:
+		history = await agent.run(on_step_end=on_step_end if LOCAL_ASSERTIONS or llm.trace is not None else None)
+	finally:
+		if prefetcher is not None:
+			prefetcher.detach()
+		if llm.trace is not None:
+			llm.trace.close()
+		if llm.metrics is not None:
+			llm.metrics.close()
 
 	print(f'✅ Task completed! Steps taken: {len(history.history)}')
+	if prefetcher is not None:
+		stats = prefetcher.stats()
+		print(f'🔮 Prefetch: {stats["hits"]} state(s) ready early, {stats["overlap_seconds"]:.1f}s overlapped')
+	if router is not None:
+		stats = router.stats()
+		print(
+			f'🔀 Routing: {stats["small"]} step(s) on {MODELO_PEQUENO}, {stats["large"]} on {MODELO} '
+			f'({stats["escalation_rate"]:.0%} escalated: {stats["escalations"]}), {stats["mean_step_seconds"]:.1f}s/step'
+		)
+
+	if isinstance(agent_llm, FastPathChat):
+		print(f'⚡ Fast path: {agent_llm.replayed} step(s) replayed, {agent_llm.fallbacks} fallback(s) to the LLM')
+		if history.is_successful():
+			agent_llm.save_plan()
+
+	if LOCAL_ASSERTIONS:
+		results = evaluate_all(SYLIUS_PURCHASE_ASSERTIONS, last_page_text or '')
+		print(format_report(results, 'SYLIUS E-COMMERCE', 'Purchase Flow (End-to-End)'))
 
 	if history.final_result():
 		print(f'📋 Final result: {history.final_result()}')
@@ -0,0 +1,222 @@
+import re
+import unicodedata
+from collections.abc import Collection
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Literal
+
+Matcher = Literal['exact', 'normalized', 'contains']
+Layout = Literal['after', 'next', 'column']
+
+# Valor numérico/monetário (ex: "$476.44", "5", "1,234.00") e preço com centavos
+VALUE_PATTERN = r'[-+]?(?:R\$|[$€£])?\s?\d(?:[\d.,]*\d)?'
+MONEY_PATTERN = r'(?:R\$|[$€£])\s?\d[\d,]*\.\d{2}'
+# Inteiro isolado (não faz parte de um preço)
+INTEGER_PATTERN = r'(?<![\d.,$€£])\b\d+\b(?![.,]\d)'
+
+_INVISIBLE = re.compile('[\u200b-\u200f\u2060\ufeff\u00ad]')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text: str) -> str:
+    """REGRA 1/3: ignora espaços extras, quebras de linha, caixa e caracteres invisíveis."""
+    text = _INVISIBLE.sub('', unicodedata.normalize('NFKC', text))
+    return _SPACES.sub(' ', text).strip().casefold()
+
+
+@dataclass
+class Assertion:
+    """
+    Um critério de aceite avaliado localmente sobre o texto da página.
+
+    - exact: o ``occurrence``-ésimo valor (VALUE_PATTERN ou ``pattern``) após
+      ``field`` deve ser exatamente ``expected`` (REGRA 2: preços/números)
+    - normalized: o texto após ``field`` (até o fim da linha) deve começar com
+      ``expected``, comparando normalizado
+    - contains: cada item de ``expected`` deve aparecer no texto normalizado
+      (no bloco após ``field``, se informado: até a próxima linha em branco
+      ou o rótulo de outra seção)
+
+    ``layout`` diz onde fica o valor de um ``exact`` em relação ao rótulo:
+    - after: o ``occurrence``-ésimo valor em qualquer lugar depois do rótulo
+    - next: o valor logo após o rótulo, só com espaços e ':' entre eles
+      ("Shipping total: $3.44"), sem depender do que vem antes ou depois
+    - column: o rótulo é o cabeçalho de uma coluna de tabela (o innerText
+      separa as células com tab) e o valor está na célula da mesma coluna da
+      linha seguinte, qualquer que seja a ordem das colunas
+    """
+    id: str
+    name: str
+    expected: str | list[str]
+    match: Matcher = 'exact'
+    field: str | None = None
+    pattern: str | None = None
+    occurrence: int = 1
+    layout: Layout = 'after'
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> 'Assertion':
+        return cls(**data)
+
+
+@dataclass
+class AssertionResult:
+    assertion: Assertion
+    passed: bool
+    actual: str | None
+    message: str
+
+
+def _label(field: str) -> str:
+    return re.escape(field).replace(r'\ ', r'\s+')
+
+
+def _starts_field(text: str, start: int) -> bool:
+    """
+    O rótulo começa uma linha ou célula (tab), ou vem depois de um valor na mesma
+    linha ("Discount: $0.00 Total: $476.44"); nunca depois de uma palavra, senão
+    seria o fim de outro rótulo (ex: 'Total:' em 'Shipping total:' ou 'Subtotal:').
+    """
+    before = text[:start].rsplit('\n', 1)[-1]
+    if not before.strip() or before.endswith('\t'):
+        return True
+    if not before[-1].isspace():
+        return False
+    return not before.rstrip()[-1].isalpha()
+
+
+def _after_field(text: str, field: str | None) -> str | None:
+    """Texto após a primeira ocorrência do rótulo que começa um campo (ver ``_starts_field``)."""
+    if field is None:
+        return text
+    for match in re.finditer(_label(field), text, re.IGNORECASE):
+        if _starts_field(text, match.start()):
+            return text[match.end():]
+    return None
+
+
+def _field_block(section: str, headings: Collection[str]) -> str:
+    """
+    Conteúdo do campo: do primeiro texto após o rótulo até a próxima linha em
+    branco ou o próximo rótulo de seção em linha própria (ex: o bloco "Billing
+    address" termina em "Shipping address", não no fim da página).
+    """
+    stops = {normalize(heading) for heading in headings}
+    lines = []
+    for line in section.lstrip(' :\t\n').split('\n'):
+        if not line.strip() or normalize(line) in stops:
+            break
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _column_cell(text: str, field: str) -> str | None:
+    """Célula abaixo do cabeçalho ``field``; células com quebra de linha ocupam várias linhas do innerText."""
+    lines = text.split('\n')
+    for i, line in enumerate(lines):
+        header = [cell.strip() for cell in line.split('\t')]
+        column = next((j for j, cell in enumerate(header) if re.fullmatch(_label(field), cell, re.IGNORECASE)), None)
+        if column is None or len(header) < 2:
+            continue
+        row = ''
+        for following in lines[i + 1:]:
+            row = f'{row}\n{following}' if row else following
+            if row.count('\t') >= len(header) - 1:
+                return row.split('\t')[column]
+        return None
+    return None
+
+
+def _exact_value(assertion: Assertion, page_text: str, section: str) -> str | None:
+    pattern = assertion.pattern or VALUE_PATTERN
+    if assertion.layout == 'next':
+        match = re.match(rf'[\s:]*({pattern})', section)
+        return match.group(1) if match else None
+    if assertion.layout == 'column' and assertion.field is not None:
+        cell = _column_cell(page_text, assertion.field)
+        if cell is None:
+            return None
+        section = cell
+    values = re.findall(pattern, section)
+    return values[assertion.occurrence - 1] if len(values) >= assertion.occurrence else None
+
+
+def evaluate(assertion: Assertion, page_text: str, headings: Collection[str] = ()) -> AssertionResult:
+    """
+    Avalia um critério sobre o texto da página. ``headings`` são os rótulos das
+    outras seções (ver ``evaluate_all``), que encerram o bloco de um ``contains``.
+    """
+    expected = assertion.expected
+    section = _after_field(page_text, assertion.field)
+    if section is None:
+        return AssertionResult(assertion, False, None, f"ERROR: Exp '{expected}' | Actual 'Not found' (field '{assertion.field}')")
+
+    if assertion.match == 'exact':
+        actual = _exact_value(assertion, page_text, section)
+        if actual is not None:
+            actual = actual.replace(' ', '')
+        passed = actual is not None and _INVISIBLE.sub('', actual) == str(expected)
+    elif assertion.match == 'normalized':
+        line = section.lstrip(' :\t').split('\n', 1)[0]
+        if not line.strip():
+            line = section.strip().split('\n', 1)[0]
+        actual = line.strip()
+        passed = normalize(actual).startswith(normalize(str(expected)))
+    else:
+        if assertion.field is not None:
+            section = _field_block(section, [h for h in headings if normalize(h) != normalize(assertion.field)])
+        haystack = normalize(section)
+        items = [expected] if isinstance(expected, str) else expected
+        missing = [item for item in items if normalize(item) not in haystack]
+        actual = 'all found' if not missing else 'missing ' + ', '.join(f"'{item}'" for item in missing)
+        passed = not missing
+
+    if passed:
+        return AssertionResult(assertion, True, actual, f"OK: '{expected}'" if assertion.match != 'contains' else 'OK: Text found')
+    if assertion.match == 'contains':
+        return AssertionResult(assertion, False, actual, f'ERROR: Text not found ({actual})')
+    return AssertionResult(assertion, False, actual, f"ERROR: Exp '{expected}' | Actual '{actual or 'Not found'}'")
+
+
+def evaluate_all(assertions: list[Assertion], page_text: str) -> list[AssertionResult]:
+    # Os rótulos dos ``contains`` são cabeçalhos de seção: um encerra o bloco do anterior
+    headings = [a.field for a in assertions if a.match == 'contains' and a.field is not None]
+    return [evaluate(a, page_text, headings) for a in assertions]
+
+
+def format_report(results: list[AssertionResult], title: str, scenario: str) -> str:
+    """Mesmo template de console que o prompt pede ao LLM."""
+    line = '-' * 80
+    double = '=' * 80
+    rows = [
+        '📋 EXECUTION DETAILS (ASSERTIONS):',
+        line,
+        '[STATUS] | ID  | OBJECT/ACTION             | DIAGNOSTIC (EXPECTED vs ACTUAL)',
+        line,
+    ]
+    for i, result in enumerate(results, start=1):
+        status = '✅' if result.passed else '❌'
+        rows.append(f'[{status}]  | {i:02d}  | {result.assertion.name[:25]:<25} | {result.message}')
+    rows.append(line)
+
+    approved = all(r.passed for r in results)
+    rows += [
+        '',
+        double,
+        f'🚀 AUTOMATED EXECUTION REPORT: {title}',
+        double,
+        f'📅 DATE: {datetime.now():%Y-%m-%d %H:%M:%S}',
+        f'🎯 SCENARIO: {scenario}',
+        f'🏁 FINAL STATUS: [ {"APPROVED ✅" if approved else "FAILED ❌"} ]',
+        double,
+    ]
+    return '\n'.join(rows)
+
+
+async def page_text(browser_session: Any) -> str | None:
+    """innerText da aba atual do navegador, ou None se não for possível obtê-lo."""
+    try:
+        page = await browser_session.get_current_page()
+        return await page.evaluate('() => document.body.innerText')
+    except Exception:
+        return None
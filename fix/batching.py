@@ -0,0 +1,163 @@
+import asyncio
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class _Request:
+    target: Any
+    messages: list
+    kwargs: dict[str, Any]
+    future: asyncio.Future
+
+
+@dataclass
+class BatchScheduler:
+    """
+    Micro-batching das chamadas de vários agentes concorrentes.
+
+    As requisições que chegam dentro de ``window`` segundos (até
+    ``max_batch_size``) são enviadas juntas com o ``abatch`` do LangChain;
+    cada chamador espera apenas o seu future. Requisições com kwargs
+    diferentes vão em lotes separados. ``max_pending`` limita quantas
+    requisições podem estar enfileiradas ou em andamento: acima disso,
+    ``ainvoke`` espera (backpressure) em vez de acumular trabalho no servidor.
+
+    ``target`` é o modelo LangChain ou um EndpointPool; sem ``abatch``, o lote
+    é enviado com chamadas ``ainvoke`` simultâneas. Streaming não é agrupado.
+    ``with_structured_output`` cria o runnable no ``target`` e agrupa as
+    chamadas dele em lotes próprios, na mesma fila.
+    """
+    target: Any
+    window: float = 0.01
+    max_batch_size: int = 8
+    max_pending: int = 64
+    batches: int = 0
+    requests: int = 0
+    largest_batch: int = 0
+    _queue: asyncio.Queue | None = field(default=None, repr=False)
+    _slots: asyncio.Semaphore | None = field(default=None, repr=False)
+    _worker: asyncio.Task | None = field(default=None, repr=False)
+    _loop: asyncio.AbstractEventLoop | None = field(default=None, repr=False)
+    _dispatching: set[asyncio.Task] = field(default_factory=set, repr=False)
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Fila e semáforo ficam presos ao event loop em que foram criados
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    async def ainvoke(self, messages: list, **kwargs: Any) -> Any:
+        return await self._submit(self.target, messages, kwargs)
+
+    def with_structured_output(self, *args: Any, **kwargs: Any) -> '_BatchRunnable':
+        return _BatchRunnable(self, self.target.with_structured_output(*args, **kwargs))
+
+    async def _submit(self, target: Any, messages: list, kwargs: dict[str, Any]) -> Any:
+        self._ensure_started()
+        assert self._queue is not None and self._slots is not None
+        async with self._slots:
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait(_Request(target, messages, kwargs, future))
+            return await future
+
+    async def astream(self, messages: list, **kwargs: Any) -> AsyncIterator[Any]:
+        async for chunk in self.target.astream(messages, **kwargs):
+            yield chunk
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            try:
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # aclose() durante a coleta: o lote parcial ainda é enviado
+                self._schedule(batch)
+                raise
+            self._schedule(batch)
+
+    def _schedule(self, batch: list[_Request]) -> None:
+        groups: dict[tuple[int, str], list[_Request]] = {}
+        for request in batch:
+            if not request.future.done():
+                key = (id(request.target), repr(sorted(request.kwargs.items())))
+                groups.setdefault(key, []).append(request)
+        for group in groups.values():
+            # O envio roda em paralelo com a coleta do próximo lote
+            task = asyncio.get_running_loop().create_task(self._dispatch(group))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, group: list[_Request]) -> None:
+        self.batches += 1
+        self.requests += len(group)
+        self.largest_batch = max(self.largest_batch, len(group))
+
+        target, kwargs = group[0].target, group[0].kwargs
+        abatch = getattr(target, 'abatch', None)
+        try:
+            if abatch is not None and len(group) > 1:
+                results = await abatch([r.messages for r in group], return_exceptions=True, **kwargs)
+            else:
+                results = await asyncio.gather(
+                    *(target.ainvoke(r.messages, **kwargs) for r in group), return_exceptions=True
+                )
+        except Exception as e:
+            results = [e] * len(group)
+
+        for request, result in zip(group, results):
+            if request.future.done():
+                continue
+            if isinstance(result, BaseException):
+                request.future.set_exception(result)
+            else:
+                request.future.set_result(result)
+
+    async def aclose(self) -> None:
+        """Para a coleta, envia o que ainda está na fila e espera todos os lotes."""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._queue is not None:
+            pending = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            for start in range(0, len(pending), self.max_batch_size):
+                self._schedule(pending[start : start + self.max_batch_size])
+        if self._dispatching:
+            await asyncio.gather(*self._dispatching, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+        }
+
+
+@dataclass
+class _BatchRunnable:
+    """Runnable do ``target`` (ex: with_structured_output) cujas chamadas passam pelo scheduler."""
+    scheduler: BatchScheduler
+    runnable: Any
+
+    async def ainvoke(self, messages: list, **kwargs: Any) -> Any:
+        return await self.scheduler._submit(self.runnable, messages, kwargs)
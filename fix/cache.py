@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Literal
+
+from pydantic import BaseModel
+
+from browser_use.llm.exceptions import ModelProviderError
+from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+
+CacheMode = Literal['readwrite', 'record', 'replay']
+
+# Campos voláteis da mensagem de estado do browser-use: a data de hoje em
+# <step_info> e os ids de aba do CDP (últimos 4 caracteres do target_id, novos
+# a cada sessão). Sem normalizar, um replay em outro dia ou outro navegador
+# nunca acerta o cache.
+_TODAY = re.compile(r'(?<=Today:)\d{4}-\d{2}-\d{2}')
+_TAB_ID = re.compile(r'^(?:Current tab:|Tab) (\w{4})\b', re.MULTILINE)
+
+
+@lru_cache(maxsize=64)
+def _schema_fingerprint(output_format: type[BaseModel] | None) -> str:
+    """Schema JSON do output_format; calculado uma vez por classe."""
+    if output_format is None:
+        return ''
+    return json.dumps(output_format.model_json_schema(), sort_keys=True)
+
+
+def _stable_text(text: str, tab_ids: dict[str, str]) -> str:
+    text = _TODAY.sub('<today>', text)
+    # Os ids viram <tab1>, <tab2>... na ordem em que aparecem; a mesma troca vale
+    # para as outras menções (ex.: 'Switched to tab #8A1F' no histórico).
+    for tab_id in _TAB_ID.findall(text):
+        tab_ids.setdefault(tab_id, f'<tab{len(tab_ids) + 1}>')
+    if tab_ids:
+        pattern = r'\b(' + '|'.join(map(re.escape, tab_ids)) + r')\b'
+        text = re.sub(pattern, lambda match: tab_ids[match.group(1)], text)
+    return text
+
+
+def _stable_content(content: Any, tab_ids: dict[str, str]) -> Any:
+    if isinstance(content, str):
+        return _stable_text(content, tab_ids)
+    if isinstance(content, list):
+        return [
+            {**part, 'text': _stable_text(part['text'], tab_ids)}
+            if isinstance(part, dict) and part.get('type') == 'text'
+            else part
+            for part in content
+        ]
+    return content
+
+
+class ResponseCache:
+    """
+    Cache em disco (record/replay) das respostas do ChatLangchain.
+
+    Chave: sha256 de modelo + schema do output_format + mensagens serializadas,
+    com a data e os ids de aba normalizados.
+    Cada entrada é um arquivo JSON; a remoção segue LRU por número de entradas
+    e tamanho total. Modos:
+    - readwrite: usa o cache e grava as respostas novas
+    - record: sempre chama o modelo e sobrescreve a entrada
+    - replay: nunca chama o modelo; ausência no cache é erro (CI sem servidor)
+    """
+
+    def __init__(
+        self,
+        path: str | Path = '.llm_cache',
+        mode: CacheMode = 'readwrite',
+        max_entries: int = 10_000,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        if mode not in ('readwrite', 'record', 'replay'):
+            raise ValueError(f'Invalid cache mode: {mode}')
+        self.path = Path(path)
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        # key -> (último acesso, tamanho em bytes)
+        self._index: dict[str, tuple[float, int]] = {}
+        for file in self.path.glob('*.json'):
+            stat = file.stat()
+            self._index[file.stem] = (stat.st_mtime, stat.st_size)
+        self._total_bytes = sum(size for _, size in self._index.values())
+
+    def key(self, model: str, langchain_messages: list, output_format: type[BaseModel] | None) -> str:
+        digest = hashlib.sha256()
+        digest.update(model.encode())
+        digest.update(b'\0')
+        digest.update(_schema_fingerprint(output_format).encode())
+        tab_ids: dict[str, str] = {}
+        for message in langchain_messages:
+            content = _stable_content(message.content, tab_ids)
+            digest.update(b'\0')
+            digest.update(json.dumps([message.type, message.name, content], ensure_ascii=False).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str, output_format: type[BaseModel] | None) -> ChatInvokeCompletion | None:
+        if self.mode == 'record':
+            return None
+
+        file = self.path / f'{key}.json'
+        try:
+            entry = json.loads(file.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            if self.mode == 'replay':
+                raise ModelProviderError(f'Replay cache miss for key {key}', model=None)
+            return None
+
+        self.hits += 1
+        now = time.time()
+        os.utime(file, (now, now))
+        self._index[key] = (now, self._index.get(key, (now, file.stat().st_size))[1])
+
+        completion = entry['completion']
+        if output_format is not None:
+            completion = output_format.model_validate(completion)
+        usage = ChatInvokeUsage(**entry['usage']) if entry.get('usage') else None
+        return ChatInvokeCompletion(completion=completion, usage=usage)
+
+    def put(self, key: str, result: ChatInvokeCompletion) -> None:
+        if self.mode == 'replay':
+            return
+
+        completion = result.completion
+        if isinstance(completion, BaseModel):
+            completion = completion.model_dump(mode='json', exclude_unset=True)
+        entry = {
+            'completion': completion,
+            'usage': result.usage.model_dump() if result.usage else None,
+        }
+        data = json.dumps(entry, ensure_ascii=False).encode()
+
+        # Escrita atômica: vários processos do runner podem compartilhar o diretório
+        file = self.path / f'{key}.json'
+        tmp = file.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, file)
+
+        _, old_size = self._index.get(key, (0.0, 0))
+        self._total_bytes += len(data) - old_size
+        self._index[key] = (time.time(), len(data))
+        self._evict()
+
+    def _evict(self) -> None:
+        if len(self._index) <= self.max_entries and self._total_bytes <= self.max_bytes:
+            return
+        for key, (_, size) in sorted(self._index.items(), key=lambda item: item[1][0]):
+            if len(self._index) <= self.max_entries and self._total_bytes <= self.max_bytes:
+                break
+            (self.path / f'{key}.json').unlink(missing_ok=True)
+            del self._index[key]
+            self._total_bytes -= size
+
+    def lookup(self, model: str, langchain_messages: list, output_format: type[BaseModel] | None) -> tuple[str, Any]:
+        """Atalho para o ChatLangchain: retorna (chave, resposta em cache ou None)."""
+        key = self.key(model, langchain_messages, output_format)
+        return key, self.get(key, output_format)
@@ -1,5 +1,9 @@
-from dataclasses import dataclass
-from typing import TYPE_CHECKING, TypeVar, Any
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, TypeVar
 
 from pydantic import BaseModel
 
@@ -8,7 +12,24 @@ from browser_use.llm.exceptions import ModelProviderError
 from browser_use.llm.messages import BaseMessage
 from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
 
+from fix.batching import BatchScheduler
+from fix.cache import ResponseCache
+from fix.dom_diff import StateDiff
+from fix.history import HistoryWindow
+from fix.metrics import ChatMetrics
+from fix.pool import EndpointPool
+from fix.profiles import (
+    STRUCTURED_OUTPUT_STRATEGIES,
+    ModelProfile,
+    StructuredOutputStrategy,
+    profile_for,
+)
+from fix.repair import OutputValidationError, repair_data, repair_json_text
+from fix.retry import CircuitOpenError, RetryPolicy, find_cause, is_transient, reprompt_messages
 from fix.serializer import LangChainMessageSerializer
+from fix.streaming import IncrementalJSONParser
+from fix.trace import TraceWriter
+from fix.vision import VisionBudget
 
 if TYPE_CHECKING:
     from langchain_core.language_models.chat_models import BaseChatModel as LangChainBaseChatModel
@@ -16,13 +37,79 @@ if TYPE_CHECKING:
 
 T = TypeVar('T', bound=BaseModel)
 
+# Chunks lidos depois que o objeto JSON fechou, à espera do chunk de usage do fim do stream
+STREAM_USAGE_CHUNKS = 32
+
+# (provedor, modelo) -> estratégia que funcionou; compartilhado entre instâncias
+_strategy_by_model: dict[tuple[str, str], StructuredOutputStrategy] = {}
+
+# Recusa de tools/response_format pelo servidor: 400/404/422/501 citando o recurso
+UNSUPPORTED_STATUS_CODES = frozenset({400, 404, 422, 501})
+UNSUPPORTED_MARKERS = ('tool', 'function', 'response_format', 'json_object', 'json_schema', 'structured')
+
+
+def _is_unsupported(error: BaseException) -> bool:
+    """O servidor (ou o LangChain) não suporta a estratégia de structured output."""
+    if isinstance(error, NotImplementedError):
+        return True
+    status = getattr(error, 'status_code', None)
+    if status not in UNSUPPORTED_STATUS_CODES:
+        return False
+    message = str(error).lower()
+    return any(marker in message for marker in UNSUPPORTED_MARKERS)
+
+
 @dataclass
 class ChatLangchain(BaseChatModel):
     """
     Um wrapper (adaptador) em torno do LangChain BaseChatModel que implementa
     o protocolo BaseChatModel do browser-use.
+
+    O caminho de structured output, o reparo de JSON, o streaming e as dicas
+    de cache vêm do perfil do modelo (fix/profiles.py), escolhido pelo nome;
+    ``profile`` e ``structured_output`` sobrescrevem a escolha automática.
     """
     chat: 'LangChainBaseChatModel'
+    # Perfil do modelo; None = profile_for(name, provider)
+    profile: ModelProfile | None = None
+    # Força uma estratégia de structured output (sem detecção automática)
+    structured_output: StructuredOutputStrategy | None = None
+    # Cache em disco (record/replay) das respostas, opcional
+    cache: ResponseCache | None = None
+    # Latência, tokens e contadores de eventos, opcional
+    metrics: ChatMetrics | None = None
+    # Janela/recompressão de screenshots para modelos de visão, opcional
+    vision_budget: VisionBudget | None = None
+    # Janela de passos recentes + resumos dos antigos no <agent_history>, opcional
+    history_window: HistoryWindow | None = None
+    # Só os elementos alterados desde a referência da página no <browser_state>, opcional
+    dom_diff: StateDiff | None = None
+    # Usa astream e entrega a ação assim que o objeto JSON fecha (None = perfil)
+    stream: bool | None = None
+    # Mantém o prompt de sistema byte a byte idêntico entre chamadas (whitespace
+    # normalizado) e envia dicas de cache de prefixo ao servidor de inferência
+    stable_prefix: bool = False
+    # Move a tarefa (<user_request>) do estado do browser-use para logo após o
+    # prompt de sistema, entrando no prefixo reaproveitado pelo KV cache
+    hoist_task: bool = False
+    # Kwargs extras por chamada (sobrescreve as dicas padrão de stable_prefix)
+    prompt_cache_hints: dict[str, Any] | None = None
+    # Vários servidores/modelos com balanceamento e failover; ``chat`` continua
+    # definindo nome e provedor (use o modelo do endpoint principal)
+    pool: EndpointPool | None = None
+    # Agrupa chamadas concorrentes de vários agentes em lotes (abatch); o
+    # scheduler envolve o ``pool`` ou o ``chat``
+    batching: BatchScheduler | None = None
+    # Trace JSONL de cada chamada (saída bruta, JSON corrigido, ações), opcional
+    trace: TraceWriter | None = None
+    # Novas tentativas com backoff, timeout por chamada, disjuntor e re-prompt
+    # de saídas inválidas, opcional
+    retry: RetryPolicy | None = None
+    _structured_runnables: dict = field(default_factory=dict, repr=False, init=False)
+
+    def __post_init__(self) -> None:
+        if self.profile is None:
+            self.profile = profile_for(self.name, self.provider)
 
     @property
     def model(self) -> str:
@@ -49,16 +136,160 @@ class ChatLangchain(BaseChatModel):
             return str(model_attr)
         return self.chat.__class__.__name__
 
+    @property
+    def _prompt_budget(self) -> int | None:
+        """Tokens que cabem no prompt: o contexto do modelo menos a saída reservada (None = desconhecido)."""
+        if self.profile.context_tokens is None:
+            return None
+        return self.profile.context_tokens - (self.profile.max_output_tokens or 0)
+
+    @property
+    def _backend(self) -> Any:
+        """Destino das chamadas: o scheduler de lotes, o pool de endpoints ou o modelo único."""
+        if self.batching is not None:
+            return self.batching
+        return self.pool if self.pool is not None else self.chat
+
     def _get_usage(self, response: 'LangChainAIMessage') -> ChatInvokeUsage | None:
-        """Extrai metadados de uso de tokens."""
+        """
+        Extrai metadados de uso e preenche campos obrigatórios para evitar erros de validação.
+        """
         if not hasattr(response, 'usage_metadata') or response.usage_metadata is None:
-            return None
+            # Retorna um objeto zerado em vez de None, para segurança
+            return ChatInvokeUsage(
+                prompt_tokens=0,
+                completion_tokens=0,
+                total_tokens=0,
+                prompt_cached_tokens=0,
+                prompt_cache_creation_tokens=0,
+                prompt_image_tokens=0
+            )
             
         usage = response.usage_metadata
+        
+        # AQUI ESTÁ A CORREÇÃO DO SEU ERRO ATUAL:
+        # Adicionamos os campos *_tokens com valor 0, pois o llama-swap não os envia.
         return ChatInvokeUsage(
             prompt_tokens=usage.get('input_tokens', 0),
             completion_tokens=usage.get('output_tokens', 0),
             total_tokens=usage.get('total_tokens', 0),
+            prompt_cached_tokens=usage.get('prompt_cached_tokens', 0),
+            prompt_cache_creation_tokens=usage.get('prompt_cache_creation_tokens', 0),
+            prompt_image_tokens=usage.get('prompt_image_tokens', 0),
+        )
+
+    def _invoke_kwargs(self) -> dict[str, Any]:
+        """
+        Dicas de cache de prefixo: llama.cpp (e llama-swap, que repassa o corpo)
+        só reaproveita o KV cache entre requisições com ``cache_prompt``; vLLM e
+        Ollama fazem isso automaticamente quando o prefixo é idêntico.
+        """
+        if self.prompt_cache_hints is not None:
+            return self.prompt_cache_hints
+        if self.stable_prefix and self.provider == 'openai' and self.profile.cache_prompt:
+            return {'extra_body': {'cache_prompt': True}}
+        return {}
+
+    def _parse_output(
+        self,
+        content: str,
+        output_format: type[T],
+        raw: str,
+        details: dict[str, Any] | None = None,
+    ) -> T:
+        """
+        Faz o parse da saída do modelo e, se o perfil pede, aplica o reparo guiado
+        pelo schema do output_format (element->index, value->text, "5"->5, ...).
+        Só reconstrói o texto (vírgulas finais, saída truncada) se o json.loads falhar.
+        Se ``details`` for passado, recebe a saída bruta, o JSON corrigido e as
+        correções aplicadas (para o trace).
+        """
+        repairs: Counter[str] = Counter()
+        fixed_data = None
+        if details is not None:
+            details['raw'] = raw
+        try:
+            try:
+                data = json.loads(content)
+            except json.JSONDecodeError:
+                if not self.profile.repair:
+                    raise
+                data = json.loads(repair_json_text(content))
+                repairs['json-text'] += 1
+            fixed_data = repair_data(data, output_format, repairs) if self.profile.repair else data
+            return output_format(**fixed_data)
+        except json.JSONDecodeError as e:
+            raise OutputValidationError(f"Model output not valid JSON: {raw}", raw, f'invalid JSON ({e})', model=self.name)
+        except Exception as e:
+            raise OutputValidationError(
+                f"Validation Error. Raw: {raw} | Fixed: {fixed_data} | Error: {e}", raw, str(e), model=self.name
+            )
+        finally:
+            if self.metrics is not None and repairs:
+                self.metrics.count('json_repairs', self.name)
+            if details is not None:
+                details['fixed'] = fixed_data
+                if repairs:
+                    details['repairs'] = dict(repairs)
+
+    async def _ainvoke_streaming(
+        self,
+        langchain_messages: list,
+        output_format: type[T],
+        details: dict[str, Any] | None = None,
+    ) -> ChatInvokeCompletion[T]:
+        """
+        Consome o astream do LangChain e monta a ação assim que o objeto JSON
+        de nível superior fecha. O servidor manda o usage no último chunk, então
+        o resto do stream (só o fim da geração) é lido, até STREAM_USAGE_CHUNKS
+        chunks; sem usage, ``usage`` fica None e as métricas estimam os tokens.
+        """
+        parser = IncrementalJSONParser()
+        usage_chunk = None
+        object_text = None
+
+        kwargs = self._invoke_kwargs()
+        if self.provider == 'openai':
+            # Sem isso o ChatOpenAI não pede stream_options.include_usage ao servidor
+            kwargs = {**kwargs, 'stream_usage': True}
+        started = time.perf_counter()
+        ttft = None
+        stream = self._backend.astream(langchain_messages, **kwargs)
+        try:
+            async for chunk in stream:
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                if getattr(chunk, 'usage_metadata', None):
+                    usage_chunk = chunk
+                object_text = parser.feed(str(chunk.content))
+                if object_text is not None:
+                    break
+            if object_text is not None and usage_chunk is None:
+                extra = 0
+                async for chunk in stream:
+                    if getattr(chunk, 'usage_metadata', None):
+                        usage_chunk = chunk
+                        break
+                    extra += 1
+                    if extra >= STREAM_USAGE_CHUNKS:
+                        break
+        finally:
+            aclose = getattr(stream, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+        if self.metrics is not None and ttft is not None:
+            self.metrics.observe_ttft(self.name, ttft)
+        if details is not None and ttft is not None:
+            details['ttft'] = round(ttft, 4)
+
+        # Objeto não fechou (saída truncada): tenta reconstruir a partir do texto recebido
+        parsed_object = self._parse_output(
+            object_text if object_text is not None else parser.raw, output_format, parser.raw, details
+        )
+        return ChatInvokeCompletion(
+            completion=parsed_object,
+            usage=self._get_usage(usage_chunk) if usage_chunk is not None else None,
         )
 
     async def ainvoke(
@@ -68,50 +299,258 @@ class ChatLangchain(BaseChatModel):
         **kwargs: Any
     ) -> ChatInvokeCompletion[T] | ChatInvokeCompletion[str]:
         """
-        Invoca o modelo LangChain com as mensagens fornecidas.
+        Invoca o modelo LangChain com as mensagens fornecidas, passando pelo cache de respostas se configurado.
         """
-        langchain_messages = LangChainMessageSerializer.serialize_messages(messages)
+        langchain_messages = LangChainMessageSerializer.serialize_messages(
+            messages,
+            normalize=self.stable_prefix,
+            hoist_task=self.hoist_task,
+            vision=self.vision_budget,
+            history=self.history_window,
+            dom_diff=self.dom_diff,
+            context_tokens=self._prompt_budget,
+        )
 
+        started = time.perf_counter()
+        cache_key = None
+        if self.cache is not None:
+            cache_key, cached = self.cache.lookup(self.name, langchain_messages, output_format)
+            if cached is not None:
+                latency = time.perf_counter() - started
+                if self.metrics is not None:
+                    self.metrics.record_call(self.name, langchain_messages, cached, latency, path='cache')
+                if self.trace is not None:
+                    self.trace.record_call(self.name, langchain_messages, cached, latency, path='cache')
+                return cached
+
+        details: dict[str, Any] | None = {} if self.trace is not None else None
         try:
-            if output_format is None:
-                # Retorna resposta string simples
-                response = await self.chat.ainvoke(langchain_messages)
-                content = response.content if hasattr(response, 'content') else str(response)
-                return ChatInvokeCompletion(
-                    completion=str(content),
-                    usage=self._get_usage(response),
-                )
+            result = await self._ainvoke_with_retry(langchain_messages, output_format, details)
+        except Exception as e:
+            latency = time.perf_counter() - started
+            if self.metrics is not None:
+                self.metrics.record_error(self.name, latency, e)
+            if self.trace is not None:
+                self.trace.record_error(self.name, latency, e, details)
+            raise
 
-            else:
-                # Tenta usar structured output
+        latency = time.perf_counter() - started
+        if self.metrics is not None:
+            self.metrics.record_call(self.name, langchain_messages, result, latency)
+        if self.trace is not None:
+            self.trace.record_call(self.name, langchain_messages, result, latency, details=details)
+        if cache_key is not None:
+            self.cache.put(cache_key, result)
+        return result
+
+    async def _ainvoke_with_retry(
+        self,
+        langchain_messages: list,
+        output_format: type[T] | None = None,
+        details: dict[str, Any] | None = None,
+    ) -> ChatInvokeCompletion[T] | ChatInvokeCompletion[str]:
+        policy = self.retry
+        if policy is None:
+            return await self._ainvoke_model(langchain_messages, output_format, details)
+
+        # Com pool, cada endpoint já tem a sua quarentena
+        breaker = policy.breaker if self.pool is None else None
+        messages = langchain_messages
+        attempt = 0
+        reprompts = 0
+        while True:
+            if breaker is not None:
                 try:
-                    # Método preferido: suporte nativo a JSON
-                    structured_chat = self.chat.with_structured_output(output_format)
-                    parsed_object = await structured_chat.ainvoke(langchain_messages)
-                    return ChatInvokeCompletion(completion=parsed_object, usage=None)
-                except Exception:
-                    response = await self.chat.ainvoke(langchain_messages)
-                    content = str(response.content)
-
-                    # Limpeza de Markdown se necessário (ex: ```json ... ```)
-                    if "```json" in content:
-                        content = content.replace("```json", "").replace("```", "").strip()
-                    elif "```" in content:
-                        content = content.replace("```", "").strip()
-
-                    import json
-                    parsed_data = json.loads(content)
-                    
-                    # Valida e converte para o modelo Pydantic esperado
-                    parsed_object = output_format(**parsed_data)
-                    
-                    return ChatInvokeCompletion(
-                        completion=parsed_object,
-                        usage=self._get_usage(response),
-                    )
+                    breaker.before_call()
+                except CircuitOpenError as e:
+                    if self.metrics is not None:
+                        self.metrics.count('circuit_open', self.name)
+                    raise ModelProviderError(str(e), model=self.name) from e
+
+            error: Exception | None = None
+            # None = chamada interrompida (cancelamento): o servidor não deu resposta
+            server_up: bool | None = None
+            try:
+                call = self._ainvoke_model(messages, output_format, details)
+                result = await (asyncio.wait_for(call, policy.timeout) if policy.timeout else call)
+                server_up = True
+            except Exception as e:
+                error = e
+                # Saída inválida ou erro não transitório (400, contexto estourado):
+                # o servidor respondeu, o problema é a requisição, não o endpoint
+                server_up = not is_transient(e)
+            finally:
+                # Em qualquer saída, inclusive cancelamento: senão o teste half-open fica preso
+                if breaker is not None:
+                    if server_up is None:
+                        breaker.release()
+                    elif server_up:
+                        breaker.record_success()
+                    else:
+                        breaker.record_failure()
+
+            if error is None:
+                if details is not None and (attempt or reprompts):
+                    details.update(retries=attempt, reprompts=reprompts)
+                return result
+
+            invalid = find_cause(error, OutputValidationError)
+            if invalid is not None:
+                if reprompts >= policy.reprompt_attempts:
+                    raise error
+                reprompts += 1
+                if self.metrics is not None:
+                    self.metrics.count('reprompts', self.name)
+                messages = reprompt_messages(langchain_messages, invalid.raw, invalid.error)
+                continue
+
+            if server_up:
+                raise error
+            attempt += 1
+            if attempt >= policy.max_attempts:
+                if isinstance(error, TimeoutError):
+                    raise ModelProviderError(f'Model call timed out after {policy.timeout:g}s', model=self.name) from error
+                raise error
+            if self.metrics is not None:
+                self.metrics.count('retries', self.name)
+            await asyncio.sleep(policy.backoff(attempt))
+
+    async def _ainvoke_structured(
+        self,
+        langchain_messages: list,
+        output_format: type[T],
+        details: dict[str, Any] | None = None,
+    ) -> ChatInvokeCompletion[T]:
+        """
+        Usa a estratégia do perfil (ou a forçada em ``structured_output``). Sem
+        nenhuma, usa a já detectada para este provedor/modelo; na primeira chamada
+        testa as estratégias na ordem de STRUCTURED_OUTPUT_STRATEGIES e memoriza a
+        primeira que funcionar. Depois disso só passa para a seguinte se o
+        servidor recusar a estratégia (tools/response_format não suportados), e
+        a que funcionar no lugar dela passa a ser a memorizada.
+        Erros transitórios e saída inválida (OutputValidationError, tratada com
+        reprompt pela política de retry) são sempre repassados.
+        """
+        key = (self.provider, self.name)
+        forced = self.structured_output or self.profile.structured_output
+        remembered = _strategy_by_model.get(key)
+        if forced is not None:
+            candidates = (forced,)
+        elif remembered is not None:
+            candidates = STRUCTURED_OUTPUT_STRATEGIES[STRUCTURED_OUTPUT_STRATEGIES.index(remembered):]
+        else:
+            candidates = STRUCTURED_OUTPUT_STRATEGIES
+
+        last_error: Exception | None = None
+        for strategy in candidates:
+            try:
+                if strategy == 'text':
+                    result = await self._ainvoke_text_json(langchain_messages, output_format, details)
+                else:
+                    result = await self._ainvoke_with_structured_output(strategy, langchain_messages, output_format)
+            except Exception as e:
+                # Um erro transitório (conexão, 5xx) não diz nada sobre o modelo, e saída
+                # inválida é corrigida com reprompt; fora da primeira detecção, só a
+                # recusa explícita da estratégia justifica tentar a seguinte
+                if forced is not None or is_transient(e) or find_cause(e, OutputValidationError) is not None:
+                    raise
+                if remembered is not None and not _is_unsupported(e):
+                    raise
+                last_error = e
+                if self.metrics is not None:
+                    self.metrics.count(f'structured_output_{strategy}_failed', self.name)
+                continue
+
+            if forced is None:
+                # Só se chega a uma estratégia seguinte após a recusa explícita da
+                # memorizada: a nova substitui a antiga, que não seria tentada de novo
+                _strategy_by_model[key] = strategy
+            if self.metrics is not None:
+                self.metrics.count(f'structured_output_{strategy}', self.name)
+            return result
+
+        assert last_error is not None
+        raise last_error
+
+    async def _ainvoke_with_structured_output(
+        self,
+        strategy: str,
+        langchain_messages: list,
+        output_format: type[T],
+    ) -> ChatInvokeCompletion[T]:
+        """
+        Structured output do LangChain: o método padrão do modelo ('native';
+        json_schema no ChatOpenAI e no ChatOllama) ou JSON mode ('json_mode').
+        O runnable é criado no ``_backend`` (pool e lotes valem aqui também) e
+        as dicas de cache vão junto, como kwargs do modelo.
+        """
+        runnable = self._structured_runnables.get((strategy, output_format))
+        if runnable is None:
+            hints = self._invoke_kwargs()
+            if strategy == 'native':
+                runnable = self._backend.with_structured_output(output_format, include_raw=True, **hints)
+            else:
+                runnable = self._backend.with_structured_output(
+                    output_format, method='json_mode', include_raw=True, **hints
+                )
+            self._structured_runnables[(strategy, output_format)] = runnable
+
+        output = await runnable.ainvoke(langchain_messages)
+        if output.get('parsing_error') is not None:
+            raise output['parsing_error']
+        if output.get('parsed') is None:
+            raise ValueError(f'Structured output ({strategy}) returned no parsed object')
+
+        return ChatInvokeCompletion(completion=output['parsed'], usage=self._get_usage(output['raw']))
+
+    async def _ainvoke_text_json(
+        self,
+        langchain_messages: list,
+        output_format: type[T],
+        details: dict[str, Any] | None = None,
+    ) -> ChatInvokeCompletion[T]:
+        """Resposta em texto puro: remove cercas de Markdown, repara e valida o JSON."""
+        if self.stream if self.stream is not None else self.profile.stream:
+            return await self._ainvoke_streaming(langchain_messages, output_format, details)
+
+        response = await self._backend.ainvoke(langchain_messages, **self._invoke_kwargs())
+        content = self._strip_fences(str(response.content))
+        return ChatInvokeCompletion(
+            completion=self._parse_output(content, output_format, content, details),
+            usage=self._get_usage(response),
+        )
+
+    @staticmethod
+    def _strip_fences(content: str) -> str:
+        # Limpeza de Markdown se necessário (ex: ```json ... ```)
+        if "```json" in content:
+            return content.replace("```json", "").replace("```", "").strip()
+        if "```" in content:
+            return content.replace("```", "").strip()
+        return content
+
+    async def _ainvoke_model(
+        self,
+        langchain_messages: list,
+        output_format: type[T] | None = None,
+        details: dict[str, Any] | None = None,
+    ) -> ChatInvokeCompletion[T] | ChatInvokeCompletion[str]:
+        try:
+            if output_format is not None:
+                return await self._ainvoke_structured(langchain_messages, output_format, details)
+
+            # Retorna resposta string simples
+            response = await self._backend.ainvoke(langchain_messages, **self._invoke_kwargs())
+            content = str(response.content)
+            if details is not None:
+                details['raw'] = content
+            return ChatInvokeCompletion(
+                completion=content,
+                usage=self._get_usage(response),
+            )
 
         except Exception as e:
             raise ModelProviderError(
                 message=f'LangChain wrapper error: {str(e)}',
                 model=self.name,
-            ) from e
\ No newline at end of file
+            ) from e
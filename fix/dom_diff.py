@@ -0,0 +1,188 @@
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+from browser_use.llm.messages import BaseMessage, SystemMessage, UserMessage
+
+from fix.trace import current_run
+
+_BROWSER_STATE = re.compile(r'(<browser_state>\n)(.*?)(\n</browser_state>)', re.DOTALL)
+_ELEMENTS_HEADER = re.compile(r'^Interactive elements[^\n]*:\n', re.MULTILINE)
+_USER_REQUEST = re.compile(r'<user_request>\n(.*?)\n</user_request>', re.DOTALL)
+_CURRENT_TAB = re.compile(r'^Current tab: (\S+)$', re.MULTILINE)
+_STEP = re.compile(r'<step_info>Step(\d+)')
+# Elemento interativo: "[12]<input .../>", "*[12]<..." (novo) ou "|SCROLL[12]<div..."; o índice
+# é o backend_node_id do Chrome, estável entre passos. Texto da página como "Qty [5]" não é elemento
+_ELEMENT_ID = re.compile(r'^[^\[<]*\[(\d+)\]<')
+
+
+@dataclass
+class _Reference:
+    url: str
+    step: int | None
+    elements: str
+    # índice -> linha (sem indentação nem marcador '*'); textos da página com repetição
+    lines: dict[int, str]
+    texts: Counter[str]
+
+
+def _parse(elements: str) -> tuple[dict[int, str], Counter[str], list[tuple[int | None, str]]]:
+    lines: dict[int, str] = {}
+    texts: Counter[str] = Counter()
+    ordered: list[tuple[int | None, str]] = []
+    for raw in elements.split('\n'):
+        line = raw.strip()
+        if not line or line in ('[Start of page]', '[End of page]'):
+            continue
+        match = _ELEMENT_ID.match(line)
+        if match is None:
+            texts[line] += 1
+            ordered.append((None, line))
+            continue
+        element_id = int(match.group(1))
+        lines[element_id] = line.replace(f'*[{element_id}]', f'[{element_id}]', 1)
+        ordered.append((element_id, line))
+    return lines, texts, ordered
+
+
+def _url(header: str) -> str | None:
+    """URL da aba atual; None quando o browser-use não consegue identificá-la."""
+    current = _CURRENT_TAB.search(header)
+    if current is None:
+        return None
+    tab = re.search(rf'^Tab {re.escape(current.group(1))}: (\S+)', header, re.MULTILINE)
+    return tab.group(1) if tab else None
+
+
+@dataclass
+class StateDiff:
+    """
+    Envia ao modelo só o que mudou na página entre passos.
+
+    No primeiro passo em uma URL, a lista completa de elementos interativos
+    vira uma mensagem ``<page_reference>`` logo após o prompt de sistema (e a
+    tarefa, com ``hoist_task``); nos
+    passos seguintes na mesma página, o <browser_state> traz apenas os
+    elementos alterados, novos e removidos em relação a essa referência (os
+    índices do browser-use são estáveis entre passos). A referência não muda
+    de um passo para o outro, então o servidor reaproveita o KV cache do
+    prefixo (veja ``stable_prefix``) e só processa o histórico e a diferença.
+
+    Navegação (outra URL) ou uma diferença maior que ``rebase_ratio`` da
+    referência geram uma referência nova com o estado completo. Cada execução
+    (``current_run`` + tarefa) tem a sua referência, então agentes
+    concorrentes podem compartilhar o mesmo ChatLangchain; chame ``end_run``
+    ao fim de cada execução (o daemon repete nomes de execução).
+    """
+    rebase_ratio: float = 0.5
+    max_runs: int = 256
+    diffs: int = 0
+    rebases: int = 0
+    _references: OrderedDict[tuple, _Reference] = field(default_factory=OrderedDict, repr=False)
+
+    def _reference_for(self, key: tuple, url: str, step: int | None, elements: str) -> tuple[_Reference, str | None]:
+        """Referência da execução e a diferença atual (None = referência nova)."""
+        reference = self._references.get(key)
+        # Passo anterior ao da referência: a execução recomeçou com o mesmo nome
+        restarted = reference is not None and step is not None and reference.step is not None and step < reference.step
+        if reference is not None and reference.url == url and not restarted:
+            self._references.move_to_end(key)
+            diff = self._diff(reference, elements)
+            if len(diff) <= self.rebase_ratio * len(reference.elements):
+                self.diffs += 1
+                return reference, diff
+
+        lines, texts, _ = _parse(elements)
+        reference = self._references[key] = _Reference(url, step, elements, lines, texts)
+        self._references.move_to_end(key)
+        if len(self._references) > self.max_runs:
+            self._references.popitem(last=False)
+        self.rebases += 1
+        return reference, None
+
+    @staticmethod
+    def _diff(reference: _Reference, elements: str) -> str:
+        lines, texts, ordered = _parse(elements)
+        changed, added = [], []
+        new_texts = texts - reference.texts
+        for element_id, line in ordered:
+            if element_id is None:
+                if new_texts[line] > 0:
+                    new_texts[line] -= 1
+                    added.append(line)
+            elif element_id not in reference.lines:
+                added.append(line)
+            elif reference.lines[element_id] != lines[element_id]:
+                changed.append(line)
+        removed = [f'[{i}]' for i in reference.lines if i not in lines]
+        removed_texts = list((reference.texts - texts).elements())
+
+        sections = []
+        if changed:
+            sections.append('Changed:\n' + '\n'.join(changed))
+        if added:
+            sections.append('Added:\n' + '\n'.join(added))
+        if removed:
+            sections.append('Removed: ' + ' '.join(removed))
+        if removed_texts:
+            sections.append('Removed text:\n' + '\n'.join(removed_texts))
+        return '\n'.join(sections)
+
+    def apply(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """Retorna a lista com a referência da página e o <browser_state> reduzido à diferença."""
+        position = next(
+            (i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], UserMessage)), None
+        )
+        if position is None:
+            return messages
+        message = messages[position]
+        content = message.content
+        text_part = content if isinstance(content, str) else next((p for p in content if p.type == 'text'), None)
+        text = text_part if isinstance(text_part, str) else getattr(text_part, 'text', None)
+        match = _BROWSER_STATE.search(text) if text else None
+        if match is None:
+            return messages
+        state = match.group(2)
+        header_match = _ELEMENTS_HEADER.search(state)
+        url = _url(state)
+        if header_match is None or url is None:
+            return messages
+
+        request = _USER_REQUEST.search(text)
+        key = (current_run.get(), request.group(1) if request else None)
+        step = _STEP.search(text)
+        reference, diff = self._reference_for(key, url, int(step.group(1)) if step else None, state[header_match.end():])
+
+        since = f'<page_reference> (step {reference.step})' if reference.step is not None else '<page_reference>'
+        if diff:
+            elements = f'Interactive elements: same as {since} except:\n{diff}'
+        else:
+            elements = f'Interactive elements: same as {since}, nothing changed.'
+        new_text = text[: match.start(2)] + state[: header_match.start()] + elements + text[match.end(2):]
+        if isinstance(content, str):
+            new_message = message.model_copy(update={'content': new_text})
+        else:
+            parts = [part.model_copy(update={'text': new_text}) if part is text_part else part for part in content]
+            new_message = message.model_copy(update={'content': parts})
+
+        reference_message = UserMessage(
+            content=(
+                f'<page_reference>\nInteractive elements of {reference.url}'
+                + (f' at step {reference.step}' if reference.step is not None else '')
+                + '. The <browser_state> below lists only the elements that changed since this reference;'
+                ' every other element is still on the page, unchanged.\n'
+                f'{reference.elements}\n</page_reference>'
+            )
+        )
+        insert_at = next((i for i, m in enumerate(messages) if not isinstance(m, SystemMessage)), 0)
+        result = [*messages[:position], new_message, *messages[position + 1:]]
+        return [*result[:insert_at], reference_message, *result[insert_at:]]
+
+    def end_run(self, run: str | None = None) -> None:
+        """Descarta as referências da execução ``run`` (padrão: ``current_run``)."""
+        run = current_run.get() if run is None else run
+        for key in [key for key in self._references if key[0] == run]:
+            del self._references[key]
+
+    def stats(self) -> dict[str, int]:
+        return {'diffs': self.diffs, 'rebases': self.rebases}
@@ -0,0 +1,152 @@
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from browser_use.llm.messages import BaseMessage, UserMessage
+
+from fix.metrics import CHARS_PER_TOKEN, estimate_tokens
+
+# Quantos resumos de passos ficam em memória (chave = texto original do passo)
+SUMMARY_CACHE_SIZE = 512
+
+_HISTORY_BLOCK = re.compile(r'(<agent_history>\n)(.*?)(\n</agent_history>)', re.DOTALL)
+# Início de cada item do histórico: "<step>", "<step_unknown>", "<sys>..." ou pedido de follow-up
+_ITEM_START = re.compile(r'^(?=<step\w*>$|<sys>|<follow_up_user_request>)', re.MULTILINE)
+_SPACES = re.compile(r'\s+')
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = _SPACES.sub(' ', text).strip()
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + '…'
+
+
+def summarize_step(item: str, max_chars: int = 160) -> str:
+    """
+    Resumo de uma linha de um passo do <agent_history>: o objetivo do passo e a
+    primeira linha do resultado. Itens de sistema (<sys>, follow-up) são mantidos.
+    """
+    tag, _, body = item.partition('\n')
+    if not tag.startswith('<step'):
+        return item
+    goal, _, result = body.partition('\nResult\n')
+    if body.startswith('Result\n'):
+        goal, result = '', body[len('Result\n'):]
+    goal_line = goal.strip().rsplit('\n', 1)[-1]
+    result_line = result.strip().split('\n', 1)[0]
+    half = max_chars // 2
+    parts = [_shorten(goal_line, half if result_line else max_chars)] if goal_line else []
+    if result_line:
+        parts.append(_shorten(result_line, half if goal_line else max_chars))
+    return f'{tag}\n' + ' → '.join(parts)
+
+
+@dataclass
+class HistoryWindow:
+    """
+    Limita o crescimento do prompt em execuções longas.
+
+    O browser-use envia, a cada passo, todo o histórico dentro de
+    <agent_history> na mensagem de estado. Aqui o prompt de sistema e os
+    ``keep_steps`` passos mais recentes seguem na íntegra; os mais antigos viram
+    um resumo de uma linha (calculado uma vez por passo e guardado em cache, já
+    que o texto de um passo antigo não muda). Com ``max_tokens`` (ou, sem ele,
+    o limite de contexto do modelo passado a ``apply``), os resumos mais
+    antigos são omitidos e, se preciso, a janela diminui até ``min_steps``
+    para caber no orçamento (estimado por estimate_tokens).
+    """
+    keep_steps: int = 6
+    max_tokens: int | None = None
+    min_steps: int = 1
+    summary_chars: int = 160
+    # Mantém o primeiro item (ações iniciais), como o max_history_items do browser-use
+    keep_first: bool = True
+    _summaries: OrderedDict[str, str] = field(default_factory=OrderedDict, repr=False)
+
+    def _summary(self, item: str) -> str:
+        cached = self._summaries.get(item)
+        if cached is not None:
+            self._summaries.move_to_end(item)
+            return cached
+        summary = self._summaries[item] = summarize_step(item, self.summary_chars)
+        if len(self._summaries) > SUMMARY_CACHE_SIZE:
+            self._summaries.popitem(last=False)
+        return summary
+
+    def _render(self, items: list[str], verbatim: int, summarized: int) -> str:
+        head = items[:1] if self.keep_first and len(items) > verbatim else []
+        rest = items[len(head):]
+        recent = rest[len(rest) - verbatim:] if verbatim else []
+        older = rest[: len(rest) - len(recent)]
+        kept_summaries = older[len(older) - summarized:] if summarized else []
+        omitted = len(older) - len(kept_summaries)
+
+        lines = list(head)
+        if omitted:
+            lines.append(f'<sys>[... {omitted} previous steps omitted...]</sys>')
+        lines.extend(self._summary(item) for item in kept_summaries)
+        lines.extend(recent)
+        return '\n'.join(lines)
+
+    def _window(self, history: str, other_tokens: int, max_tokens: int | None) -> str:
+        items = [item.rstrip('\n') for item in _ITEM_START.split(history) if item.strip()]
+        verbatim = min(self.keep_steps, len(items))
+        summarized = len(items) - verbatim - (1 if self.keep_first and len(items) > verbatim else 0)
+        text = self._render(items, verbatim, summarized)
+        if max_tokens is None:
+            return text
+
+        # Orçamento: primeiro descarta resumos (mais antigos primeiro), depois encolhe a janela
+        while other_tokens + estimate_tokens(text) > max_tokens:
+            if summarized > 0:
+                summarized = max(0, summarized - max(1, summarized // 2))
+            elif verbatim > self.min_steps:
+                verbatim -= 1
+            else:
+                break
+            text = self._render(items, verbatim, summarized)
+        return text
+
+    def apply(self, messages: list[BaseMessage], context_tokens: int | None = None) -> list[BaseMessage]:
+        """
+        Retorna a lista com o <agent_history> reduzido; as demais mensagens são
+        mantidas como estão. ``context_tokens`` é o orçamento do prompt quando a
+        janela não define ``max_tokens`` (ex: o contexto do modelo, pelo perfil).
+        """
+        other_chars = 0
+        target = None
+        for position, message in enumerate(messages):
+            content = message.content
+            if isinstance(content, str):
+                texts = [content]
+            elif isinstance(content, list):
+                texts = [part.text for part in content if getattr(part, 'type', None) == 'text']
+            else:
+                continue
+            for text in texts:
+                match = _HISTORY_BLOCK.search(text) if target is None and isinstance(message, UserMessage) else None
+                if match is not None:
+                    target = (position, text, match)
+                    other_chars += len(text) - len(match.group(2))
+                else:
+                    other_chars += len(text)
+
+        if target is None:
+            return messages
+
+        position, text, match = target
+        max_tokens = self.max_tokens if self.max_tokens is not None else context_tokens
+        history = self._window(match.group(2), -(-other_chars // CHARS_PER_TOKEN), max_tokens)
+        if history == match.group(2):
+            return messages
+
+        new_text = text[: match.start(2)] + history + text[match.end(2):]
+        message = messages[position]
+        if isinstance(message.content, str):
+            new_message = message.model_copy(update={'content': new_text})
+        else:
+            parts = [
+                part.model_copy(update={'text': new_text}) if getattr(part, 'type', None) == 'text' and part.text is text else part
+                for part in message.content
+            ]
+            new_message = message.model_copy(update={'content': parts})
+        return [*messages[:position], new_message, *messages[position + 1:]]
@@ -0,0 +1,210 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from browser_use.llm.views import ChatInvokeCompletion
+
+# Limites (segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Aproximação usada quando o servidor não envia usage (llama-swap)
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _message_chars(langchain_messages: list) -> int:
+    total = 0
+    for message in langchain_messages:
+        content = message.content
+        if isinstance(content, str):
+            total += len(content)
+        else:
+            for part in content:
+                if isinstance(part, dict) and part.get('type') == 'text':
+                    total += len(part['text'])
+                elif isinstance(part, str):
+                    total += len(part)
+    return total
+
+
+@dataclass
+class _Histogram:
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class ChatMetrics:
+    """
+    Métricas das chamadas do ChatLangchain: histograma de latência (as respostas
+    do cache de respostas têm um histograma próprio, para não puxar a latência
+    do modelo para baixo) e de TTFT, tokens (estimados localmente quando o servidor não os envia) e contadores
+    de eventos (fallback, reparos de JSON, cache, erros...).
+
+    Exporta em formato texto do Prometheus (textfile collector) e/ou JSONL
+    com um registro por chamada. Nada de disco no caminho de cada chamada: os
+    registros ficam em memória e vão para o JSONL a cada ``flush_every``; o
+    arquivo do Prometheus é regravado no máximo a cada ``prometheus_interval``
+    segundos. ``flush``/``close`` gravam tudo (chame ao fim da execução).
+    """
+
+    def __init__(
+        self,
+        jsonl_path: str | Path | None = None,
+        prometheus_path: str | Path | None = None,
+        flush_every: int = 50,
+        prometheus_interval: float = 15.0,
+    ):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+        self.flush_every = flush_every
+        self.prometheus_interval = prometheus_interval
+        self._pending: list[str] = []
+        self._prometheus_written = time.monotonic()
+        self.latency: dict[str, _Histogram] = defaultdict(_Histogram)
+        self.cache_latency: dict[str, _Histogram] = defaultdict(_Histogram)
+        self.ttft: dict[str, _Histogram] = defaultdict(_Histogram)
+        self.prompt_tokens: Counter[str] = Counter()
+        self.completion_tokens: Counter[str] = Counter()
+        self.estimated_calls: Counter[str] = Counter()
+        # (evento, modelo) -> quantidade
+        self.events: Counter[tuple[str, str]] = Counter()
+
+    def count(self, event: str, model: str, n: int = 1) -> None:
+        self.events[(event, model)] += n
+
+    def observe_ttft(self, model: str, seconds: float) -> None:
+        self.ttft[model].observe(seconds)
+
+    def record_call(
+        self,
+        model: str,
+        langchain_messages: list,
+        result: ChatInvokeCompletion,
+        latency: float,
+        path: str = 'model',
+    ) -> None:
+        usage = result.usage
+        estimated = usage is None or not usage.total_tokens
+        if estimated:
+            completion = result.completion
+            text = completion.model_dump_json() if isinstance(completion, BaseModel) else str(completion)
+            prompt_tokens = (_message_chars(langchain_messages) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+            completion_tokens = estimate_tokens(text)
+            self.estimated_calls[model] += 1
+        else:
+            prompt_tokens = usage.prompt_tokens
+            completion_tokens = usage.completion_tokens
+
+        (self.cache_latency if path == 'cache' else self.latency)[model].observe(latency)
+        self.prompt_tokens[model] += prompt_tokens
+        self.completion_tokens[model] += completion_tokens
+        self.count(f'calls_{path}', model)
+
+        self._export(
+            {
+                'ts': time.time(),
+                'model': model,
+                'path': path,
+                'latency': round(latency, 4),
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'tokens_estimated': estimated,
+                'tokens_per_second': round(completion_tokens / latency, 2) if latency > 0 else None,
+            }
+        )
+
+    def record_error(self, model: str, latency: float, error: BaseException) -> None:
+        self.latency[model].observe(latency)
+        self.count('errors', model)
+        self._export(
+            {
+                'ts': time.time(),
+                'model': model,
+                'path': 'error',
+                'latency': round(latency, 4),
+                'error': f'{type(error).__name__}: {error}'[:500],
+            }
+        )
+
+    def _export(self, record: dict[str, Any]) -> None:
+        if self.jsonl_path is not None:
+            self._pending.append(json.dumps(record, ensure_ascii=False) + '\n')
+            if len(self._pending) >= self.flush_every:
+                self._write_jsonl()
+        if self.prometheus_path is not None and time.monotonic() - self._prometheus_written >= self.prometheus_interval:
+            self._write_prometheus()
+
+    def _write_jsonl(self) -> None:
+        lines, self._pending = self._pending, []
+        with self.jsonl_path.open('a', encoding='utf-8') as f:
+            f.writelines(lines)
+
+    def _write_prometheus(self) -> None:
+        self._prometheus_written = time.monotonic()
+        self.write_prometheus(self.prometheus_path)
+
+    def flush(self) -> None:
+        """Grava os registros pendentes no JSONL e o estado atual no arquivo do Prometheus."""
+        if self.jsonl_path is not None and self._pending:
+            self._write_jsonl()
+        if self.prometheus_path is not None:
+            self._write_prometheus()
+
+    def close(self) -> None:
+        self.flush()
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def histogram(name: str, help_text: str, data: dict[str, _Histogram]) -> None:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for model, hist in sorted(data.items()):
+                cumulative = 0
+                for bound, n in zip((*LATENCY_BUCKETS, '+Inf'), hist.buckets):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{model="{model}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{model="{model}"}} {hist.total:.6f}')
+                lines.append(f'{name}_count{{model="{model}"}} {hist.count}')
+
+        def counter(name: str, help_text: str, data: Counter[str]) -> None:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for model, value in sorted(data.items()):
+                lines.append(f'{name}{{model="{model}"}} {value}')
+
+        histogram('llm_call_latency_seconds', 'Wall time of ChatLangchain.ainvoke calls sent to the model.', self.latency)
+        histogram('llm_cache_latency_seconds', 'Wall time of ChatLangchain.ainvoke calls served by the cache.', self.cache_latency)
+        histogram('llm_time_to_first_token_seconds', 'Time until the first streamed chunk.', self.ttft)
+        counter('llm_prompt_tokens_total', 'Prompt tokens (reported or estimated).', self.prompt_tokens)
+        counter('llm_completion_tokens_total', 'Completion tokens (reported or estimated).', self.completion_tokens)
+        counter('llm_estimated_usage_calls_total', 'Calls whose token usage was estimated locally.', self.estimated_calls)
+
+        lines.append('# HELP llm_events_total Adapter events (fallbacks, JSON repairs, cache hits, errors...).')
+        lines.append('# TYPE llm_events_total counter')
+        for (event, model), value in sorted(self.events.items()):
+            lines.append(f'llm_events_total{{event="{event}",model="{model}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str | Path) -> None:
+        path = Path(path)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_text(self.to_prometheus(), encoding='utf-8')
+        os.replace(tmp, path)
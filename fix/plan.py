@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypeVar
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+
+from browser_use.llm.messages import BaseMessage, UserMessage
+from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+
+T = TypeVar('T', bound=BaseModel)
+
+# Linhas de elemento interativo do estado do browser-use: "[12]<input ... />", com
+# indentação e prefixos opcionais: "*" (novo), "|SHADOW(open)|", "|scroll element[12]<div"
+_ELEMENT_LINE = re.compile(r'^[^\[<\n]*\[(\d+)\](<.*)$', re.MULTILINE)
+# Atributos que mudam conforme o formulário é preenchido não identificam o elemento
+_VOLATILE_ATTRS = re.compile(r'\s(?:value|checked|selected)=("[^"]*"|\'[^\']*\'|\S+)')
+
+# Aba atual e lista de abas do <browser_state>: "Current tab: 1a2b" e "Tab 1a2b: http://... - Título"
+_CURRENT_TAB = re.compile(r'^Current tab: (\S+)$', re.MULTILINE)
+_TAB_LINE = r'^Tab {}: (\S+)'
+
+# Ações que leem a página ou encerram a tarefa: sempre passam pelo LLM
+NEVER_REPLAY = frozenset({'done', 'extract', 'extract_structured_data', 'extract_content'})
+# Avaliação posta no lugar da gravada: o passo anterior não foi conferido por ninguém
+REPLAYED_EVALUATION = 'Unknown - this step was replayed from a recorded plan without evaluating the previous one.'
+
+
+def _state_text(messages: list[BaseMessage]) -> str | None:
+    for message in reversed(messages):
+        if not isinstance(message, UserMessage):
+            continue
+        if isinstance(message.content, str):
+            text = message.content
+        else:
+            text = '\n'.join(part.text for part in message.content if part.type == 'text')
+        if '[' in text:
+            return text
+    return None
+
+
+def element_map(messages: list[BaseMessage]) -> dict[int, str]:
+    """índice -> descrição normalizada dos elementos, a partir do último estado do navegador."""
+    text = _state_text(messages)
+    if text is None:
+        return {}
+    return {int(m.group(1)): _VOLATILE_ATTRS.sub('', m.group(2)).strip() for m in _ELEMENT_LINE.finditer(text)}
+
+
+def page_url(messages: list[BaseMessage]) -> str | None:
+    """Endereço da aba atual (sem query string nem fragmento), ou None se o estado não a identifica."""
+    text = _state_text(messages)
+    current = _CURRENT_TAB.search(text) if text else None
+    if current is None:
+        return None
+    tab = re.search(_TAB_LINE.format(re.escape(current.group(1))), text, re.MULTILINE)
+    if tab is None:
+        return None
+    parts = urlsplit(tab.group(1))
+    return f'{parts.scheme}://{parts.netloc}{parts.path}'
+
+
+def task_key(task: str) -> str:
+    return hashlib.sha256(' '.join(task.split()).encode()).hexdigest()[:16]
+
+
+@dataclass
+class PlanStep:
+    output: dict[str, Any]
+    # posição da ação na lista -> descrição do elemento alvo na gravação
+    targets: dict[int, str] = field(default_factory=dict)
+    # página em que o passo foi gravado (None em planos antigos)
+    url: str | None = None
+
+
+class ActionPlanStore:
+    """Planos de ação gravados em disco, um JSON por tarefa."""
+
+    def __init__(self, path: str | Path = '.action_plans'):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def load(self, task: str) -> list[PlanStep] | None:
+        file = self.path / f'{task_key(task)}.json'
+        if not file.exists():
+            return None
+        data = json.loads(file.read_text(encoding='utf-8'))
+        return [
+            PlanStep(output=s['output'], targets={int(k): v for k, v in s['targets'].items()}, url=s.get('url'))
+            for s in data['steps']
+        ]
+
+    def save(self, task: str, steps: list[PlanStep]) -> None:
+        file = self.path / f'{task_key(task)}.json'
+        tmp = file.with_suffix(f'.{os.getpid()}.tmp')
+        data = {'task': task, 'steps': [{'output': s.output, 'targets': s.targets, 'url': s.url} for s in steps]}
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, file)
+
+
+@dataclass
+class FastPathChat:
+    """
+    Executa passos roteirizados sem LLM a partir de um plano aprendido.
+
+    Envolve um chat model (ex: ChatLangchain) para uma única tarefa. Se existe
+    um plano gravado de uma execução bem-sucedida, o próximo passo do plano só
+    é repetido se a página atual é a da gravação (mesmo endereço e todos os
+    alvos encontrados, sem ambiguidade); os índices dos elementos são
+    remapeados pelo texto do elemento. Caso contrário, ou se o passo lê a
+    página/encerra (NEVER_REPLAY), a chamada vai para o LLM: se ele fizer o
+    mesmo que o passo gravado, o plano continua dali; se não, ou se alguma
+    ação do passo anterior deu erro (com ``attach``), a execução saiu do
+    roteiro e o resto vai todo para o LLM. Todos os passos executados são
+    gravados; chame ``save_plan`` ao fim de uma execução bem-sucedida para
+    atualizar o plano.
+    """
+    llm: Any
+    store: ActionPlanStore
+    task: str
+    replayed: int = 0
+    fallbacks: int = 0
+    _plan: list[PlanStep] | None = field(default=None, repr=False)
+    # próximo passo do plano; só avança quando o passo foi de fato executado
+    _cursor: int = 0
+    _diverged: bool = False
+    _agent: Any = field(default=None, repr=False)
+    _recorded: list[PlanStep] = field(default_factory=list, repr=False)
+    _verified_api_keys: bool = False
+
+    def __post_init__(self) -> None:
+        self._plan = self.store.load(self.task)
+
+    @property
+    def model(self) -> str:
+        return self.llm.model
+
+    @property
+    def provider(self) -> str:
+        return self.llm.provider
+
+    @property
+    def name(self) -> str:
+        return self.llm.name
+
+    def attach(self, agent: Any) -> None:
+        """Dá acesso aos resultados das ações do agente (``agent.state.last_result``), para parar o replay após um erro."""
+        self._agent = agent
+
+    def _previous_failed(self) -> bool:
+        if self._agent is None:
+            return False
+        return any(result.error for result in self._agent.state.last_result or [])
+
+    def _bind(self, step: PlanStep, elements: dict[int, str], url: str | None) -> dict[str, Any] | None:
+        """
+        Remapeia os índices do passo gravado para a página atual; None se a
+        página não é a da gravação, se algum alvo sumiu ou é ambíguo (vários
+        elementos com a mesma descrição, como botões "Add to cart" repetidos):
+        nesse caso quem escolhe é o LLM.
+        """
+        actions = step.output.get('action', [])
+        if not actions:
+            return None
+        if step.url is not None and step.url != url:
+            return None
+
+        by_description: dict[str, int | None] = {}
+        for index, description in elements.items():
+            # None marca descrição repetida
+            by_description[description] = None if description in by_description else index
+
+        bound_actions = []
+        for position, action in enumerate(actions):
+            if len(action) != 1:
+                return None
+            (action_name, params), = action.items()
+            if action_name in NEVER_REPLAY:
+                return None
+            target = step.targets.get(position)
+            if target is None:
+                bound_actions.append(action)
+                continue
+            index = by_description.get(target)
+            if index is None:
+                return None
+            bound_actions.append({action_name: {**params, 'index': index}})
+
+        bound = {**step.output, 'action': bound_actions}
+        if 'evaluation_previous_goal' in bound:
+            bound['evaluation_previous_goal'] = REPLAYED_EVALUATION
+        return bound
+
+    def _record(self, output: BaseModel, elements: dict[int, str], url: str | None) -> PlanStep:
+        data = output.model_dump(mode='json', exclude_unset=True)
+        targets = {}
+        for position, action in enumerate(data.get('action', [])):
+            for params in action.values():
+                if isinstance(params, dict) and isinstance(params.get('index'), int):
+                    description = elements.get(params['index'])
+                    if description:
+                        targets[position] = description
+        step = PlanStep(output=data, targets=targets, url=url)
+        self._recorded.append(step)
+        return step
+
+    @staticmethod
+    def _signature(step: PlanStep) -> list[tuple]:
+        """O que o passo faz na página: ações, parâmetros (menos o índice) e alvos."""
+        signature = []
+        for position, action in enumerate(step.output.get('action', [])):
+            for name, params in action.items():
+                if name in NEVER_REPLAY or not isinstance(params, dict):
+                    # Leitura/encerramento: o texto varia e não muda a página
+                    signature.append((name, None, None))
+                    continue
+                rest = json.dumps({k: v for k, v in params.items() if k != 'index'}, sort_keys=True)
+                signature.append((name, rest, step.targets.get(position)))
+        return signature
+
+    async def ainvoke(
+        self,
+        messages: list[BaseMessage],
+        output_format: type[T] | None = None,
+        **kwargs: Any,
+    ) -> ChatInvokeCompletion[T] | ChatInvokeCompletion[str]:
+        if output_format is None:
+            return await self.llm.ainvoke(messages, output_format, **kwargs)
+
+        elements = element_map(messages)
+        url = page_url(messages)
+        step = None
+        if self._plan is not None and not self._diverged and self._cursor < len(self._plan):
+            if self._previous_failed():
+                self._diverged = True
+            else:
+                step = self._plan[self._cursor]
+
+        if step is not None:
+            bound = self._bind(step, elements, url)
+            if bound is not None:
+                try:
+                    parsed = output_format.model_validate(bound)
+                except Exception:
+                    parsed = None
+                if parsed is not None:
+                    # Monta a resposta antes de mexer no cursor/gravação: se falhar, nada muda
+                    completion = ChatInvokeCompletion(
+                        completion=parsed,
+                        usage=ChatInvokeUsage(
+                            prompt_tokens=0,
+                            completion_tokens=0,
+                            total_tokens=0,
+                            prompt_cached_tokens=0,
+                            prompt_cache_creation_tokens=0,
+                            prompt_image_tokens=0,
+                        ),
+                    )
+                    self._cursor += 1
+                    self.replayed += 1
+                    self._record(parsed, elements, url)
+                    return completion
+        if self._plan is not None and self._cursor < len(self._plan):
+            self.fallbacks += 1
+
+        result = await self.llm.ainvoke(messages, output_format, **kwargs)
+        executed = self._record(result.completion, elements, url)
+        if step is not None:
+            # O LLM fez o passo gravado: o plano segue dali; senão, a execução saiu do roteiro
+            if self._signature(executed) == self._signature(step):
+                self._cursor += 1
+            else:
+                self._diverged = True
+        return result
+
+    def save_plan(self) -> None:
+        """Grava os passos desta execução como o plano da tarefa (chamar só se ela passou)."""
+        if self._recorded:
+            self.store.save(self.task, self._recorded)
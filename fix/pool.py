@@ -0,0 +1,237 @@
+import asyncio
+import itertools
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from fix.retry import is_transient
+
+if TYPE_CHECKING:
+    import httpx
+    from langchain_core.language_models.chat_models import BaseChatModel as LangChainBaseChatModel
+
+
+@dataclass
+class Endpoint:
+    """Um servidor de inferência (modelo LangChain já configurado) dentro do pool."""
+    chat: 'LangChainBaseChatModel'
+    name: str
+    # Verificação opcional de saúde (ex: GET /models); True = saudável
+    health_check: Callable[[], Awaitable[bool]] | None = None
+    outstanding: int = 0
+    failures: int = 0
+    unhealthy_until: float = 0.0
+    requests: int = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+
+class NoHealthyEndpointError(Exception):
+    pass
+
+
+@dataclass
+class EndpointPool:
+    """
+    Pool de endpoints com roteamento por menor número de requisições em andamento,
+    failover e quarentena de endpoints com falha.
+
+    Expõe ``ainvoke``/``astream`` com a mesma assinatura do LangChain, então o
+    ChatLangchain o usa no lugar do modelo único. Um endpoint que falha fica em
+    quarentena por ``cooldown`` segundos (dobrando a cada falha seguida, até
+    ``max_cooldown``); depois recebe novamente uma requisição de teste. Só
+    erros transitórios (fix.retry.is_transient) contam como falha do endpoint;
+    os demais são da requisição e sobem sem failover.
+    """
+    endpoints: list[Endpoint]
+    cooldown: float = 5.0
+    max_cooldown: float = 120.0
+    _round_robin: itertools.count = field(default_factory=itertools.count, repr=False)
+    _health_task: asyncio.Task | None = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        if not self.endpoints:
+            raise ValueError('EndpointPool requires at least one endpoint')
+
+    def _pick(self, exclude: set[int]) -> Endpoint:
+        candidates = [e for e in self.endpoints if id(e) not in exclude and e.healthy]
+        if not candidates:
+            # Todos em quarentena: tenta o que volta primeiro em vez de falhar de imediato
+            candidates = [e for e in self.endpoints if id(e) not in exclude]
+            if not candidates:
+                raise NoHealthyEndpointError('All endpoints failed')
+            return min(candidates, key=lambda e: e.unhealthy_until)
+
+        least = min(e.outstanding for e in candidates)
+        tied = [e for e in candidates if e.outstanding == least]
+        return tied[next(self._round_robin) % len(tied)]
+
+    def _mark_failure(self, endpoint: Endpoint) -> None:
+        endpoint.failures += 1
+        delay = min(self.cooldown * 2 ** (endpoint.failures - 1), self.max_cooldown)
+        endpoint.unhealthy_until = time.monotonic() + delay
+
+    def _mark_success(self, endpoint: Endpoint) -> None:
+        endpoint.failures = 0
+        endpoint.unhealthy_until = 0.0
+
+    async def ainvoke(self, messages: list, **kwargs: Any) -> Any:
+        return await self._call(lambda endpoint: endpoint.chat.ainvoke(messages, **kwargs))
+
+    def with_structured_output(self, *args: Any, **kwargs: Any) -> '_PoolRunnable':
+        """Structured output do LangChain criado em cada endpoint, com o mesmo roteamento e failover."""
+        return _PoolRunnable(self, lambda chat: chat.with_structured_output(*args, **kwargs))
+
+    async def _call(self, call: Callable[[Endpoint], Awaitable[Any]]) -> Any:
+        tried: set[int] = set()
+        while True:
+            endpoint = self._pick(tried)
+            tried.add(id(endpoint))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            try:
+                response = await call(endpoint)
+            except Exception as e:
+                if not is_transient(e):
+                    # Erro da requisição (400, contexto estourado): o endpoint está
+                    # saudável e os outros responderiam o mesmo
+                    raise
+                self._mark_failure(endpoint)
+                if len(tried) == len(self.endpoints):
+                    raise
+                continue
+            finally:
+                endpoint.outstanding -= 1
+            self._mark_success(endpoint)
+            return response
+
+    async def astream(self, messages: list, **kwargs: Any) -> AsyncIterator[Any]:
+        """Failover só antes do primeiro chunk; depois disso o erro é propagado."""
+        tried: set[int] = set()
+        while True:
+            endpoint = self._pick(tried)
+            tried.add(id(endpoint))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            started = False
+            try:
+                async for chunk in endpoint.chat.astream(messages, **kwargs):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                self._mark_failure(endpoint)
+                if started or len(tried) == len(self.endpoints):
+                    raise
+                continue
+            finally:
+                endpoint.outstanding -= 1
+            self._mark_success(endpoint)
+            return
+
+    async def check_health(self) -> None:
+        """Executa os health checks configurados e atualiza a quarentena."""
+
+        async def check(endpoint: Endpoint) -> None:
+            assert endpoint.health_check is not None
+            try:
+                ok = await endpoint.health_check()
+            except Exception:
+                ok = False
+            if ok:
+                self._mark_success(endpoint)
+            elif endpoint.healthy:
+                self._mark_failure(endpoint)
+
+        await asyncio.gather(*(check(e) for e in self.endpoints if e.health_check is not None))
+
+    def start_health_checks(self, interval: float = 15.0) -> None:
+        """Agenda health checks periódicos no event loop atual."""
+
+        async def loop() -> None:
+            while True:
+                await self.check_health()
+                await asyncio.sleep(interval)
+
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(loop())
+
+    def stop_health_checks(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [
+            {
+                'endpoint': e.name,
+                'requests': e.requests,
+                'outstanding': e.outstanding,
+                'healthy': e.healthy,
+                'failures': e.failures,
+            }
+            for e in self.endpoints
+        ]
+
+
+@dataclass
+class _PoolRunnable:
+    """Um runnable do LangChain (ex: with_structured_output) por endpoint, chamado pelo pool."""
+    pool: EndpointPool
+    build: Callable[[Any], Any]
+    _runnables: dict[int, Any] = field(default_factory=dict, repr=False)
+
+    def _for(self, endpoint: Endpoint) -> Any:
+        runnable = self._runnables.get(id(endpoint))
+        if runnable is None:
+            runnable = self._runnables[id(endpoint)] = self.build(endpoint.chat)
+        return runnable
+
+    async def ainvoke(self, messages: list, **kwargs: Any) -> Any:
+        return await self.pool._call(lambda endpoint: self._for(endpoint).ainvoke(messages, **kwargs))
+
+
+def build_openai_pool(
+    targets: list[tuple[str, str]],
+    api_key: str,
+    max_connections: int = 64,
+    http_client: 'httpx.AsyncClient | None' = None,
+    **chat_kwargs: Any,
+) -> EndpointPool:
+    """
+    Cria um EndpointPool de ChatOpenAI, um por (base_url, modelo), compartilhando
+    um único httpx.AsyncClient (pool de conexões keep-alive por host).
+    """
+    import httpx
+    from langchain_openai import ChatOpenAI  # pyright: ignore
+
+    client = http_client or httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(600.0, connect=10.0),
+    )
+
+    def models_check(base_url: str) -> Callable[[], Awaitable[bool]]:
+        async def check() -> bool:
+            response = await client.get(
+                f'{base_url.rstrip("/")}/models',
+                headers={'Authorization': f'Bearer {api_key}'},
+                timeout=5.0,
+            )
+            # 401/404 (chave ou base_url errados) não saem da quarentena: só 2xx é saudável
+            return response.is_success
+
+        return check
+
+    endpoints = [
+        Endpoint(
+            chat=ChatOpenAI(base_url=base_url, model=model, api_key=api_key, http_async_client=client, **chat_kwargs),
+            name=f'{base_url}#{model}',
+            health_check=models_check(base_url),
+        )
+        for base_url, model in targets
+    ]
+    return EndpointPool(endpoints=endpoints)
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from typing import Any
+
+
+class StatePrefetcher:
+    """
+    Pipeline entre passos do agente: assim que as ações de um passo terminam,
+    o estado do próximo passo (DOM + screenshot, já esperando a página
+    estabilizar) é pedido ao navegador em segundo plano, enquanto o browser-use
+    fecha o passo (downloads, item do histórico, hooks on_step_end como trace
+    e captura de texto da página). O ``_prepare_context`` do passo seguinte
+    recebe o estado pronto, e a chamada ao LLM sai assim que ele fica disponível.
+
+    Só recebe o estado antecipado a chamada com os mesmos argumentos da
+    antecipação (os do ``_prepare_context``: com screenshot, sem cache); as
+    outras vão direto ao navegador. Se alguma ação rodou depois do início da
+    antecipação (contador em ``tools.act``), ou se ela falhar, o estado é
+    descartado e o pedido cai no caminho normal.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.errors = 0
+        # Antecipações jogadas fora porque uma ação rodou depois delas
+        self.discarded = 0
+        # Tempo em que a captura do estado correu em paralelo com o fim do passo
+        self.overlap = 0.0
+        self._task: asyncio.Task | None = None
+        self._started = 0.0
+        # Argumentos da antecipação e o contador de ações quando ela começou
+        self._request: dict[str, Any] = {}
+        self._actions = 0
+        self._task_actions = 0
+        self._agent: Any = None
+        self._original_multi_act: Any = None
+        self._original_get_state: Any = None
+        self._act: Any = None
+
+    def attach(self, agent: Any) -> None:
+        """Instala o pipeline no agente (antes de ``agent.run``)."""
+        if self._agent is not None:
+            raise RuntimeError('StatePrefetcher is already attached to an agent')
+        self._agent = agent
+        session = agent.browser_session
+        self._original_multi_act = agent.multi_act
+        self._original_get_state = session.get_browser_state_summary
+        original_act = agent.tools.act
+
+        async def act(*args: Any, **kwargs: Any) -> Any:
+            self._actions += 1
+            return await original_act(*args, **kwargs)
+
+        async def multi_act(actions: list, *args: Any, **kwargs: Any) -> list:
+            results = await self._original_multi_act(actions, *args, **kwargs)
+            if not any(r.is_done for r in results) and not agent.state.stopped:
+                self._start(agent)
+            return results
+
+        async def get_browser_state_summary(
+            include_screenshot: bool = True, cached: bool = False, include_recent_events: bool = False
+        ) -> Any:
+            request = {
+                'include_screenshot': include_screenshot,
+                'cached': cached,
+                'include_recent_events': include_recent_events,
+            }
+            if self._task is None or request != self._request:
+                return await self._original_get_state(**request)
+
+            task, self._task = self._task, None
+            if self._actions != self._task_actions:
+                task.cancel()
+                self.discarded += 1
+                return await self._original_get_state(**request)
+
+            waited = time.perf_counter()
+            try:
+                state = await task
+            except Exception:
+                self.errors += 1
+                return await self._original_get_state(**request)
+            self.hits += 1
+            self.overlap += waited - self._started
+            return state
+
+        agent.multi_act = multi_act
+        self._act = act
+        agent.tools.act = act
+        # BrowserSession é um modelo Pydantic (extra='forbid'): grava direto no __dict__
+        object.__setattr__(session, 'get_browser_state_summary', get_browser_state_summary)
+
+    def _start(self, agent: Any) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        # Mesmos parâmetros do _prepare_context do browser-use
+        self._started = time.perf_counter()
+        self._task_actions = self._actions
+        self._request = {
+            'include_screenshot': True,
+            'cached': False,
+            'include_recent_events': agent.include_recent_events,
+        }
+        self._task = asyncio.create_task(self._original_get_state(**self._request))
+        # Falha não consumida (fim da execução) não vira aviso de exceção não lida
+        self._task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def detach(self) -> None:
+        """Remove o pipeline (a sessão do navegador volta ao pool sem o wrapper)."""
+        if self._agent is None:
+            return
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Os wrappers são atributos da instância: apagar restaura os métodos da classe
+        self._agent.__dict__.pop('multi_act', None)
+        self._agent.browser_session.__dict__.pop('get_browser_state_summary', None)
+        tools = self._agent.tools.__dict__
+        if tools.get('act') is self._act:
+            tools.pop('act')
+        self._act = None
+        self._agent = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'errors': self.errors,
+            'discarded': self.discarded,
+            'overlap_seconds': round(self.overlap, 3),
+        }
@@ -0,0 +1,98 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Literal
+
+StructuredOutputStrategy = Literal['native', 'json_mode', 'text']
+
+# Estratégias de structured output, da preferida para a mais permissiva
+STRUCTURED_OUTPUT_STRATEGIES: tuple[StructuredOutputStrategy, ...] = ('native', 'json_mode', 'text')
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """
+    Como o ChatLangchain deve falar com uma família de modelos.
+
+    - structured_output: caminho mais rápido que funciona para o modelo; None
+      testa STRUCTURED_OUTPUT_STRATEGIES na primeira chamada e memoriza
+    - repair: aplica o reparo guiado pelo schema (fix/repair.py) na saída em texto
+    - stream: usa astream e valida assim que o objeto JSON fecha (só 'text')
+    - vision: aceita screenshots
+    - context_tokens/max_output_tokens: limites de tokens (None = desconhecido);
+      o contexto menos a saída é o orçamento padrão do HistoryWindow
+    - cache_prompt: o servidor entende ``cache_prompt`` (llama.cpp/llama-swap)
+    """
+    name: str
+    # Regex buscada no nome do modelo (minúsculo); None = qualquer modelo
+    match: str | None = None
+    # Provedor exigido ('openai', 'ollama', 'langchain'); None = qualquer
+    provider: str | None = None
+    structured_output: StructuredOutputStrategy | None = None
+    repair: bool = True
+    stream: bool = False
+    vision: bool = False
+    context_tokens: int | None = None
+    max_output_tokens: int | None = None
+    cache_prompt: bool = True
+
+    def matches(self, model: str, provider: str) -> bool:
+        if self.provider is not None and self.provider != provider:
+            return False
+        return self.match is None or re.search(self.match, model) is not None
+
+
+DEFAULT_PROFILE = ModelProfile(name='default')
+
+# Do mais específico para o mais genérico; o primeiro que casar vence
+PROFILES: list[ModelProfile] = [
+    # Segue bem o prompt em texto, mas troca nomes de campos (element/value):
+    # texto + reparo é mais rápido que o json_schema (gramática) no llama.cpp
+    ModelProfile(
+        name='qwen3-coder',
+        match=r'qwen3-coder',
+        structured_output='text',
+        context_tokens=262144,
+        max_output_tokens=4096,
+    ),
+    ModelProfile(
+        name='qwen3-vl',
+        match=r'qwen(3|2\.5)-vl',
+        structured_output='text',
+        vision=True,
+        context_tokens=262144,
+        max_output_tokens=4096,
+    ),
+    # format=json_schema do Ollama (gramática): saída sempre válida
+    ModelProfile(
+        name='ollama',
+        provider='ollama',
+        structured_output='native',
+        cache_prompt=False,
+    ),
+    ModelProfile(
+        name='openai',
+        match=r'^(gpt-|chatgpt-|o\d)',
+        provider='openai',
+        structured_output='native',
+        repair=False,
+        vision=True,
+        context_tokens=128000,
+        max_output_tokens=16384,
+        # A API da OpenAI rejeita campos desconhecidos no corpo
+        cache_prompt=False,
+    ),
+]
+
+
+def register_profile(profile: ModelProfile) -> None:
+    """Adiciona um perfil com prioridade sobre os existentes."""
+    PROFILES.insert(0, profile)
+    profile_for.cache_clear()
+
+
+@lru_cache(maxsize=64)
+def profile_for(model: str, provider: str = 'openai') -> ModelProfile:
+    """Perfil do modelo, pelo nome (ex: 'qwen3-coder:30b') e provedor; DEFAULT_PROFILE se nenhum casar."""
+    model = model.lower()
+    return next((p for p in PROFILES if p.matches(model, provider)), DEFAULT_PROFILE)
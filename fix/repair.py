@@ -0,0 +1,312 @@
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from pydantic import BaseModel
+
+from browser_use.llm.exceptions import ModelProviderError
+
+# Nomes alternativos que os modelos locais (Qwen) usam para campos conhecidos.
+# Só são aplicados onde o schema declara o campo de destino e não declara o alias.
+FIELD_ALIASES: dict[str, tuple[str, ...]] = {
+    'index': ('element', 'element_index', 'elementIndex', 'element_id', 'idx'),
+    'text': ('value', 'content', 'input_text'),
+    'url': ('link', 'href'),
+}
+
+class OutputValidationError(ModelProviderError):
+    """Saída do modelo que não é JSON válido ou não valida contra o output_format."""
+
+    def __init__(self, message: str, raw: str, error: str, model: str | None = None):
+        super().__init__(message, model=model)
+        self.raw = raw
+        self.error = error
+
+
+@dataclass(eq=False)
+class _Node:
+    """Plano de reparo de um nó do schema JSON."""
+    types: frozenset[str] = frozenset()
+    properties: dict[str, '_Node'] = field(default_factory=dict)
+    # alias -> propriedade declarada
+    aliases: dict[str, str] = field(default_factory=dict)
+    additional: '_Node | None' = None
+    items: '_Node | None' = None
+
+
+class _Compiler:
+    def __init__(self, schema: dict[str, Any]):
+        self.defs = schema.get('$defs', {})
+        self.by_ref: dict[str, _Node] = {}
+
+    def compile(self, schema: dict[str, Any]) -> _Node:
+        ref = schema.get('$ref')
+        if ref is not None:
+            name = ref.rsplit('/', 1)[-1]
+            if name not in self.by_ref:
+                # Registra antes de compilar para suportar schemas recursivos
+                node = self.by_ref[name] = _Node()
+                self._fill(node, self.defs.get(name, {}))
+            return self.by_ref[name]
+
+        node = _Node()
+        self._fill(node, schema)
+        return node
+
+    def _fill(self, node: _Node, schema: dict[str, Any]) -> None:
+        variants = schema.get('anyOf') or schema.get('oneOf') or schema.get('allOf')
+        if variants:
+            # Optional[X] / Union: junta as variantes não nulas num único plano
+            for variant in variants:
+                self._merge(node, self.compile(variant))
+            return
+
+        schema_type = schema.get('type')
+        types = set(schema_type) if isinstance(schema_type, list) else {schema_type} if schema_type else set()
+        if 'properties' in schema:
+            types.add('object')
+        node.types = node.types | frozenset(types)
+
+        for name, prop in schema.get('properties', {}).items():
+            node.properties[name] = self.compile(prop)
+        additional = schema.get('additionalProperties')
+        if isinstance(additional, dict):
+            node.additional = self.compile(additional)
+        if 'items' in schema and isinstance(schema['items'], dict):
+            node.items = self.compile(schema['items'])
+
+        for target, aliases in FIELD_ALIASES.items():
+            if target in node.properties:
+                for alias in aliases:
+                    if alias not in node.properties:
+                        node.aliases[alias] = target
+        for name in node.properties:
+            camel = ''.join(part.capitalize() if i else part for i, part in enumerate(name.split('_')))
+            if camel != name and camel not in node.properties:
+                node.aliases.setdefault(camel, name)
+
+    @staticmethod
+    def _merge(node: _Node, other: _Node) -> None:
+        node.types = node.types | other.types
+        for name, prop in other.properties.items():
+            node.properties.setdefault(name, prop)
+        for alias, target in other.aliases.items():
+            node.aliases.setdefault(alias, target)
+        node.additional = node.additional or other.additional
+        node.items = node.items or other.items
+
+
+_plans: 'WeakKeyDictionary[type[BaseModel], _Node]' = WeakKeyDictionary()
+
+
+def compile_plan(output_format: type[BaseModel]) -> _Node:
+    """Compila (uma vez por classe) o plano de aliases/coerções a partir do schema Pydantic."""
+    plan = _plans.get(output_format)
+    if plan is None:
+        schema = output_format.model_json_schema()
+        plan = _plans[output_format] = _Compiler(schema).compile(schema)
+    return plan
+
+
+def _coerce(value: Any, node: _Node, repairs: Counter[str]) -> Any:
+    types = node.types
+    if not types or isinstance(value, (dict, list)) or value is None:
+        return value
+    if isinstance(value, str):
+        if 'string' in types:
+            return value
+        stripped = value.strip()
+        try:
+            if 'integer' in types and re.fullmatch(r'[-+]?\d+', stripped):
+                repairs['str->int'] += 1
+                return int(stripped)
+            if 'number' in types:
+                number = float(stripped)
+                repairs['str->number'] += 1
+                return number
+        except ValueError:
+            return value
+        if 'boolean' in types and stripped.lower() in ('true', 'false'):
+            repairs['str->bool'] += 1
+            return stripped.lower() == 'true'
+        return value
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and 'string' in types and not types & {'integer', 'number'}:
+        repairs['number->str'] += 1
+        return str(value)
+    if isinstance(value, float) and 'integer' in types and 'number' not in types and value.is_integer():
+        repairs['float->int'] += 1
+        return int(value)
+    return value
+
+
+def _apply(value: Any, node: _Node, repairs: Counter[str]) -> Any:
+    if isinstance(value, dict):
+        for alias, target in node.aliases.items():
+            if alias in value and target not in value:
+                value[target] = value.pop(alias)
+                repairs[f'{alias}->{target}'] += 1
+        for key, child in node.properties.items():
+            if key in value:
+                value[key] = _apply(value[key], child, repairs)
+        if node.additional is not None:
+            for key in value:
+                if key not in node.properties:
+                    value[key] = _apply(value[key], node.additional, repairs)
+        return value
+
+    if isinstance(value, list):
+        if node.items is not None:
+            for i, item in enumerate(value):
+                value[i] = _apply(item, node.items, repairs)
+        return value
+
+    if isinstance(value, str) and 'string' not in node.types and node.types & {'object', 'array'}:
+        # Objeto/lista devolvido como string JSON
+        try:
+            decoded = json.loads(value)
+        except json.JSONDecodeError:
+            return value
+        repairs['json-string'] += 1
+        return _apply(decoded, node, repairs)
+
+    return _coerce(value, node, repairs)
+
+
+def repair_data(data: Any, output_format: type[BaseModel], repairs: Counter[str] | None = None) -> Any:
+    """
+    Aplica o plano do output_format aos dados já parseados, numa única passada e
+    no lugar (sem reconstruir subárvores): renomeia aliases, converte tipos
+    (ex: "5" -> 5) e embrulha objeto único em lista quando o schema pede array.
+    """
+    repairs = repairs if repairs is not None else Counter()
+    plan = compile_plan(output_format)
+    if isinstance(data, dict):
+        for key, child in plan.properties.items():
+            if key in data and child.items is not None and isinstance(data[key], dict):
+                data[key] = [data[key]]
+                repairs['object->list'] += 1
+    return _apply(data, plan, repairs)
+
+
+def repair_json_text(text: str) -> str:
+    """
+    Reconstrói um JSON quebrado: ignora texto antes do primeiro '{'/'[', e depois
+    do valor de nível superior, remove vírgulas finais e fecha strings e
+    colchetes de saídas truncadas (max_tokens atingido).
+    """
+    start = min((i for i in (text.find('{'), text.find('[')) if i >= 0), default=-1)
+    if start < 0:
+        return text
+
+    out: list[str] = []
+    stack: list[str] = []
+    in_string = False
+    escape = False
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                return ''.join(out)
+            continue
+        out.append(ch)
+
+    # Saída truncada: fecha a string aberta e descarta o último membro incompleto
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    candidate = _close(out, stack)
+    while True:
+        try:
+            json.loads(candidate)
+            return candidate
+        except json.JSONDecodeError:
+            cut = _last_separator(out)
+            if cut is None:
+                return candidate
+            del out[cut:]
+            stack = _open_brackets(out)
+            candidate = _close(out, stack)
+
+
+def _strip_trailing_comma(out: list[str]) -> None:
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ',':
+        del out[i:]
+
+
+def _close(out: list[str], stack: list[str]) -> str:
+    body = out[:]
+    _strip_trailing_comma(body)
+    while body and body[-1].isspace():
+        body.pop()
+    if body and body[-1] == ':':
+        body.pop()
+    return ''.join(body) + ''.join(reversed(stack))
+
+
+def _open_brackets(out: list[str]) -> list[str]:
+    stack: list[str] = []
+    in_string = escape = False
+    for ch in out:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+    return stack
+
+
+def _last_separator(out: list[str]) -> int | None:
+    """Posição da última vírgula ou abertura fora de string (onde cortar um membro incompleto)."""
+    in_string = escape = False
+    last = None
+    for i, ch in enumerate(out):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == ',':
+            last = i
+        elif ch in '{[':
+            last = i + 1
+    if last is None or last >= len(out):
+        return None
+    return last
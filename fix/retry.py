@@ -0,0 +1,149 @@
+import random
+import time
+from dataclasses import dataclass, field
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from browser_use.llm.exceptions import ModelProviderError
+
+# Erros transitórios conhecidos (openai, httpx, LangChain), comparados pelo nome
+# da classe para não importar os SDKs aqui
+TRANSIENT_ERROR_NAMES = frozenset({
+    'APIConnectionError',
+    'APITimeoutError',
+    'RateLimitError',
+    'InternalServerError',
+    'ServiceUnavailableError',
+    'ConnectError',
+    'ConnectTimeout',
+    'ReadError',
+    'ReadTimeout',
+    'RemoteProtocolError',
+    'PoolTimeout',
+    'NoHealthyEndpointError',
+})
+# 408/409/429 e 5xx: o llama-swap responde 502/503 enquanto troca de modelo
+TRANSIENT_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+REPROMPT_ERROR_CHARS = 500
+
+
+class CircuitOpenError(ModelProviderError):
+    pass
+
+
+def _causes(error: BaseException):
+    seen: set[int] = set()
+    current: BaseException | None = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+def find_cause(error: BaseException, kind: type[BaseException]) -> BaseException | None:
+    """Primeira exceção do tipo ``kind`` na cadeia de causas (o adapter embrulha tudo em ModelProviderError)."""
+    return next((e for e in _causes(error) if isinstance(e, kind)), None)
+
+
+def is_transient(error: BaseException) -> bool:
+    for cause in _causes(error):
+        if isinstance(cause, CircuitOpenError):
+            return False
+        if isinstance(cause, (TimeoutError, ConnectionError)):
+            return True
+        if type(cause).__name__ in TRANSIENT_ERROR_NAMES:
+            return True
+        status = getattr(cause, 'status_code', None)
+        if isinstance(cause, ModelProviderError) and status == 502:
+            # 502 é o padrão do ModelProviderError: não indica erro de servidor
+            continue
+        if status in TRANSIENT_STATUS_CODES:
+            return True
+    return False
+
+
+@dataclass
+class CircuitBreaker:
+    """
+    Disjuntor de um endpoint: após ``failure_threshold`` falhas transitórias
+    seguidas, abre e recusa chamadas por ``reset_timeout`` segundos; depois
+    deixa passar uma chamada de teste (half-open), que fecha ou reabre o circuito.
+    """
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    failures: int = 0
+    opened_at: float | None = None
+    _probing: bool = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == 'open' or (state == 'half-open' and self._probing):
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at) if self.opened_at else 0.0
+            raise CircuitOpenError(f'Circuit open after {self.failures} failures; retry in {max(remaining, 0):.0f}s')
+        if state == 'half-open':
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release(self) -> None:
+        """Libera a chamada de teste sem resultado (chamada cancelada)."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Política de novas tentativas do ChatLangchain.
+
+    - erros transitórios (timeout, conexão, 429/5xx, troca de modelo no
+      llama-swap) são repetidos até ``max_attempts`` vezes, com backoff
+      exponencial e jitter completo (entre 0 e base * 2^tentativa, até ``max_delay``)
+    - ``timeout`` limita cada chamada ao modelo (None = sem limite)
+    - saída inválida (JSON/validação) não é repetida às cegas: o modelo recebe
+      a própria resposta e o erro, e corrige (``reprompt_attempts`` vezes). Com
+      o prefixo estável, o servidor reaproveita o KV cache do prompt inteiro
+      e só processa as duas mensagens novas
+    - ``breaker`` protege o endpoint único; com EndpointPool, a quarentena
+      por endpoint do pool faz esse papel
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    timeout: float | None = 300.0
+    reprompt_attempts: int = 1
+    breaker: CircuitBreaker | None = field(default_factory=CircuitBreaker)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def reprompt_messages(langchain_messages: list, raw: str, error: str) -> list:
+    """Mensagens para a nova tentativa: a resposta inválida e o erro (curto) como feedback."""
+    if len(error) > REPROMPT_ERROR_CHARS:
+        error = error[:REPROMPT_ERROR_CHARS] + '...'
+    return [
+        *langchain_messages,
+        AIMessage(content=raw),
+        HumanMessage(
+            content=f'Your previous reply could not be used: {error}\n'
+            'Reply again with only the corrected JSON object, following the required schema.'
+        ),
+    ]
@@ -0,0 +1,194 @@
+import re
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+
+from browser_use.llm.messages import BaseMessage, UserMessage
+from browser_use.llm.views import ChatInvokeCompletion
+
+from fix.metrics import ChatMetrics
+from fix.plan import element_map
+from fix.repair import OutputValidationError
+from fix.retry import CircuitOpenError, find_cause, is_transient
+from fix.trace import current_run
+
+T = TypeVar('T', bound=BaseModel)
+
+_STEP = re.compile(r'<step_info>Step(\d+) maximum:(\d+)')
+
+
+def _last_step(messages: list[BaseMessage]) -> bool:
+    """Último passo permitido: o browser-use exige o done, que leva o relatório final."""
+    for message in reversed(messages):
+        if not isinstance(message, UserMessage):
+            continue
+        content = message.content
+        text = content if isinstance(content, str) else '\n'.join(p.text for p in content if p.type == 'text')
+        match = _STEP.search(text)
+        if match is not None:
+            return int(match.group(1)) >= int(match.group(2))
+    return False
+
+
+def step_confidence(output: BaseModel, messages: list[BaseMessage]) -> float:
+    """
+    Confiança (0-1) na saída do modelo pequeno, por heurísticas baratas:
+    - 0: alguma ação aponta para um índice que não existe na página atual
+    - 0.5: o próprio modelo avalia o passo anterior como falha (está preso)
+    """
+    elements = element_map(messages)
+    if elements:
+        for action in output.model_dump(mode='json', exclude_unset=True, include={'action'}).get('action', []):
+            for params in action.values():
+                index = params.get('index') if isinstance(params, dict) else None
+                if isinstance(index, int) and index not in elements:
+                    return 0.0
+    evaluation = getattr(output, 'evaluation_previous_goal', None) or ''
+    if evaluation.strip().lower().startswith('fail'):
+        return 0.5
+    return 1.0
+
+
+def _failure_reason(error: Exception) -> str:
+    """Motivo da escalada quando a chamada ao modelo pequeno falha."""
+    if find_cause(error, OutputValidationError) is not None:
+        return 'invalid'
+    if find_cause(error, CircuitOpenError) is not None or is_transient(error):
+        # Servidor do pequeno fora do ar: não é saída ruim do modelo
+        return 'unavailable'
+    return 'error'
+
+
+def _is_done(output: BaseModel) -> bool:
+    actions = output.model_dump(mode='json', exclude_unset=True, include={'action'}).get('action', [])
+    return any('done' in action for action in actions)
+
+
+@dataclass
+class ModelRouter:
+    """
+    Roteia cada passo do agente entre um modelo pequeno (rápido) e um grande.
+
+    Por padrão o passo vai para ``small``; a mesma chamada é refeita no
+    ``large`` (escalada) quando:
+    - invalid: a saída do pequeno não valida (depois do reparo)
+    - unavailable: o servidor do pequeno não responde (erro transitório, disjuntor aberto)
+    - error: qualquer outro erro da chamada (ex: contexto maior que o do pequeno)
+    - low_confidence: ``confidence(saída, mensagens)`` < ``min_confidence``
+      (padrão: step_confidence)
+    - final: o pequeno encerra a tarefa (``done``); o relatório final é escrito
+      pelo grande. No último passo permitido a chamada já vai direto para ele
+    Depois de uma escalada por falha, os próximos ``sticky_steps`` passos da
+    mesma execução (``current_run``) vão direto para o grande; só as últimas
+    ``max_runs`` execuções são lembradas.
+
+    Chamadas sem output_format ou sem campo ``action`` (extração de conteúdo)
+    vão sempre para o pequeno. ``stats`` traz a taxa de escalada por motivo e a
+    latência média por passo.
+    """
+    small: Any
+    large: Any
+    min_confidence: float = 0.6
+    confidence: Callable[[BaseModel, list[BaseMessage]], float] = step_confidence
+    escalate_final: bool = True
+    sticky_steps: int = 1
+    max_runs: int = 256
+    metrics: ChatMetrics | None = None
+    steps: int = 0
+    small_steps: int = 0
+    large_steps: int = 0
+    escalations: Counter[str] = field(default_factory=Counter)
+    step_time: float = 0.0
+    _sticky: OrderedDict[str | None, int] = field(default_factory=OrderedDict, repr=False)
+    _verified_api_keys: bool = False
+
+    @property
+    def model(self) -> str:
+        return self.small.model
+
+    @property
+    def provider(self) -> str:
+        return self.small.provider
+
+    @property
+    def name(self) -> str:
+        return self.small.name
+
+    def _escalate(self, reason: str) -> None:
+        self.escalations[reason] += 1
+        if self.metrics is not None:
+            self.metrics.count(f'route_escalation_{reason}', self.large.name)
+        if reason != 'final' and self.sticky_steps:
+            run = current_run.get()
+            self._sticky[run] = self.sticky_steps
+            self._sticky.move_to_end(run)
+            if len(self._sticky) > self.max_runs:
+                self._sticky.popitem(last=False)
+
+    def _take_sticky(self) -> bool:
+        """Consome um passo fixo no grande da execução atual, se houver."""
+        run = current_run.get()
+        remaining = self._sticky.get(run)
+        if not remaining:
+            return False
+        if remaining > 1:
+            self._sticky[run] = remaining - 1
+        else:
+            del self._sticky[run]
+        return True
+
+    async def _large(self, messages: list[BaseMessage], output_format: type[T], **kwargs: Any) -> ChatInvokeCompletion[T]:
+        self.large_steps += 1
+        return await self.large.ainvoke(messages, output_format, **kwargs)
+
+    async def ainvoke(
+        self,
+        messages: list[BaseMessage],
+        output_format: type[T] | None = None,
+        **kwargs: Any,
+    ) -> ChatInvokeCompletion[T] | ChatInvokeCompletion[str]:
+        if output_format is None or 'action' not in output_format.model_fields:
+            return await self.small.ainvoke(messages, output_format, **kwargs)
+
+        started = time.perf_counter()
+        self.steps += 1
+        try:
+            if self._take_sticky():
+                return await self._large(messages, output_format, **kwargs)
+            if self.escalate_final and _last_step(messages):
+                self._escalate('final')
+                return await self._large(messages, output_format, **kwargs)
+
+            try:
+                result = await self.small.ainvoke(messages, output_format, **kwargs)
+            except Exception as e:
+                self._escalate(_failure_reason(e))
+                return await self._large(messages, output_format, **kwargs)
+
+            output = result.completion
+            if self.escalate_final and _is_done(output):
+                self._escalate('final')
+                return await self._large(messages, output_format, **kwargs)
+            if self.confidence(output, messages) < self.min_confidence:
+                self._escalate('low_confidence')
+                return await self._large(messages, output_format, **kwargs)
+
+            self.small_steps += 1
+            return result
+        finally:
+            self.step_time += time.perf_counter() - started
+
+    def stats(self) -> dict[str, Any]:
+        escalated = sum(self.escalations.values())
+        return {
+            'steps': self.steps,
+            'small': self.small_steps,
+            'large': self.large_steps,
+            'escalation_rate': escalated / self.steps if self.steps else 0.0,
+            'escalations': dict(self.escalations),
+            'mean_step_seconds': self.step_time / self.steps if self.steps else 0.0,
+        }
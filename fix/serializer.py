@@ -1,5 +1,9 @@
 import json
-from typing import overload
+import re
+import textwrap
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import TYPE_CHECKING, ClassVar, overload
 
 from langchain_core.messages import (  # pyright: ignore
 	AIMessage,
@@ -24,10 +28,42 @@ from browser_use.llm.messages import (
 	SystemMessage as BrowserUseSystemMessage,
 )
 
+if TYPE_CHECKING:
+	from fix.dom_diff import StateDiff
+	from fix.history import HistoryWindow
+	from fix.vision import VisionBudget
+
+
+# Max number of serialized system prompts kept in the cache (one per agent configuration).
+SERIALIZATION_CACHE_SIZE = 16
+
+_BLANK_LINES = re.compile(r'\n{3,}')
+# Task block inside <agent_state>, which browser-use places after the growing <agent_history>
+_USER_REQUEST = re.compile(r'<user_request>\n(.*?)\n</user_request>', re.DOTALL)
+TASK_MOVED = 'Given in the <user_request> message at the start of the conversation.'
+
+
+def normalize_prompt_text(text: str) -> str:
+	"""Canonicalize whitespace so the same prompt is byte-identical on every call.
+
+	Line endings become \\n, tabs are expanded, trailing spaces and the common indentation
+	are removed and runs of blank lines collapse to one. This keeps the stable prompt prefix
+	identical for server-side KV prefix caches and trims indentation-only tokens.
+	"""
+	text = text.replace('\r\n', '\n').expandtabs(4)
+	text = '\n'.join(line.rstrip() for line in text.split('\n'))
+	return _BLANK_LINES.sub('\n\n', textwrap.dedent(text).strip('\n'))
+
 
 class LangChainMessageSerializer:
 	"""Serializer for converting between browser-use message types and LangChain message types."""
 
+	# LRU cache: system prompt key -> serialized (and possibly normalized) LangChain message.
+	# browser-use 0.11 sends [system, state, context] on every step and rebuilds the state message
+	# each time, so only the system prompt repeats; caching anything else would only keep
+	# screenshots alive.
+	_cache: ClassVar['OrderedDict[Hashable, LangChainBaseMessage]'] = OrderedDict()
+
 	@staticmethod
 	def _serialize_user_content(
 		content: str | list[ContentPartTextParam | ContentPartImageParam],
@@ -144,6 +180,130 @@ class LangChainMessageSerializer:
 			raise ValueError(f'Unknown message type: {type(message)}')
 
 	@staticmethod
-	def serialize_messages(messages: list[BaseMessage]) -> list[LangChainBaseMessage]:
-		"""Serialize a list of browser-use messages to LangChain messages."""
-		return [LangChainMessageSerializer.serialize(m) for m in messages]
\ No newline at end of file
+	def _normalize(message: LangChainBaseMessage) -> LangChainBaseMessage:
+		"""Apply normalize_prompt_text to every text part of a serialized message, in place."""
+		if isinstance(message.content, str):
+			message.content = normalize_prompt_text(message.content)
+		else:
+			for part in message.content:
+				if isinstance(part, dict) and part.get('type') == 'text':
+					part['text'] = normalize_prompt_text(part['text'])
+		return message
+
+	@staticmethod
+	def _hoist_task(messages: list[BaseMessage]) -> list[BaseMessage]:
+		"""Move the task text out of the last state message into its own message after the system prompt.
+
+		browser-use writes <user_request> after <agent_history> in the state message, so the invariant
+		task is re-sent behind text that changes every step. As a separate message right after the
+		system prompt it becomes part of the cacheable prefix; the state message keeps a pointer to it.
+		"""
+		for position in range(len(messages) - 1, -1, -1):
+			message = messages[position]
+			if not isinstance(message, UserMessage):
+				continue
+			content = message.content
+			text_part = content if isinstance(content, str) else next((p for p in content if p.type == 'text'), None)
+			text = text_part if isinstance(text_part, str) else getattr(text_part, 'text', None)
+			match = _USER_REQUEST.search(text) if text else None
+			if match is not None:
+				break
+		else:
+			return messages
+
+		new_text = text[: match.start(1)] + TASK_MOVED + text[match.end(1) :]
+		if isinstance(content, str):
+			new_message = message.model_copy(update={'content': new_text})
+		else:
+			parts = [part.model_copy(update={'text': new_text}) if part is text_part else part for part in content]
+			new_message = message.model_copy(update={'content': parts})
+
+		task_message = UserMessage(content=f'<user_request>\n{normalize_prompt_text(match.group(1))}\n</user_request>')
+		insert_at = next((i for i, m in enumerate(messages) if not isinstance(m, BrowserUseSystemMessage)), 0)
+		result = [*messages[:position], new_message, *messages[position + 1 :]]
+		return [*result[:insert_at], task_message, *result[insert_at:]]
+
+	@staticmethod
+	def _cache_key(message: BaseMessage) -> Hashable | None:
+		"""Build a cache key from the message type, name and content.
+
+		String hashes are memoized by CPython, so keys for unchanged history messages are cheap to compute.
+		"""
+		content = message.content
+		if content is None or isinstance(content, str):
+			content_key = content
+		else:
+			parts = []
+			for part in content:
+				if part.type == 'text':
+					parts.append(('text', part.text))
+				elif part.type == 'image_url':
+					parts.append(('image_url', part.image_url.url, part.image_url.detail))
+				elif part.type == 'refusal':
+					parts.append(('refusal', part.refusal))
+				else:
+					return None
+			content_key = tuple(parts)
+
+		return (type(message).__name__, message.name, content_key)
+
+	@staticmethod
+	def clear_cache() -> None:
+		"""Drop every cached serialized message."""
+		LangChainMessageSerializer._cache.clear()
+
+	@staticmethod
+	def serialize_messages(
+		messages: list[BaseMessage],
+		normalize: bool = False,
+		hoist_task: bool = False,
+		vision: 'VisionBudget | None' = None,
+		history: 'HistoryWindow | None' = None,
+		dom_diff: 'StateDiff | None' = None,
+		context_tokens: int | None = None,
+	) -> list[LangChainBaseMessage]:
+		"""Serialize a list of browser-use messages to LangChain messages.
+
+		The system prompt is served from a small LRU cache keyed by its content; every other
+		message changes per step and is converted directly. With ``normalize`` the system
+		prompt goes through normalize_prompt_text (once per prompt, thanks to the cache); the
+		volatile state message is left untouched. With ``hoist_task`` the task is moved next to
+		the system prompt (see _hoist_task), so the stable prefix survives ``history`` and
+		``dom_diff``, which rewrite the state message on every step.
+		With ``vision`` the screenshots are windowed, deduplicated and recompressed first,
+		and with ``history`` the <agent_history> block is cut down to a window of recent steps
+		(``context_tokens`` is the prompt budget when the window sets none of its own).
+		With ``dom_diff`` the element listing is replaced by the changes since a page reference.
+		"""
+		if dom_diff is not None:
+			messages = dom_diff.apply(messages)
+		if history is not None:
+			messages = history.apply(messages, context_tokens)
+		if vision is not None:
+			messages = vision.apply(messages)
+		if hoist_task:
+			messages = LangChainMessageSerializer._hoist_task(messages)
+
+		cache = LangChainMessageSerializer._cache
+		serialized = []
+		for message in messages:
+			key = LangChainMessageSerializer._cache_key(message) if isinstance(message, BrowserUseSystemMessage) else None
+			if key is None:
+				serialized.append(LangChainMessageSerializer.serialize(message))
+				continue
+
+			# Only the system prompt is normalized; the hoisted task already is
+			key = (normalize, key)
+			cached = cache.get(key)
+			if cached is None:
+				cached = LangChainMessageSerializer.serialize(message)
+				if normalize:
+					cached = LangChainMessageSerializer._normalize(cached)
+				cache[key] = cached
+				if len(cache) > SERIALIZATION_CACHE_SIZE:
+					cache.popitem(last=False)
+			else:
+				cache.move_to_end(key)
+			serialized.append(cached)
+
+		return serialized
@@ -0,0 +1,82 @@
+import re
+
+# Únicos caracteres que alteram a estrutura do JSON (o resto é pulado pelo regex, em C)
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]')
+
+
+class IncrementalJSONParser:
+    """
+    Detecta, chunk a chunk, o fim do primeiro objeto JSON de nível superior.
+
+    Ignora qualquer texto antes do primeiro '{' (ex: cercas ```json), respeita
+    strings e escapes, e não copia o conteúdo: guarda apenas referências aos
+    chunks e faz um único join quando o objeto fecha.
+    """
+
+    def __init__(self) -> None:
+        self._raw: list[str] = []
+        self._parts: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self.done = False
+
+    @property
+    def raw(self) -> str:
+        """Todo o texto recebido até agora (usado em mensagens de erro)."""
+        return ''.join(self._raw)
+
+    def feed(self, chunk: str) -> str | None:
+        """Consome um chunk; retorna o texto do objeto assim que ele fecha."""
+        if self.done or not chunk:
+            return None
+        self._raw.append(chunk)
+
+        pos = 0
+        seg_start = 0
+        if self._escape:
+            # O caractere anterior era '\' dentro de string: este está escapado
+            self._escape = False
+            pos = 1
+
+        while True:
+            match = _STRUCTURAL.search(chunk, pos)
+            if match is None:
+                break
+            i = match.start()
+            ch = chunk[i]
+            pos = i + 1
+
+            if not self._started:
+                if ch == '{':
+                    self._started = True
+                    self._depth = 1
+                    seg_start = i
+                continue
+
+            if self._in_string:
+                if ch == '\\':
+                    if i + 1 < len(chunk):
+                        pos = i + 2
+                    else:
+                        self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[seg_start:i + 1])
+                    self.done = True
+                    return ''.join(self._parts)
+
+        if self._started:
+            self._parts.append(chunk[seg_start:])
+        return None
+
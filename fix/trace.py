@@ -0,0 +1,129 @@
+import gzip
+import json
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from browser_use.llm.views import ChatInvokeCompletion
+
+# Nome da execução atual (cenário/tarefa); cada task asyncio tem o seu valor
+current_run: ContextVar[str | None] = ContextVar('trace_run', default=None)
+
+
+def _prompt(langchain_messages: list) -> list[dict[str, str]]:
+    prompt = []
+    for message in langchain_messages:
+        content = message.content
+        if not isinstance(content, str):
+            content = '\n'.join(
+                part.get('text', '') if part.get('type') == 'text' else f'[{part.get("type")}]'
+                for part in content
+                if isinstance(part, dict)
+            )
+        prompt.append({'role': message.type, 'text': content})
+    return prompt
+
+
+class TraceWriter:
+    """
+    Trace JSONL das execuções, gravado registro a registro (nada fica acumulado
+    em memória).
+
+    - ``llm``: uma chamada ao modelo (latência, tokens, saída bruta, JSON
+      corrigido, ações, correções aplicadas, erro), gravado pelo ChatLangchain
+    - ``step``: um passo do agente (url, ações, erros, duração), gravado pelo
+      hook ``on_step_end`` (veja ``record_step``)
+
+    Com ``compress`` (padrão: caminho terminado em .gz) grava em gzip; cada
+    execução é anexada como um novo membro, e o arquivo continua legível por
+    ``gzip.open``/``zcat``. ``include_prompts`` grava também as mensagens
+    enviadas (imagens viram '[image_url]').
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        compress: bool | None = None,
+        include_prompts: bool = False,
+        flush_every: int = 50,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compress = self.path.suffix == '.gz' if compress is None else compress
+        self.include_prompts = include_prompts
+        # Sem compressão cada linha já vai para o disco; com gzip, flush a cada N registros
+        self.flush_every = flush_every
+        self._pending = 0
+        if self.compress:
+            self._file = gzip.open(self.path, 'at', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+
+    def write(self, kind: str, **fields: Any) -> None:
+        record = {'ts': round(time.time(), 3), 'kind': kind, 'run': current_run.get(), **fields}
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + '\n')
+        if self.compress:
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def record_call(
+        self,
+        model: str,
+        langchain_messages: list,
+        result: ChatInvokeCompletion,
+        latency: float,
+        path: str = 'model',
+        details: dict[str, Any] | None = None,
+    ) -> None:
+        """``details``: campos coletados pelo adapter durante o parse (raw, fixed, repairs)."""
+        completion = result.completion
+        actions = None
+        if isinstance(completion, BaseModel) and 'action' in type(completion).model_fields:
+            actions = completion.model_dump(mode='json', exclude_none=True, include={'action'})['action']
+        usage = result.usage
+        self.write(
+            'llm',
+            model=model,
+            path=path,
+            latency=round(latency, 4),
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+            action=actions,
+            **(details or {}),
+            **({'prompt': _prompt(langchain_messages)} if self.include_prompts else {}),
+        )
+
+    def record_error(self, model: str, latency: float, error: BaseException, details: dict[str, Any] | None = None) -> None:
+        self.write(
+            'llm',
+            model=model,
+            path='error',
+            latency=round(latency, 4),
+            error=f'{type(error).__name__}: {error}',
+            **(details or {}),
+        )
+
+    async def record_step(self, agent: Any) -> None:
+        """Hook ``on_step_end`` do browser-use: grava o último passo do histórico do agente."""
+        if not agent.history.history:
+            return
+        item = agent.history.history[-1]
+        output = item.model_output
+        self.write(
+            'step',
+            step=item.metadata.step_number if item.metadata else len(agent.history.history),
+            duration=round(item.metadata.duration_seconds, 4) if item.metadata else None,
+            url=item.state.url,
+            next_goal=output.next_goal if output else None,
+            actions=output.model_dump(mode='json', exclude_none=True, include={'action'})['action'] if output else [],
+            errors=[r.error for r in item.result if r.error],
+            done=any(r.is_done for r in item.result),
+        )
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,120 @@
+import base64
+import io
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from browser_use.llm.messages import BaseMessage, ContentPartTextParam, UserMessage
+
+# Quantos screenshots recomprimidos ficam em memória (chave = data URL original)
+RECOMPRESS_CACHE_SIZE = 64
+# Rótulos que o browser-use põe antes de cada screenshot (agent/prompts.py)
+SCREENSHOT_LABELS = frozenset({'Current screenshot:', 'Previous screenshot:'})
+
+
+@dataclass
+class VisionBudget:
+    """
+    Limita o custo dos screenshots enviados a modelos de visão (ex: Qwen3-VL).
+
+    - mantém só os ``max_images`` screenshots mais recentes do histórico; os
+      mais antigos viram um texto curto. Só contam as imagens logo após os
+      rótulos de screenshot: as de exemplo (sample_images) e as do read_file
+      passam intactas
+    - descarta frames idênticos a um frame mais recente (mesma data URL)
+    - reduz o lado maior para ``max_side`` px e recomprime em JPEG
+      (Pillow, que já vem com o browser-use); o resultado fica em cache, então
+      cada screenshot é processado uma única vez
+    """
+    max_images: int = 2
+    max_side: int = 1024
+    jpeg_quality: int = 70
+    dedupe: bool = True
+    # Sobrescreve o 'detail' da imagem (ex: 'low'); None mantém o original
+    detail: str | None = None
+    _recompressed: OrderedDict[str, str] = field(default_factory=OrderedDict, repr=False)
+
+    def _recompress(self, url: str) -> str:
+        cached = self._recompressed.get(url)
+        if cached is not None:
+            self._recompressed.move_to_end(url)
+            return cached
+
+        header, _, payload = url.partition(',')
+        if not header.startswith('data:image/') or ';base64' not in header:
+            return url
+
+        try:
+            from PIL import Image
+
+            image = Image.open(io.BytesIO(base64.b64decode(payload)))
+            image.thumbnail((self.max_side, self.max_side))
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=self.jpeg_quality, optimize=True)
+        except Exception:
+            # Imagem inválida ou Pillow indisponível: envia como veio
+            result = url
+        else:
+            result = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+            if len(result) >= len(url):
+                result = url
+
+        self._recompressed[url] = result
+        if len(self._recompressed) > RECOMPRESS_CACHE_SIZE:
+            self._recompressed.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _is_screenshot(content: list, index: int) -> bool:
+        previous = content[index - 1] if index > 0 else None
+        return previous is not None and previous.type == 'text' and previous.text.strip() in SCREENSHOT_LABELS
+
+    def apply(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """Retorna a lista com os screenshots ajustados; mensagens sem screenshot são mantidas como estão."""
+        kept = 0
+        seen: set[str] = set()
+        result: list[BaseMessage] = []
+
+        # Do fim para o início, mensagens e partes: os screenshots mais recentes têm prioridade
+        for message in reversed(messages):
+            if not isinstance(message, UserMessage) or isinstance(message.content, str):
+                result.append(message)
+                continue
+            content = message.content
+            if not any(part.type == 'image_url' and self._is_screenshot(content, i) for i, part in enumerate(content)):
+                result.append(message)
+                continue
+
+            parts = []
+            for index in range(len(content) - 1, -1, -1):
+                part = content[index]
+                if part.type != 'image_url' or not self._is_screenshot(content, index):
+                    parts.append(part)
+                    continue
+
+                url = part.image_url.url
+                if self.dedupe and url in seen:
+                    parts.append(ContentPartTextParam(text='[screenshot omitted: identical to a later one]'))
+                    continue
+                seen.add(url)
+
+                if kept >= self.max_images:
+                    parts.append(ContentPartTextParam(text='[older screenshot omitted]'))
+                    continue
+                kept += 1
+
+                new_url = self._recompress(url)
+                update: dict = {}
+                if new_url != url:
+                    update['url'] = new_url
+                    update['media_type'] = 'image/jpeg'
+                if self.detail is not None:
+                    update['detail'] = self.detail
+                parts.append(part.model_copy(update={'image_url': part.image_url.model_copy(update=update)}) if update else part)
+
+            parts.reverse()
+            result.append(message.model_copy(update={'content': parts}))
+
+        result.reverse()
+        return result
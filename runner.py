@@ -0,0 +1,391 @@
+"""
+Parallel scenario runner for browser-use regression suites.
+
+Loads many task definitions and runs them concurrently over a bounded pool of
+browser sessions, while a shared semaphore caps how many LLM calls hit the
+inference server at the same time.
+
+Scenario sources (``--scenarios``):
+- a ``.txt``/``.md`` file: the whole file is the task, the file stem is the name
+- a ``.json`` file: one object or a list of objects with ``name`` and ``task``
+  (optional ``timeout``, ``max_steps`` and ``assertions``: a list of
+  fix.assertions.Assertion fields, checked locally against the final page)
+- a directory: every file above found in it, sorted by name
+
+Without ``--scenarios`` the Sylius purchase task from ``exec_openai.py`` is used.
+
+@file purpose: Fan exec_openai.py-style tasks out over a pool of browser sessions
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+from browser_use import Agent, BrowserProfile, BrowserSession
+from browser_use.llm.messages import BaseMessage
+
+from exec_openai import PREFETCH_STATE, TASK, USE_VISION, build_llm, build_router
+from fix.assertions import Assertion, evaluate_all, format_report, page_text
+from fix.dom_diff import StateDiff
+from fix.plan import ActionPlanStore, FastPathChat
+from fix.prefetch import StatePrefetcher
+from fix.trace import TraceWriter, current_run
+
+DEFAULT_TIMEOUT = 900.0
+DEFAULT_MAX_STEPS = 100
+
+
+@dataclass
+class Scenario:
+	name: str
+	task: str
+	timeout: float = DEFAULT_TIMEOUT
+	max_steps: int = DEFAULT_MAX_STEPS
+	assertions: list[Assertion] = field(default_factory=list)
+
+
+@dataclass
+class ScenarioResult:
+	name: str
+	success: bool | None
+	final_result: str | None
+	steps: int
+	duration: float
+	error: str | None = None
+
+
+@dataclass
+class ConcurrencyLimitedChat:
+	"""Wraps a chat model so every ainvoke call shares one semaphore."""
+
+	llm: Any
+	semaphore: asyncio.Semaphore
+	_verified_api_keys: bool = field(default=False)
+
+	@property
+	def model(self) -> str:
+		return self.llm.model
+
+	@property
+	def provider(self) -> str:
+		return self.llm.provider
+
+	@property
+	def name(self) -> str:
+		return self.llm.name
+
+	async def ainvoke(self, messages: list[BaseMessage], output_format: Any = None, **kwargs: Any) -> Any:
+		async with self.semaphore:
+			return await self.llm.ainvoke(messages, output_format, **kwargs)
+
+
+def scenario_from_dict(item: dict[str, Any], default_name: str) -> Scenario:
+	return Scenario(
+		name=item.get('name') or default_name,
+		task=item['task'],
+		timeout=float(item.get('timeout', DEFAULT_TIMEOUT)),
+		max_steps=int(item.get('max_steps', DEFAULT_MAX_STEPS)),
+		assertions=[Assertion.from_dict(a) for a in item.get('assertions', [])],
+	)
+
+
+def _scenarios_from_json(path: Path) -> list[Scenario]:
+	data = json.loads(path.read_text(encoding='utf-8'))
+	items = data if isinstance(data, list) else [data]
+	return [
+		scenario_from_dict(item, path.stem if len(items) == 1 else f'{path.stem}-{i + 1}') for i, item in enumerate(items)
+	]
+
+
+def load_scenarios(source: str | None) -> list[Scenario]:
+	"""Load scenarios from a file or directory; defaults to the Sylius purchase task."""
+	if source is None:
+		return [Scenario(name='sylius_purchase', task=TASK)]
+
+	path = Path(source)
+	files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+
+	scenarios: list[Scenario] = []
+	for file in files:
+		if file.suffix == '.json':
+			scenarios.extend(_scenarios_from_json(file))
+		elif file.suffix in ('.txt', '.md'):
+			scenarios.append(Scenario(name=file.stem, task=file.read_text(encoding='utf-8')))
+
+	if not scenarios:
+		raise ValueError(f'No scenarios found in {source}')
+	return scenarios
+
+
+class BrowserPool:
+	"""Bounded pool of long-lived browser sessions, reused across scenarios."""
+
+	def __init__(self, size: int, headless: bool = True):
+		self.size = size
+		self.headless = headless
+		self._idle: asyncio.Queue[BrowserSession] = asyncio.Queue()
+		self._created = 0
+		self._lock = asyncio.Lock()
+
+	def _new_session(self) -> BrowserSession:
+		return BrowserSession(browser_profile=BrowserProfile(headless=self.headless, keep_alive=True))
+
+	async def acquire(self) -> BrowserSession:
+		async with self._lock:
+			if self._idle.empty() and self._created < self.size:
+				self._created += 1
+				return self._new_session()
+		return await self._idle.get()
+
+	async def warm(self) -> None:
+		"""Launch every browser up front, so the first scenarios don't pay for the start-up."""
+		async with self._lock:
+			sessions = [self._new_session() for _ in range(self.size - self._created)]
+			self._created = self.size
+			# Falha aqui não é fatal: o Agent tenta iniciar a sessão de novo
+			await asyncio.gather(*(session.start() for session in sessions), return_exceptions=True)
+			for session in sessions:
+				self._idle.put_nowait(session)
+
+	async def release(self, session: BrowserSession, healthy: bool = True) -> None:
+		if healthy:
+			try:
+				await _reset_session(session)
+			except Exception:
+				healthy = False
+		if not healthy:
+			# Sessão possivelmente corrompida (timeout/erro/reset falhou): descarta e abre outra
+			await _kill_quietly(session)
+			session = self._new_session()
+		self._idle.put_nowait(session)
+
+	async def close(self) -> None:
+		while not self._idle.empty():
+			await _kill_quietly(self._idle.get_nowait())
+
+
+async def _reset_session(session: BrowserSession) -> None:
+	"""Leave a kept-alive session as a fresh one: one blank tab, no cookies or site storage.
+
+	Without this the next scenario inherits the cart, the login and the tabs of the previous one.
+	"""
+	pages = session.get_page_targets()
+	if not pages:
+		return  # nunca iniciada
+	focused = session.get_focused_target() or pages[0]
+	origins = {origin for page in pages if (origin := _origin(page.url))}
+	for page in pages:
+		if page.target_id != focused.target_id:
+			await session.close_page(page.target_id)
+	for origin in origins:
+		# localStorage, sessionStorage, IndexedDB, cache storage e cookies da origem
+		await session.cdp_client.send.Storage.clearDataForOrigin(params={'origin': origin, 'storageTypes': 'all'})
+	await session.clear_cookies()
+	await session.navigate_to('about:blank')
+
+
+def _origin(url: str) -> str | None:
+	parts = urlsplit(url)
+	if parts.scheme not in ('http', 'https') or not parts.netloc:
+		return None
+	return f'{parts.scheme}://{parts.netloc}'
+
+
+async def _kill_quietly(session: BrowserSession) -> None:
+	try:
+		await session.kill()
+	except Exception:
+		pass
+
+
+async def run_scenario(
+	scenario: Scenario,
+	llm: Any,
+	pool: BrowserPool,
+	plans: ActionPlanStore | None = None,
+	trace: TraceWriter | None = None,
+	dom_diff: StateDiff | None = None,
+) -> ScenarioResult:
+	# Cada cenário roda na sua própria task: os registros do trace levam o nome dele
+	current_run.set(scenario.name)
+	session = await pool.acquire()
+	started = time.perf_counter()
+	healthy = True
+	prefetcher = StatePrefetcher() if PREFETCH_STATE else None
+	try:
+		if plans is not None:
+			llm = FastPathChat(llm=llm, store=plans, task=scenario.task)
+		agent = Agent(task=scenario.task, llm=llm, browser_session=session, use_vision=USE_VISION)
+		if isinstance(llm, FastPathChat):
+			llm.attach(agent)
+		if prefetcher is not None:
+			prefetcher.attach(agent)
+
+		last_page_text = None
+
+		async def on_step_end(agent: Agent) -> None:
+			nonlocal last_page_text
+			if trace is not None:
+				await trace.record_step(agent)
+			if scenario.assertions:
+				last_page_text = await page_text(agent.browser_session) or last_page_text
+
+		history = await asyncio.wait_for(
+			agent.run(
+				max_steps=scenario.max_steps,
+				on_step_end=on_step_end if scenario.assertions or trace is not None else None,
+			),
+			timeout=scenario.timeout,
+		)
+		success = history.is_successful()
+		final_result = history.final_result()
+		if scenario.assertions:
+			results = evaluate_all(scenario.assertions, last_page_text or '')
+			success = bool(success) and all(r.passed for r in results)
+			final_result = format_report(results, scenario.name.upper(), scenario.name)
+
+		if isinstance(llm, FastPathChat) and success:
+			llm.save_plan()
+		return ScenarioResult(
+			name=scenario.name,
+			success=success,
+			final_result=final_result,
+			steps=len(history.history),
+			duration=time.perf_counter() - started,
+		)
+	except TimeoutError:
+		healthy = False
+		return ScenarioResult(
+			name=scenario.name,
+			success=False,
+			final_result=None,
+			steps=0,
+			duration=time.perf_counter() - started,
+			error=f'timeout after {scenario.timeout:.0f}s',
+		)
+	except Exception as e:
+		healthy = False
+		return ScenarioResult(
+			name=scenario.name,
+			success=False,
+			final_result=None,
+			steps=0,
+			duration=time.perf_counter() - started,
+			error=f'{type(e).__name__}: {e}',
+		)
+	finally:
+		if prefetcher is not None:
+			prefetcher.detach()
+		if dom_diff is not None:
+			dom_diff.end_run(scenario.name)
+		await pool.release(session, healthy=healthy)
+
+
+@dataclass
+class SuiteResources:
+	llm: Any
+	pool: BrowserPool
+	plans: ActionPlanStore | None
+	trace: TraceWriter | None
+	dom_diff: StateDiff | None
+
+
+@asynccontextmanager
+async def suite_resources(
+	workers: int,
+	llm_concurrency: int,
+	headless: bool = True,
+	plans_dir: str | None = None,
+) -> AsyncIterator[SuiteResources]:
+	"""LLM client, browser pool and plan store shared by the scenarios of a suite; closed on exit."""
+	chat = build_llm()
+	if chat.pool is not None:
+		chat.pool.start_health_checks()
+
+	router = build_router(chat)
+	llm = ConcurrencyLimitedChat(llm=router or chat, semaphore=asyncio.Semaphore(llm_concurrency))
+	pool = BrowserPool(size=workers, headless=headless)
+	plans = ActionPlanStore(plans_dir) if plans_dir else None
+	try:
+		yield SuiteResources(llm=llm, pool=pool, plans=plans, trace=chat.trace, dom_diff=chat.dom_diff)
+	finally:
+		if router is not None:
+			print(f'🔀 Routing: {json.dumps(router.stats())}')
+		await pool.close()
+		if chat.pool is not None:
+			chat.pool.stop_health_checks()
+		if chat.batching is not None:
+			await chat.batching.aclose()
+		if chat.trace is not None:
+			chat.trace.close()
+		if chat.metrics is not None:
+			chat.metrics.close()
+
+
+async def run_suite(
+	scenarios: list[Scenario],
+	workers: int,
+	llm_concurrency: int,
+	headless: bool = True,
+	plans_dir: str | None = None,
+) -> list[ScenarioResult]:
+	"""Run all scenarios over ``workers`` browsers, with at most ``llm_concurrency`` LLM calls in flight."""
+	async with suite_resources(workers, llm_concurrency, headless, plans_dir) as suite:
+		return list(
+			await asyncio.gather(*(run_scenario(s, suite.llm, suite.pool, suite.plans, suite.trace, suite.dom_diff) for s in scenarios))
+		)
+
+
+def print_report(results: list[ScenarioResult], wall_time: float) -> None:
+	print('=' * 80)
+	print(f'{"STATUS":<8} {"SCENARIO":<40} {"STEPS":>5} {"TIME":>8}')
+	print('-' * 80)
+	for r in results:
+		status = '✅' if r.success else '❌'
+		print(f'{status:<8} {r.name[:40]:<40} {r.steps:>5} {r.duration:>7.1f}s')
+		if r.error:
+			print(f'         {r.error}')
+	print('-' * 80)
+	passed = sum(1 for r in results if r.success)
+	cpu_time = sum(r.duration for r in results)
+	print(f'{passed}/{len(results)} passed | wall {wall_time:.1f}s | summed {cpu_time:.1f}s')
+	print('=' * 80)
+
+	for r in results:
+		if r.final_result:
+			print(f'\n📋 {r.name}:\n{r.final_result}')
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--scenarios', help='Scenario file or directory (default: Sylius purchase task)')
+	parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 8), help='Concurrent browser sessions')
+	parser.add_argument('--llm-concurrency', type=int, default=2, help='Max in-flight LLM calls')
+	parser.add_argument('--headful', action='store_true', help='Show browser windows')
+	parser.add_argument('--output', help='Write results as JSON to this path')
+	parser.add_argument('--fast-path', metavar='DIR', help='Replay learned action plans from DIR, LLM only on misses')
+	args = parser.parse_args()
+
+	scenarios = load_scenarios(args.scenarios)
+	print(f'🚀 Running {len(scenarios)} scenario(s) on {args.workers} browser(s), {args.llm_concurrency} LLM slot(s)')
+
+	started = time.perf_counter()
+	results = asyncio.run(
+		run_suite(scenarios, args.workers, args.llm_concurrency, headless=not args.headful, plans_dir=args.fast_path)
+	)
+	print_report(results, time.perf_counter() - started)
+
+	if args.output:
+		Path(args.output).write_text(json.dumps([asdict(r) for r in results], indent=2, ensure_ascii=False), encoding='utf-8')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,323 @@
+"""
+Sharded execution of scenario suites across processes and machines.
+
+runner.py runs a whole suite in one Python process; with many browsers the
+event loop (DOM handling, JSON parsing in ChatLangchain) becomes CPU-bound.
+This splits the suite over processes, each with its own event loop, browser
+pool and LLM client:
+
+- ``run``: split the scenarios into ``--processes`` shards, run each shard in
+  its own process and merge the results into one report. ``--shard K/N``
+  first keeps only part K of a deterministic N-way split, for CI matrices.
+- ``enqueue`` / ``work`` / ``collect``: a queue in a shared directory (local
+  disk or NFS). Workers on any number of machines claim one scenario at a
+  time with an atomic rename, so fast and slow machines balance themselves;
+  ``requeue`` puts back scenarios whose worker died.
+
+Splits are deterministic: scenarios are ordered by a hash of their name and
+dealt round-robin, so shard sizes differ by at most one; with ``--durations``
+(the --output of a previous run) they are placed by a greedy split on recorded
+duration instead. The same inputs always give the same split.
+
+Trace and metrics paths (LLM_TRACE_PATH, LLM_METRICS_DIR) get a per-process
+suffix, so processes never append to the same file.
+
+Usage:
+	python shard.py run --scenarios scenarios/ --processes 4 --workers 2 --output results.json
+	python shard.py run --scenarios scenarios/ --shard 2/4 --durations last.json
+	python shard.py enqueue --scenarios scenarios/ --queue /mnt/shared/suite
+	python shard.py work --queue /mnt/shared/suite --workers 4
+	python shard.py collect --queue /mnt/shared/suite --output results.json
+
+@file purpose: Spread runner.py scenario suites over processes and machines
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+QUEUE_DIRS = ('pending', 'claimed', 'results')
+
+
+def _stable_key(name: str) -> str:
+	"""Sort key that mixes scenarios from the same file, independent of PYTHONHASHSEED."""
+	return hashlib.sha256(name.encode()).hexdigest()
+
+
+def load_durations(path: str) -> dict[str, float]:
+	return {r['name']: r['duration'] for r in json.loads(Path(path).read_text(encoding='utf-8'))}
+
+
+def split(scenarios: list[Any], shards: int, durations: dict[str, float] | None = None) -> list[list[Any]]:
+	"""
+	Deterministic split. Without ``durations`` the scenarios, ordered by a hash of
+	their name, are dealt round-robin (shard sizes differ by at most one); with
+	them, the longest scenarios are placed first on the least loaded shard
+	(unknown scenarios count as the mean duration).
+	"""
+	parts: list[list[Any]] = [[] for _ in range(shards)]
+	if not durations:
+		for i, scenario in enumerate(sorted(scenarios, key=lambda s: (_stable_key(s.name), s.name))):
+			parts[i % shards].append(scenario)
+		return parts
+
+	default = sum(durations.values()) / len(durations)
+	loads = [0.0] * shards
+	for scenario in sorted(scenarios, key=lambda s: (-durations.get(s.name, default), s.name)):
+		target = min(range(shards), key=lambda i: (loads[i], i))
+		parts[target].append(scenario)
+		loads[target] += durations.get(scenario.name, default)
+	return parts
+
+
+def _isolate_outputs(label: str) -> None:
+	"""Per-process trace file and metrics directory; must run before exec_openai is imported."""
+	trace = os.getenv('LLM_TRACE_PATH')
+	if trace:
+		path = Path(trace)
+		suffixes = ''.join(path.suffixes)
+		os.environ['LLM_TRACE_PATH'] = str(path.with_name(f'{path.name[: len(path.name) - len(suffixes)]}.{label}{suffixes}'))
+	metrics = os.getenv('LLM_METRICS_DIR')
+	if metrics:
+		os.environ['LLM_METRICS_DIR'] = os.path.join(metrics, label)
+
+
+def _run_shard(label: str, items: list[dict[str, Any]], workers: int, llm_concurrency: int, headless: bool, plans_dir: str | None) -> list[dict[str, Any]]:
+	"""Worker process entry point: scenario dicts in, ScenarioResult dicts out."""
+	_isolate_outputs(label)
+	from runner import run_suite, scenario_from_dict
+
+	scenarios = [scenario_from_dict(item, item['name']) for item in items]
+	results = asyncio.run(run_suite(scenarios, workers, llm_concurrency, headless=headless, plans_dir=plans_dir))
+	return [asdict(r) for r in results]
+
+
+def run_processes(
+	scenarios: list[Any],
+	processes: int,
+	workers: int,
+	llm_concurrency: int,
+	headless: bool = True,
+	plans_dir: str | None = None,
+	durations: dict[str, float] | None = None,
+	label: str = 'shard',
+) -> list[dict[str, Any]]:
+	"""Run every shard in its own process (spawned: no event loop or browser state is inherited)."""
+	parts = [(i, part) for i, part in enumerate(split(scenarios, processes, durations)) if part]
+	results: list[dict[str, Any]] = []
+	context = multiprocessing.get_context('spawn')
+	with ProcessPoolExecutor(max_workers=len(parts), mp_context=context) as executor:
+		futures = [
+			(part, executor.submit(_run_shard, f'{label}-{i}', [asdict(s) for s in part], workers, llm_concurrency, headless, plans_dir))
+			for i, part in parts
+		]
+		for part, future in futures:
+			try:
+				results.extend(future.result())
+			except Exception as e:
+				results.extend(_failed(s.name, f'shard process failed: {type(e).__name__}: {e}') for s in part)
+
+	# Ordem do arquivo de cenários, não a de término dos shards
+	order = {s.name: i for i, s in enumerate(scenarios)}
+	return sorted(results, key=lambda r: order.get(r['name'], len(order)))
+
+
+def _failed(name: str, error: str) -> dict[str, Any]:
+	return {'name': name, 'success': False, 'final_result': None, 'steps': 0, 'duration': 0.0, 'error': error}
+
+
+# Fila em diretório compartilhado
+
+
+def _queue_dirs(queue: str) -> dict[str, Path]:
+	dirs = {name: Path(queue) / name for name in QUEUE_DIRS}
+	for path in dirs.values():
+		path.mkdir(parents=True, exist_ok=True)
+	return dirs
+
+
+def enqueue(queue: str, scenarios: list[Any]) -> int:
+	"""One JSON file per scenario; the numeric prefix keeps the suite order."""
+	dirs = _queue_dirs(queue)
+	offset = sum(len(list(d.glob('*.json'))) for d in dirs.values())
+	for i, scenario in enumerate(scenarios):
+		safe = re.sub(r'[^\w.-]+', '_', scenario.name)[:80]
+		file = dirs['pending'] / f'{offset + i:06d}-{safe}.json'
+		tmp = file.with_suffix('.tmp')
+		tmp.write_text(json.dumps(asdict(scenario), ensure_ascii=False), encoding='utf-8')
+		os.replace(tmp, file)
+	return len(scenarios)
+
+
+def claim(queue: str) -> Path | None:
+	"""Move the next pending scenario to claimed/; the rename is atomic, so only one worker wins it."""
+	dirs = _queue_dirs(queue)
+	for file in sorted(dirs['pending'].glob('*.json')):
+		target = dirs['claimed'] / file.name
+		try:
+			os.rename(file, target)
+		except FileNotFoundError:
+			continue
+		os.utime(target)
+		return target
+	return None
+
+
+def requeue(queue: str, older_than: float) -> int:
+	"""Put back claimed scenarios with no result after ``older_than`` seconds (their worker died)."""
+	dirs = _queue_dirs(queue)
+	now = time.time()
+	moved = 0
+	for file in dirs['claimed'].glob('*.json'):
+		if now - file.stat().st_mtime >= older_than and not (dirs['results'] / file.name).exists():
+			try:
+				os.rename(file, dirs['pending'] / file.name)
+				moved += 1
+			except FileNotFoundError:
+				pass
+	return moved
+
+
+async def work(queue: str, workers: int, llm_concurrency: int, headless: bool = True, plans_dir: str | None = None) -> int:
+	"""Run claimed scenarios until the queue is empty, ``workers`` at a time; returns how many ran."""
+	from runner import run_scenario, scenario_from_dict, suite_resources
+
+	dirs = _queue_dirs(queue)
+	worker_id = f'{socket.gethostname()}-{os.getpid()}'
+	done = 0
+
+	async def loop(suite: Any) -> None:
+		nonlocal done
+		while (file := claim(queue)) is not None:
+			item = json.loads(file.read_text(encoding='utf-8'))
+			scenario = scenario_from_dict(item, item['name'])
+			result = asdict(await run_scenario(scenario, suite.llm, suite.pool, suite.plans, suite.trace, suite.dom_diff))
+			result['worker'] = worker_id
+			tmp = dirs['results'] / f'{file.stem}.{worker_id}.tmp'
+			tmp.write_text(json.dumps(result, ensure_ascii=False), encoding='utf-8')
+			os.replace(tmp, dirs['results'] / file.name)
+			file.unlink(missing_ok=True)
+			done += 1
+
+	async with suite_resources(workers, llm_concurrency, headless, plans_dir) as suite:
+		await asyncio.gather(*(loop(suite) for _ in range(workers)))
+	return done
+
+
+def collect(queue: str) -> tuple[list[dict[str, Any]], int]:
+	"""Results in suite order and how many scenarios are still pending or claimed."""
+	dirs = _queue_dirs(queue)
+	results = [json.loads(f.read_text(encoding='utf-8')) for f in sorted(dirs['results'].glob('*.json'))]
+	unfinished = sum(1 for name in ('pending', 'claimed') for _ in dirs[name].glob('*.json'))
+	return results, unfinished
+
+
+def report(results: list[dict[str, Any]], wall_time: float, output: str | None) -> int:
+	from runner import ScenarioResult, print_report
+
+	print_report([ScenarioResult(**{k: v for k, v in r.items() if k != 'worker'}) for r in results], wall_time)
+	if output:
+		Path(output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+	return 0 if results and all(r['success'] for r in results) else 1
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	def execution_args(command: argparse.ArgumentParser) -> None:
+		command.add_argument('--workers', type=int, default=2, help='Browser sessions per process')
+		command.add_argument('--llm-concurrency', type=int, default=2, help='Max in-flight LLM calls per process')
+		command.add_argument('--headful', action='store_true', help='Show browser windows')
+		command.add_argument('--fast-path', metavar='DIR', help='Replay learned action plans from DIR')
+
+	run_parser = commands.add_parser('run', help='Run the suite over local processes')
+	run_parser.add_argument('--scenarios', help='Scenario file or directory (default: Sylius purchase task)')
+	run_parser.add_argument('--processes', type=int, default=max((os.cpu_count() or 1) // 2, 1), help='Worker processes')
+	run_parser.add_argument('--shard', metavar='K/N', help='Only run part K (1-based) of an N-way split')
+	run_parser.add_argument('--durations', metavar='JSON', help='Previous --output file, to balance shards by duration')
+	run_parser.add_argument('--output', help='Write merged results as JSON to this path')
+	execution_args(run_parser)
+
+	enqueue_parser = commands.add_parser('enqueue', help='Add scenarios to a shared queue directory')
+	enqueue_parser.add_argument('--scenarios', help='Scenario file or directory (default: Sylius purchase task)')
+	enqueue_parser.add_argument('--queue', required=True, help='Queue directory')
+
+	work_parser = commands.add_parser('work', help='Run scenarios from a queue until it is empty')
+	work_parser.add_argument('--queue', required=True, help='Queue directory')
+	execution_args(work_parser)
+
+	requeue_parser = commands.add_parser('requeue', help='Put back scenarios claimed by dead workers')
+	requeue_parser.add_argument('--queue', required=True, help='Queue directory')
+	requeue_parser.add_argument('--older-than', type=float, default=1800, help='Claim age in seconds')
+
+	collect_parser = commands.add_parser('collect', help='Merge the results of a queue')
+	collect_parser.add_argument('--queue', required=True, help='Queue directory')
+	collect_parser.add_argument('--output', help='Write merged results as JSON to this path')
+	args = parser.parse_args()
+
+	if args.command == 'requeue':
+		print(f'↩️ {requeue(args.queue, args.older_than)} scenario(s) back in the queue')
+		return
+	if args.command == 'collect':
+		results, unfinished = collect(args.queue)
+		code = report(results, 0.0, args.output)
+		if unfinished:
+			print(f'⏳ {unfinished} scenario(s) not finished yet', file=sys.stderr)
+		sys.exit(code if not unfinished else 1)
+	if args.command == 'work':
+		# Um processo por nó: trace/métricas no mesmo diretório compartilhado não colidem
+		_isolate_outputs(f'{socket.gethostname()}-{os.getpid()}')
+		started = time.perf_counter()
+		done = asyncio.run(work(args.queue, args.workers, args.llm_concurrency, not args.headful, args.fast_path))
+		print(f'✅ {done} scenario(s) run in {time.perf_counter() - started:.1f}s')
+		return
+
+	from runner import load_scenarios
+
+	scenarios = load_scenarios(args.scenarios)
+	if args.command == 'enqueue':
+		print(f'📥 {enqueue(args.queue, scenarios)} scenario(s) queued in {args.queue}')
+		return
+
+	durations = load_durations(args.durations) if args.durations else None
+	label = 'shard'
+	if args.shard:
+		k, n = (int(x) for x in args.shard.split('/'))
+		if not 1 <= k <= n:
+			parser.error(f'--shard {args.shard}: K must be between 1 and N')
+		scenarios = split(scenarios, n, durations)[k - 1]
+		label = f'shard{k}of{n}'
+		if not scenarios:
+			print(f'Shard {args.shard} is empty')
+			return
+
+	processes = sum(1 for part in split(scenarios, args.processes, durations) if part)
+	print(f'🚀 Running {len(scenarios)} scenario(s) over {processes} process(es), {args.workers} browser(s) each')
+	started = time.perf_counter()
+	results = run_processes(
+		scenarios,
+		args.processes,
+		args.workers,
+		args.llm_concurrency,
+		headless=not args.headful,
+		plans_dir=args.fast_path,
+		durations=durations,
+		label=label,
+	)
+	sys.exit(report(results, time.perf_counter() - started, args.output))
+
+
+if __name__ == '__main__':
+	main()
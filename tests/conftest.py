@@ -0,0 +1,4 @@
+import os
+
+# Os testes importam o browser-use; nada de telemetria saindo da máquina
+os.environ.setdefault('ANONYMIZED_TELEMETRY', 'false')
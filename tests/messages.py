@@ -0,0 +1,77 @@
+"""Mensagens no formato que o browser-use 0.11 monta para o LLM, para usar como fixture."""
+from functools import cache
+
+from browser_use import Tools
+from browser_use.agent.message_manager.views import HistoryItem
+from browser_use.agent.views import AgentOutput
+from browser_use.llm.messages import (
+    ContentPartImageParam,
+    ContentPartTextParam,
+    ImageURL,
+    SystemMessage,
+    UserMessage,
+)
+
+SHOP = 'http://localhost:9990/en_US'
+# PNG 1x1 transparente
+PIXEL = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+
+
+@cache
+def agent_output_type() -> type[AgentOutput]:
+    """O AgentOutput com as ações padrão do browser-use, como o Agent passa em ``output_format``."""
+    return AgentOutput.type_with_custom_actions(Tools().registry.create_action_model())
+
+
+def browser_state(
+    elements: list[str],
+    url: str = f'{SHOP}/',
+    title: str = 'Sylius',
+    tab: str = '8A1F',
+    step: int = 1,
+    history: str = '',
+) -> str:
+    """Texto do estado de um passo (AgentMessagePrompt.get_user_message) com os elementos dados."""
+    elements_text = '\n'.join(['[Start of page]', *elements, '[End of page]'])
+    return (
+        f'<agent_history>\n{history}\n</agent_history>\n\n'
+        '<agent_state>\n'
+        '<user_request>\nBuy a white t-shirt.\n</user_request>\n'
+        f'<step_info>Step{step + 1} maximum:30\nToday:2026-10-17</step_info>\n'
+        '</agent_state>\n'
+        '<browser_state>\n'
+        f'Current tab: {tab}\n'
+        'Available tabs:\n'
+        f'Tab {tab}: {url} - {title}\n\n'
+        'Interactive elements:\n'
+        f'{elements_text}\n'
+        '</browser_state>\n'
+    )
+
+
+def agent_history(steps: int, result_chars: int = 40) -> str:
+    """<agent_history> com ``steps`` passos, como MessageManager.agent_history_description monta."""
+    items = [HistoryItem(step_number=0, action_results='Result\nNavigated to http://localhost:9990/en_US/')]
+    for number in range(1, steps):
+        items.append(HistoryItem(
+            step_number=number,
+            evaluation_previous_goal=f'Success - step {number - 1} worked.',
+            memory=f'Memory of step {number}.',
+            next_goal=f'Goal of step {number}.',
+            action_results=f'Result\nClicked element {number}. ' + 'x' * result_chars,
+        ))
+    return '\n'.join(item.to_string() for item in items)
+
+
+def step_messages(state: str, screenshot: bool = False) -> list:
+    """System + estado do passo, como o MessageManager entrega ao ``ainvoke``."""
+    if screenshot:
+        content = [
+            ContentPartTextParam(text=state),
+            ContentPartTextParam(text='Current screenshot:'),
+            ContentPartImageParam(image_url=ImageURL(url=f'data:image/png;base64,{PIXEL}', media_type='image/png')),
+        ]
+        user = UserMessage(content=content)
+    else:
+        user = UserMessage(content=state)
+    return [SystemMessage(content='You are a browser automation agent.'), user]
@@ -0,0 +1,64 @@
+from exec_openai import SYLIUS_PURCHASE_ASSERTIONS
+from fix.assertions import MONEY_PATTERN, Assertion, evaluate, evaluate_all
+
+# document.body.innerText da página de resumo do pedido (bench/mock_shop/.../checkout/complete)
+SUMMARY = (
+    'Fashion Web Store\nT-shirts\nCart\n\nSummary of your order\n'
+    'Billing address\n\nbrowser use\nbrowser.use\nbrowser.use, 123456789\nAUSTRALIA\n\n'
+    'Shipping address\n\nbrowser use\nbrowser.use\nbrowser.use, 123456789\nAUSTRALIA\n\n'
+    'Item\tUnit price\tQty\tSubtotal\n'
+    'Everyday white basic T-Shirt\nM\t$94.60\t5\t$473.00\n\n'
+    'Items total: $473.00\n\nShipping total: $3.44\n\nTaxes total: $0.00\n\n'
+    'Discount: $0.00\n\nTotal: $476.44\n\n'
+    'Payments\nCash on delivery $476.44\nPlace order'
+)
+
+
+def test_purchase_summary_passes_every_assertion():
+    results = evaluate_all(SYLIUS_PURCHASE_ASSERTIONS, SUMMARY)
+
+    assert [r.message for r in results if not r.passed] == []
+
+
+def test_wrong_billing_address_is_not_satisfied_by_the_shipping_block():
+    page = SUMMARY.replace('Billing address\n\nbrowser use\nbrowser.use\nbrowser.use, 123456789\nAUSTRALIA',
+                           'Billing address\n\nsomeone else\nsomewhere\nBRAZIL', 1)
+
+    failed = [r.assertion.id for r in evaluate_all(SYLIUS_PURCHASE_ASSERTIONS, page) if not r.passed]
+
+    assert failed == ['BILLING_ADDRESS']
+
+
+def test_address_block_ends_at_the_next_heading_without_blank_line():
+    page = 'Billing address\nsomeone else\nShipping address\nbrowser use\nAUSTRALIA'
+    billing = Assertion('BILLING', 'Billing', ['browser use'], match='contains', field='Billing address')
+
+    assert not evaluate(billing, page, headings=['Billing address', 'Shipping address']).passed
+
+
+def test_total_label_found_when_labels_share_a_line():
+    total = Assertion('TOTAL', 'Total', '$476.44', field='Total:', pattern=MONEY_PATTERN, layout='next')
+
+    result = evaluate(total, 'Shipping total: $3.44 Discount: $0.00 Total: $476.44')
+
+    assert result.passed, result.message
+
+
+def test_total_label_is_not_the_end_of_another_label():
+    total = Assertion('TOTAL', 'Total', '$476.44', field='Total:', pattern=MONEY_PATTERN, layout='next')
+
+    for page in ('Shipping total: $476.44', 'Subtotal: $476.44', 'Shipping  total: $476.44'):
+        assert not evaluate(total, page).passed, page
+
+
+def test_total_label_at_the_start_of_a_table_cell():
+    total = Assertion('TOTAL', 'Total', '$476.44', field='Total:', pattern=MONEY_PATTERN, layout='next')
+
+    assert evaluate(total, 'Order #000123\tTotal: $476.44').passed
+
+
+def test_column_layout_reads_the_cell_under_the_header():
+    qty = Assertion('QTY', 'Qty', '5', field='Qty', pattern=r'\d+', layout='column')
+
+    assert evaluate(qty, 'Qty\tItem\n5\tShirt\n').passed
+    assert not evaluate(qty, 'Qty\tItem\n4\tShirt 5\n').passed
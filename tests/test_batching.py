@@ -0,0 +1,109 @@
+import asyncio
+
+from fix.batching import BatchScheduler
+
+
+class StubTarget:
+    """Modelo LangChain falso: registra cada ``abatch``/``ainvoke`` e, com ``gate``, só responde quando liberado."""
+
+    def __init__(self, gate: asyncio.Event | None = None):
+        self.gate = gate
+        self.calls: list[list[str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _answer(self, prompts: list[str]) -> list[str]:
+        self.calls.append(prompts)
+        self.in_flight += len(prompts)
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if self.gate is not None:
+            await self.gate.wait()
+        self.in_flight -= len(prompts)
+        return [f'answer to {prompt}' for prompt in prompts]
+
+    async def abatch(self, inputs, return_exceptions=False, **kwargs):
+        return await self._answer([messages[0] for messages in inputs])
+
+    async def ainvoke(self, messages, **kwargs):
+        return (await self._answer([messages[0]]))[0]
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    target = StubTarget()
+    scheduler = BatchScheduler(target, window=60, max_batch_size=3)
+
+    async def run():
+        answers = await asyncio.wait_for(
+            asyncio.gather(*(scheduler.ainvoke([f'q{i}']) for i in range(3))), timeout=1
+        )
+        await scheduler.aclose()
+        return answers
+
+    assert asyncio.run(run()) == ['answer to q0', 'answer to q1', 'answer to q2']
+    assert target.calls == [['q0', 'q1', 'q2']]
+
+
+def test_partial_batch_is_sent_when_the_window_closes():
+    target = StubTarget()
+    scheduler = BatchScheduler(target, window=0.02, max_batch_size=8)
+
+    async def run():
+        first = await asyncio.gather(scheduler.ainvoke(['q0']), scheduler.ainvoke(['q1']))
+        second = await scheduler.ainvoke(['q2'])
+        await scheduler.aclose()
+        return [*first, second]
+
+    assert asyncio.run(run()) == ['answer to q0', 'answer to q1', 'answer to q2']
+    assert target.calls == [['q0', 'q1'], ['q2']]
+    assert scheduler.stats() == {'batches': 2, 'requests': 3, 'mean_batch_size': 1.5, 'largest_batch': 2}
+
+
+def test_requests_with_different_kwargs_go_in_separate_batches():
+    target = StubTarget()
+    scheduler = BatchScheduler(target, window=0.02)
+
+    async def run():
+        await asyncio.gather(
+            scheduler.ainvoke(['q0'], stop=['\n']), scheduler.ainvoke(['q1']), scheduler.ainvoke(['q2'], stop=['\n'])
+        )
+        await scheduler.aclose()
+
+    asyncio.run(run())
+    assert sorted(target.calls) == [['q0', 'q2'], ['q1']]
+
+
+def test_max_pending_holds_back_extra_requests():
+    async def run():
+        target = StubTarget(gate=asyncio.Event())
+        scheduler = BatchScheduler(target, window=0.001, max_batch_size=8, max_pending=2)
+        calls = [asyncio.create_task(scheduler.ainvoke([f'q{i}'])) for i in range(5)]
+        await asyncio.sleep(0.05)
+        held = sum(len(prompts) for prompts in target.calls)
+
+        target.gate.set()
+        answers = await asyncio.wait_for(asyncio.gather(*calls), timeout=1)
+        await scheduler.aclose()
+        return held, target.max_in_flight, answers
+
+    held, max_in_flight, answers = asyncio.run(run())
+    assert held == 2
+    assert max_in_flight == 2
+    assert answers == [f'answer to q{i}' for i in range(5)]
+
+
+def test_aclose_sends_and_waits_for_every_pending_request():
+    async def run():
+        target = StubTarget()
+        # Janela longa: sem o aclose, os pedidos ficariam esperando a coleta
+        scheduler = BatchScheduler(target, window=60, max_batch_size=2)
+        calls = [asyncio.create_task(scheduler.ainvoke([f'q{i}'])) for i in range(5)]
+        await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(scheduler.aclose(), timeout=1)
+        assert all(call.done() for call in calls)
+        return target.calls, [call.result() for call in calls]
+
+    batches, answers = asyncio.run(run())
+    assert answers == [f'answer to q{i}' for i in range(5)]
+    assert sorted(prompt for prompts in batches for prompt in prompts) == [f'q{i}' for i in range(5)]
+    assert max(len(prompts) for prompts in batches) <= 2
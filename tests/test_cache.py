@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from browser_use.llm.exceptions import ModelProviderError
+from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+from langchain_core.messages import AIMessage
+
+from fix.cache import ResponseCache
+from fix.chat import ChatLangchain
+from fix.serializer import LangChainMessageSerializer
+from tests.messages import agent_output_type, browser_state, step_messages
+
+OUTPUT = {'evaluation_previous_goal': 'ok', 'memory': '', 'next_goal': 'Check out', 'action': [{'click': {'index': 40}}]}
+USAGE = ChatInvokeUsage(
+    prompt_tokens=900, completion_tokens=60, total_tokens=960,
+    prompt_cached_tokens=None, prompt_cache_creation_tokens=None, prompt_image_tokens=None,
+)
+
+
+def _messages(button: str = '[40]<button>Checkout</button>'):
+    return LangChainMessageSerializer.serialize_messages(step_messages(browser_state([button])))
+
+
+def _completion():
+    return ChatInvokeCompletion(completion=agent_output_type().model_validate(OUTPUT), usage=USAGE)
+
+
+def test_round_trip_restores_the_output_model_and_usage(tmp_path):
+    cache = ResponseCache(tmp_path)
+    output_format = agent_output_type()
+    key, cached = cache.lookup('qwen3-coder', _messages(), output_format)
+    assert cached is None
+
+    cache.put(key, _completion())
+    _, cached = ResponseCache(tmp_path).lookup('qwen3-coder', _messages(), output_format)
+
+    assert cached.completion.model_dump(exclude_unset=True) == OUTPUT
+    assert cached.usage == USAGE
+
+
+def test_key_depends_on_model_messages_and_schema(tmp_path):
+    cache = ResponseCache(tmp_path)
+    output_format = agent_output_type()
+    key = cache.key('qwen3-coder', _messages(), output_format)
+
+    assert key == cache.key('qwen3-coder', _messages(), output_format)
+    assert key != cache.key('qwen3-vl', _messages(), output_format)
+    assert key != cache.key('qwen3-coder', _messages('[41]<button>Checkout</button>'), output_format)
+    assert key != cache.key('qwen3-coder', _messages(), None)
+
+
+def test_replay_hits_across_dates_and_tab_ids(tmp_path):
+    output_format = agent_output_type()
+    recorded = browser_state(['[40]<button>Checkout</button>'], tab='8A1F', history='Switched to tab #8A1F')
+    cache = ResponseCache(tmp_path, mode='record')
+    key, _ = cache.lookup('qwen3-coder', LangChainMessageSerializer.serialize_messages(step_messages(recorded)),
+                          output_format)
+    cache.put(key, _completion())
+
+    replayed = browser_state(['[40]<button>Checkout</button>'], tab='C03E', history='Switched to tab #C03E')
+    replayed = replayed.replace('Today:2026-10-17', 'Today:2026-11-02')
+    messages = LangChainMessageSerializer.serialize_messages(step_messages(replayed))
+    _, cached = ResponseCache(tmp_path, mode='replay').lookup('qwen3-coder', messages, output_format)
+
+    assert cached.completion.model_dump(exclude_unset=True) == OUTPUT
+
+
+def test_replay_miss_is_an_error_and_record_always_misses(tmp_path):
+    with pytest.raises(ModelProviderError):
+        ResponseCache(tmp_path, mode='replay').lookup('qwen3-coder', _messages(), None)
+
+    cache = ResponseCache(tmp_path)
+    key, _ = cache.lookup('qwen3-coder', _messages(), None)
+    cache.put(key, ChatInvokeCompletion(completion='text', usage=None))
+    assert ResponseCache(tmp_path, mode='record').get(key, None) is None
+    assert ResponseCache(tmp_path, mode='replay').get(key, None).completion == 'text'
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(tmp_path, max_entries=2)
+    for name in ('a', 'b'):
+        cache.put(name, ChatInvokeCompletion(completion=name, usage=None))
+    cache.get('a', None)
+
+    cache.put('c', ChatInvokeCompletion(completion='c', usage=None))
+
+    assert sorted(p.stem for p in tmp_path.glob('*.json')) == ['a', 'c']
+
+
+class CountingChat:
+    model_name = 'qwen3-coder:30b'
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        return AIMessage(content='{"evaluation_previous_goal": "ok", "memory": "", "next_goal": "Check out", '
+                                 '"action": [{"click": {"index": 40}}]}')
+
+
+def test_chat_serves_a_repeated_call_from_the_cache(tmp_path):
+    fake = CountingChat()
+    llm = ChatLangchain(chat=fake, cache=ResponseCache(tmp_path))
+    messages = step_messages(browser_state(['[40]<button>Checkout</button>']))
+
+    first = asyncio.run(llm.ainvoke(messages, agent_output_type()))
+    second = asyncio.run(llm.ainvoke(messages, agent_output_type()))
+
+    assert fake.calls == 1
+    assert second.completion == first.completion
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from browser_use.llm.exceptions import ModelProviderError
+from langchain_core.messages import AIMessage
+from pydantic import BaseModel
+
+from fix import chat as chat_module
+from fix.chat import ChatLangchain
+from fix.history import HistoryWindow
+from fix.metrics import estimate_tokens
+from fix.profiles import ModelProfile
+from tests.messages import agent_history, browser_state, step_messages
+
+
+class Answer(BaseModel):
+    value: int
+
+
+class Rejected(Exception):
+    """Recusa do servidor no formato do openai.BadRequestError."""
+
+    status_code = 400
+
+
+class Unavailable(Rejected):
+    status_code = 503
+
+
+class FakeChat:
+    """Modelo LangChain falso: só aceita as estratégias em ``supported`` e registra as tentadas."""
+
+    model_name = 'unprofiled-model'
+
+    def __init__(self, *supported: str):
+        self.supported = set(supported)
+        self.error: type[Exception] = Rejected
+        self.attempts: list[str] = []
+        self.prompts: list[str] = []
+
+    def with_structured_output(self, schema, method=None, include_raw=False, **kwargs):
+        strategy = method or 'native'
+        chat = self
+
+        class Runnable:
+            async def ainvoke(self, messages):
+                chat.attempts.append(strategy)
+                if strategy not in chat.supported:
+                    raise chat.error(f"response_format '{strategy}' is not supported")
+                raw = AIMessage(content='{"value": 1}')
+                return {'raw': raw, 'parsed': schema(value=1), 'parsing_error': None}
+
+        return Runnable()
+
+    async def ainvoke(self, messages, **kwargs):
+        self.attempts.append('text')
+        self.prompts.append('\n'.join(str(m.content) for m in messages))
+        return AIMessage(content='```json\n{"value": 1}\n```')
+
+
+@pytest.fixture(autouse=True)
+def forget_strategies():
+    chat_module._strategy_by_model.clear()
+    yield
+    chat_module._strategy_by_model.clear()
+
+
+def _invoke(llm: ChatLangchain):
+    return asyncio.run(llm.ainvoke(step_messages(browser_state(['[1]<a>Home</a>'])), Answer))
+
+
+def test_detects_and_remembers_the_first_supported_strategy():
+    fake = FakeChat('json_mode', 'text')
+    llm = ChatLangchain(chat=fake)
+
+    _invoke(llm)
+    _invoke(llm)
+
+    assert fake.attempts == ['native', 'json_mode', 'json_mode']
+
+
+def test_rejected_strategy_is_replaced_in_the_memo():
+    fake = FakeChat('native', 'json_mode')
+    llm = ChatLangchain(chat=fake)
+    _invoke(llm)
+
+    # O servidor deixou de aceitar tool calling (ex: trocaram o modelo atrás do proxy)
+    fake.supported = {'json_mode'}
+    _invoke(llm)
+    _invoke(llm)
+
+    assert fake.attempts == ['native', 'native', 'json_mode', 'json_mode']
+
+
+def test_transient_error_on_remembered_strategy_does_not_fall_back():
+    fake = FakeChat('native')
+    llm = ChatLangchain(chat=fake)
+    _invoke(llm)
+
+    fake.supported = set()
+    fake.error = Unavailable
+    with pytest.raises(ModelProviderError):
+        _invoke(llm)
+
+    assert fake.attempts == ['native', 'native']
+
+
+def test_text_strategy_strips_fences():
+    fake = FakeChat()
+    result = _invoke(ChatLangchain(chat=fake, structured_output='text'))
+
+    assert result.completion == Answer(value=1)
+    assert fake.attempts == ['text']
+
+
+def test_profile_context_is_the_default_history_budget():
+    state = browser_state(['[1]<a>Home</a>'], history=agent_history(40, result_chars=400))
+    messages = step_messages(state)
+    window = HistoryWindow(keep_steps=40)
+    prompts = {}
+    for context_tokens in (None, 3000):
+        fake = FakeChat()
+        profile = ModelProfile(name='small', structured_output='text', context_tokens=context_tokens, max_output_tokens=1000)
+        llm = ChatLangchain(chat=fake, profile=profile, history_window=window)
+        asyncio.run(llm.ainvoke(messages, Answer))
+        prompts[context_tokens] = fake.prompts[0]
+
+    assert prompts[None].count('<step>') == 40
+    assert estimate_tokens(prompts[3000]) <= 2000 < estimate_tokens(prompts[None])
@@ -0,0 +1,90 @@
+from browser_use.llm.messages import SystemMessage
+
+from fix.dom_diff import StateDiff
+from fix.trace import current_run
+from tests.messages import SHOP, browser_state, step_messages
+
+CART = f'{SHOP}/cart/'
+CART_ELEMENTS = [
+    '[3]<a href="/en_US/">Home</a>',
+    'Everyday white basic T-Shirt',
+    'Qty [5]',
+    '\t[21]<input type="number" name="sylius_cart[items][0][quantity]" value="5" />',
+    '|SCROLL|[30]<div class="items" />',
+    '[40]<button type="submit">Checkout</button>',
+]
+
+
+def _apply(diff: StateDiff, elements: list[str], step: int, url: str = CART, screenshot: bool = False):
+    messages = diff.apply(step_messages(browser_state(elements, url=url, step=step), screenshot=screenshot))
+    state = messages[-1].content if isinstance(messages[-1].content, str) else messages[-1].content[0].text
+    return messages, state
+
+
+def test_first_step_on_a_page_becomes_the_reference():
+    messages, state = _apply(StateDiff(), CART_ELEMENTS, step=1)
+
+    assert isinstance(messages[0], SystemMessage)
+    assert messages[1].content.startswith('<page_reference>\nInteractive elements of ' + CART)
+    assert '[40]<button type="submit">Checkout</button>' in messages[1].content
+    assert 'Interactive elements: same as <page_reference> (step 2), nothing changed.' in state
+
+
+def test_next_step_sends_only_changed_added_and_removed_elements():
+    # Página pequena: a diferença passa da metade da referência, que é o padrão para refazê-la
+    diff = StateDiff(rebase_ratio=1.0)
+    _apply(diff, CART_ELEMENTS, step=1)
+    changed = [line.replace('value="5"', 'value="3"') for line in CART_ELEMENTS if '[30]' not in line]
+    changed.append('*[41]<a href="/en_US/checkout/address">Address</a>')
+
+    _, state = _apply(diff, changed, step=2, screenshot=True)
+
+    assert 'Changed:\n[21]<input type="number" name="sylius_cart[items][0][quantity]" value="3" />' in state
+    assert 'Added:\n*[41]<a href="/en_US/checkout/address">Address</a>' in state
+    assert 'Removed: [30]' in state
+    assert '[40]<button' not in state
+    assert diff.stats() == {'diffs': 1, 'rebases': 1}
+
+
+def test_page_text_with_brackets_is_text_not_an_element():
+    diff = StateDiff()
+    _apply(diff, CART_ELEMENTS, step=1)
+
+    _, state = _apply(diff, [line.replace('Qty [5]', 'Qty [3]') for line in CART_ELEMENTS], step=2)
+
+    assert 'Added:\nQty [3]' in state
+    assert 'Removed text:\nQty [5]' in state
+    assert 'Removed: ' not in state
+
+
+def test_navigation_rebases():
+    diff = StateDiff()
+    _apply(diff, CART_ELEMENTS, step=1)
+
+    messages, _ = _apply(diff, ['[50]<input name="email" />'], step=2, url=f'{SHOP}/checkout/address/')
+
+    assert '[50]<input name="email" />' in messages[1].content
+    assert diff.rebases == 2
+
+
+def test_end_run_forgets_the_reference_of_a_reused_run_name():
+    diff = StateDiff()
+    token = current_run.set('sylius-purchase')
+    try:
+        _apply(diff, CART_ELEMENTS, step=3)
+        diff.end_run()
+        _apply(diff, CART_ELEMENTS, step=3)
+    finally:
+        current_run.reset(token)
+
+    assert diff.rebases == 2
+
+
+def test_earlier_step_than_the_reference_starts_over():
+    diff = StateDiff()
+    _apply(diff, CART_ELEMENTS, step=5)
+
+    messages, _ = _apply(diff, CART_ELEMENTS, step=0)
+
+    assert 'at step 1.' in messages[1].content
+    assert diff.rebases == 2
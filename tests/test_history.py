@@ -0,0 +1,59 @@
+from browser_use.llm.messages import ContentPartTextParam
+
+from fix.history import HistoryWindow, summarize_step
+from fix.metrics import estimate_tokens
+from tests.messages import agent_history, browser_state, step_messages
+
+
+def _history(messages) -> str:
+    content = messages[-1].content
+    text = content if isinstance(content, str) else content[0].text
+    return text.split('<agent_history>\n', 1)[1].split('\n</agent_history>', 1)[0]
+
+
+def test_short_history_is_left_untouched():
+    messages = step_messages(browser_state(['[1]<a>Home</a>'], history=agent_history(4)))
+
+    assert HistoryWindow(keep_steps=6).apply(messages) is messages
+
+
+def test_old_steps_become_one_line_summaries_and_recent_steps_stay_verbatim():
+    messages = step_messages(browser_state(['[1]<a>Home</a>'], history=agent_history(10)))
+
+    history = _history(HistoryWindow(keep_steps=3).apply(messages))
+
+    items = history.split('<step>\n')[1:]
+    assert len(items) == 10
+    # Primeiro item (ações iniciais) mantido, passos 1-6 resumidos, 7-9 na íntegra
+    assert items[0].startswith('Result\nNavigated to')
+    assert items[1].strip() == 'Goal of step 1. → Clicked element 1. xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
+    assert items[9].startswith('Success - step 8 worked.\nMemory of step 9.\nGoal of step 9.\nResult\n')
+
+
+def test_summary_of_a_step_without_goal_uses_the_result():
+    item = '<step>\nResult\nNavigated to http://localhost:9990/en_US/'
+
+    assert summarize_step(item) == '<step>\nNavigated to http://localhost:9990/en_US/'
+
+
+def test_token_budget_drops_summaries_then_shrinks_the_window():
+    messages = step_messages(browser_state(['[1]<a>Home</a>'], history=agent_history(30, result_chars=400)))
+    window = HistoryWindow(keep_steps=6, max_tokens=1000)
+
+    result = window.apply(messages)
+
+    history = _history(result)
+    assert '<sys>[... ' in history and 'previous steps omitted...]</sys>' in history
+    assert estimate_tokens(result[0].content) + estimate_tokens(result[1].content) <= 1000
+    assert 'Memory of step 29.' in history
+
+
+def test_window_rewrites_the_text_part_of_a_vision_message():
+    messages = step_messages(browser_state(['[1]<a>Home</a>'], history=agent_history(10)), screenshot=True)
+
+    result = HistoryWindow(keep_steps=2).apply(messages)
+
+    assert isinstance(result[1].content[0], ContentPartTextParam)
+    assert result[1].content[2] is messages[1].content[2]
+    assert 'Memory of step 3.' not in result[1].content[0].text
+    assert 'Memory of step 9.' in result[1].content[0].text
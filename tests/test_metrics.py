@@ -0,0 +1,61 @@
+import json
+
+from browser_use.llm.views import ChatInvokeCompletion
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from fix.metrics import ChatMetrics, estimate_tokens
+
+PROMPT = [SystemMessage(content='You are a browser automation agent.'), HumanMessage(content='x' * 400)]
+
+
+def _record(metrics: ChatMetrics, n: int = 1) -> None:
+    for _ in range(n):
+        metrics.record_call('qwen3-coder', PROMPT, ChatInvokeCompletion(completion='{"action": []}', usage=None), 0.5)
+
+
+def test_calls_are_buffered_until_flush(tmp_path):
+    metrics = ChatMetrics(tmp_path / 'calls.jsonl', tmp_path / 'metrics.prom')
+
+    _record(metrics, 3)
+    assert not (tmp_path / 'calls.jsonl').exists()
+    assert not (tmp_path / 'metrics.prom').exists()
+
+    metrics.close()
+    records = [json.loads(line) for line in (tmp_path / 'calls.jsonl').read_text().splitlines()]
+    assert len(records) == 3
+    assert records[0]['tokens_estimated'] is True
+    assert records[0]['prompt_tokens'] == estimate_tokens('You are a browser automation agent.' + 'x' * 400)
+    assert 'llm_call_latency_seconds_count{model="qwen3-coder"} 3' in (tmp_path / 'metrics.prom').read_text()
+
+
+def test_jsonl_is_appended_in_batches(tmp_path):
+    metrics = ChatMetrics(tmp_path / 'calls.jsonl', flush_every=2)
+
+    _record(metrics, 3)
+
+    assert len((tmp_path / 'calls.jsonl').read_text().splitlines()) == 2
+    metrics.flush()
+    assert len((tmp_path / 'calls.jsonl').read_text().splitlines()) == 3
+
+
+def test_prometheus_file_is_refreshed_after_the_interval(tmp_path):
+    metrics = ChatMetrics(prometheus_path=tmp_path / 'metrics.prom', prometheus_interval=0)
+
+    _record(metrics)
+
+    assert 'llm_events_total{event="calls_model",model="qwen3-coder"} 1' in (tmp_path / 'metrics.prom').read_text()
+
+
+def test_cache_hits_have_their_own_latency_histogram():
+    metrics = ChatMetrics()
+    _record(metrics, 2)
+    metrics.record_call('qwen3-coder', PROMPT, ChatInvokeCompletion(completion='{"action": []}', usage=None), 0.001,
+                        path='cache')
+
+    assert metrics.latency['qwen3-coder'].count == 2
+    assert metrics.latency['qwen3-coder'].total == 1.0
+    assert metrics.cache_latency['qwen3-coder'].count == 1
+    assert metrics.events[('calls_cache', 'qwen3-coder')] == 1
+    text = metrics.to_prometheus()
+    assert 'llm_call_latency_seconds_count{model="qwen3-coder"} 2' in text
+    assert 'llm_cache_latency_seconds_count{model="qwen3-coder"} 1' in text
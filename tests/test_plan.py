@@ -0,0 +1,138 @@
+import asyncio
+
+from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+
+from fix.plan import REPLAYED_EVALUATION, ActionPlanStore, FastPathChat, PlanStep, element_map, page_url
+from tests.messages import SHOP, agent_output_type, browser_state, step_messages
+
+PRODUCT = f'{SHOP}/products/everyday-white-basic-t-shirt'
+PRODUCT_ELEMENTS = [
+    '[3]<a href="/en_US/">Home</a>',
+    '\t[7]<select name="sylius_add_to_cart[cartItem][variant]" />',
+    '\t*[12]<input type="number" name="quantity" value="1" />',
+    '|SHADOW(open)|[15]<button type="submit">Add to cart</button>',
+]
+
+
+class ScriptedLLM:
+    """Chat falso que devolve as saídas dadas, na ordem, e conta as chamadas."""
+
+    model = 'fake'
+    provider = 'fake'
+    name = 'fake'
+
+    def __init__(self, *outputs: dict):
+        self.outputs = list(outputs)
+        self.calls = 0
+
+    async def ainvoke(self, messages, output_format=None, **kwargs):
+        self.calls += 1
+        return ChatInvokeCompletion(
+            completion=output_format.model_validate(self.outputs.pop(0)),
+            usage=ChatInvokeUsage(
+                prompt_tokens=10, completion_tokens=5, total_tokens=15,
+                prompt_cached_tokens=None, prompt_cache_creation_tokens=None, prompt_image_tokens=None,
+            ),
+        )
+
+
+def _output(*actions: dict) -> dict:
+    return {'evaluation_previous_goal': 'ok', 'memory': '', 'next_goal': 'next', 'action': list(actions)}
+
+
+def _invoke(chat: FastPathChat, state: str):
+    return asyncio.run(chat.ainvoke(step_messages(state), agent_output_type()))
+
+
+def test_element_map_reads_prefixed_lines_and_drops_volatile_attributes():
+    elements = element_map(step_messages(browser_state(PRODUCT_ELEMENTS, url=PRODUCT)))
+
+    assert elements == {
+        3: '<a href="/en_US/">Home</a>',
+        7: '<select name="sylius_add_to_cart[cartItem][variant]" />',
+        12: '<input type="number" name="quantity" />',
+        15: '<button type="submit">Add to cart</button>',
+    }
+
+
+def test_element_map_reads_the_text_part_of_a_vision_message():
+    messages = step_messages(browser_state(PRODUCT_ELEMENTS, url=PRODUCT), screenshot=True)
+
+    assert 15 in element_map(messages)
+
+
+def test_page_url_strips_query_and_fragment():
+    state = browser_state(PRODUCT_ELEMENTS, url=f'{PRODUCT}?variant=3#reviews')
+
+    assert page_url(step_messages(state)) == PRODUCT
+
+
+def test_page_url_without_current_tab_is_none():
+    state = browser_state(PRODUCT_ELEMENTS).replace('Current tab: 8A1F\n', '')
+
+    assert page_url(step_messages(state)) is None
+
+
+def test_replays_recorded_step_with_remapped_index(tmp_path):
+    store = ActionPlanStore(tmp_path)
+    store.save('buy', [PlanStep(
+        output=_output({'click': {'index': 40}}),
+        targets={0: '<button type="submit">Add to cart</button>'},
+        url=PRODUCT,
+    )])
+    llm = ScriptedLLM()
+    chat = FastPathChat(llm=llm, store=store, task='buy')
+
+    result = _invoke(chat, browser_state(PRODUCT_ELEMENTS, url=PRODUCT))
+
+    assert llm.calls == 0
+    assert chat.replayed == 1
+    assert result.usage.total_tokens == 0
+    assert result.completion.evaluation_previous_goal == REPLAYED_EVALUATION
+    assert result.completion.model_dump(exclude_unset=True)['action'] == [{'click': {'index': 15}}]
+
+
+def test_falls_back_to_llm_on_another_page_and_stops_replaying_after_divergence(tmp_path):
+    store = ActionPlanStore(tmp_path)
+    store.save('buy', [
+        PlanStep(output=_output({'click': {'index': 15}}), targets={0: '<button type="submit">Add to cart</button>'}, url=PRODUCT),
+        PlanStep(output=_output({'click': {'index': 3}}), targets={0: '<a href="/en_US/">Home</a>'}, url=PRODUCT),
+    ])
+    llm = ScriptedLLM(_output({'scroll': {'down': True, 'pages': 1.0}}), _output({'click': {'index': 3}}))
+    chat = FastPathChat(llm=llm, store=store, task='buy')
+
+    _invoke(chat, browser_state(PRODUCT_ELEMENTS, url=f'{SHOP}/cart'))
+    _invoke(chat, browser_state(PRODUCT_ELEMENTS, url=PRODUCT))
+
+    assert llm.calls == 2
+    assert chat.replayed == 0
+
+
+def test_ambiguous_target_goes_to_llm_and_matching_answer_keeps_the_plan(tmp_path):
+    store = ActionPlanStore(tmp_path)
+    button = '<button type="submit">Add to cart</button>'
+    store.save('buy', [
+        PlanStep(output=_output({'click': {'index': 15}}), targets={0: button}, url=PRODUCT),
+        PlanStep(output=_output({'click': {'index': 3}}), targets={0: '<a href="/en_US/">Home</a>'}, url=PRODUCT),
+    ])
+    llm = ScriptedLLM(_output({'click': {'index': 16}}))
+    chat = FastPathChat(llm=llm, store=store, task='buy')
+
+    _invoke(chat, browser_state([*PRODUCT_ELEMENTS, f'[16]{button}'], url=PRODUCT))
+    _invoke(chat, browser_state(PRODUCT_ELEMENTS, url=PRODUCT))
+
+    assert llm.calls == 1
+    assert chat.replayed == 1
+
+
+def test_save_plan_round_trips_the_recorded_steps(tmp_path):
+    store = ActionPlanStore(tmp_path)
+    llm = ScriptedLLM(_output({'click': {'index': 15}}))
+    chat = FastPathChat(llm=llm, store=store, task='buy')
+
+    _invoke(chat, browser_state(PRODUCT_ELEMENTS, url=PRODUCT))
+    chat.save_plan()
+
+    [step] = store.load('buy')
+    assert step.url == PRODUCT
+    assert step.targets == {0: '<button type="submit">Add to cart</button>'}
@@ -0,0 +1,39 @@
+import asyncio
+
+import httpx
+
+from fix.pool import build_openai_pool
+
+PRIMARY = 'http://primary:4000/v1'
+SECONDARY = 'http://secondary:4000/v1'
+
+
+def _pool(statuses: dict[str, int]):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(statuses[request.url.host], json={'data': []})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return build_openai_pool([(PRIMARY, 'qwen3-coder'), (SECONDARY, 'qwen3-coder')], api_key='test', http_client=client)
+
+
+def test_client_errors_fail_the_health_check():
+    pool = _pool({'primary': 200, 'secondary': 401})
+
+    asyncio.run(pool.check_health())
+
+    assert [e.healthy for e in pool.endpoints] == [True, False]
+
+
+def test_wrong_base_path_stays_in_quarantine_and_2xx_brings_it_back():
+    statuses = {'primary': 200, 'secondary': 404}
+    pool = _pool(statuses)
+    secondary = pool.endpoints[1]
+    pool._mark_failure(secondary)
+
+    asyncio.run(pool.check_health())
+    assert not secondary.healthy
+
+    statuses['secondary'] = 200
+    asyncio.run(pool.check_health())
+    assert secondary.healthy
+    assert secondary.failures == 0
@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from fix.prefetch import StatePrefetcher
+
+
+class StubSession:
+    """Navegador falso: cada ação muda a página; o estado traz a versão da página no momento da captura."""
+
+    def __init__(self):
+        self.page_version = 0
+        self.captures = 0
+
+    async def get_browser_state_summary(self, include_screenshot=True, cached=False, include_recent_events=False):
+        self.captures += 1
+        version = self.page_version
+        await asyncio.sleep(0)
+        return SimpleNamespace(version=version, screenshot=include_screenshot, cached=cached)
+
+
+class StubTools:
+    def __init__(self, session: StubSession):
+        self.session = session
+
+    async def act(self, action, **kwargs):
+        self.session.page_version += 1
+        return SimpleNamespace(is_done=action == 'done')
+
+
+class StubAgent:
+    include_recent_events = False
+
+    def __init__(self):
+        self.browser_session = StubSession()
+        self.tools = StubTools(self.browser_session)
+        self.state = SimpleNamespace(stopped=False)
+
+    async def multi_act(self, actions):
+        return [await self.tools.act(action) for action in actions]
+
+
+def _prepare_context(agent: StubAgent):
+    """Pedido de estado do início de cada passo do browser-use (Agent._prepare_context)."""
+    return agent.browser_session.get_browser_state_summary(include_screenshot=True, cached=False,
+                                                           include_recent_events=False)
+
+
+def test_detach_restores_the_original_methods():
+    agent = StubAgent()
+    prefetcher = StatePrefetcher()
+
+    prefetcher.attach(agent)
+    assert {'multi_act'} <= agent.__dict__.keys()
+    assert {'act'} <= agent.tools.__dict__.keys()
+    assert {'get_browser_state_summary'} <= agent.browser_session.__dict__.keys()
+    with pytest.raises(RuntimeError):
+        prefetcher.attach(agent)
+    prefetcher.detach()
+
+    assert agent.multi_act.__func__ is StubAgent.multi_act
+    assert agent.tools.act.__func__ is StubTools.act
+    assert agent.browser_session.get_browser_state_summary.__func__ is StubSession.get_browser_state_summary
+    prefetcher.attach(agent)
+    prefetcher.detach()
+
+
+def test_next_step_gets_the_prefetched_state():
+    agent = StubAgent()
+    prefetcher = StatePrefetcher()
+    prefetcher.attach(agent)
+
+    async def step():
+        await agent.multi_act(['click'])
+        return await _prepare_context(agent)
+
+    state = asyncio.run(step())
+    prefetcher.detach()
+
+    assert state.version == 1
+    assert agent.browser_session.captures == 1
+    assert prefetcher.stats()['hits'] == 1
+
+
+def test_state_prefetched_before_another_action_is_discarded():
+    agent = StubAgent()
+    prefetcher = StatePrefetcher()
+    prefetcher.attach(agent)
+
+    async def step():
+        await agent.multi_act(['click'])
+        # Ação fora do multi_act (ex.: hook do passo) depois de a antecipação começar
+        await agent.tools.act('scroll')
+        return await _prepare_context(agent)
+
+    state = asyncio.run(step())
+    prefetcher.detach()
+
+    assert state.version == 2
+    assert prefetcher.stats()['discarded'] == 1
+    assert prefetcher.stats()['hits'] == 0
+
+
+def test_other_requests_and_finished_steps_skip_the_prefetch():
+    agent = StubAgent()
+    prefetcher = StatePrefetcher()
+    prefetcher.attach(agent)
+
+    async def steps():
+        await agent.multi_act(['click'])
+        cached = await agent.browser_session.get_browser_state_summary(cached=True)
+        await _prepare_context(agent)
+        await agent.multi_act(['done'])
+        return cached
+
+    cached = asyncio.run(steps())
+    prefetcher.detach()
+
+    assert cached.cached
+    assert prefetcher.stats()['hits'] == 1
+    # click (antecipado) + cached; o done não antecipa nada
+    assert agent.browser_session.captures == 2
@@ -0,0 +1,71 @@
+import json
+from collections import Counter
+
+from fix.repair import repair_data, repair_json_text
+from tests.messages import agent_output_type
+
+# Saída típica do Qwen3-Coder em modo texto
+QWEN_OUTPUT = '''Here is my next step:
+```json
+{
+  "evaluation_previous_goal": "Success - the product page is open.",
+  "memory": "On the t-shirt page.",
+  "next_goal": "Add 5 items to the cart.",
+  "action": [
+    {"input": {"element": "12", "value": "5",}},
+    {"click": {"index": 15}},
+  ],
+}
+```
+Done.'''
+
+
+def test_repair_json_text_drops_prose_and_trailing_commas():
+    data = json.loads(repair_json_text(QWEN_OUTPUT))
+
+    assert data['action'] == [{'input': {'element': '12', 'value': '5'}}, {'click': {'index': 15}}]
+
+
+def test_repair_json_text_closes_truncated_output_and_drops_the_partial_member():
+    truncated = '{"memory": "On the cart page.", "next_goal": "Check out", "action": [{"click": {"index": 40}}, {"input": {"ind'
+
+    data = json.loads(repair_json_text(truncated))
+
+    assert data == {'memory': 'On the cart page.', 'next_goal': 'Check out', 'action': [{'click': {'index': 40}}, {'input': {}}]}
+
+
+def test_repair_json_text_closes_an_open_string():
+    data = json.loads(repair_json_text('{"memory": "Typed the e-mail \\"browser'))
+
+    assert data == {'memory': 'Typed the e-mail "browser'}
+
+
+def test_repair_json_text_keeps_brackets_inside_strings():
+    text = '{"memory": "element [12]<input> {quantity}", "action": []} trailing'
+
+    assert json.loads(repair_json_text(text)) == {'memory': 'element [12]<input> {quantity}', 'action': []}
+
+
+def test_repair_data_renames_aliases_and_coerces_types_for_agent_output():
+    output_format = agent_output_type()
+    repairs: Counter[str] = Counter()
+    data = json.loads(repair_json_text(QWEN_OUTPUT))
+
+    fixed = repair_data(data, output_format, repairs)
+    parsed = output_format(**fixed)
+
+    assert parsed.model_dump(exclude_unset=True)['action'][0] == {'input': {'index': 12, 'text': '5'}}
+    assert repairs['element->index'] == 1
+    assert repairs['value->text'] == 1
+    assert repairs['str->int'] == 1
+
+
+def test_repair_data_wraps_a_single_action_in_a_list():
+    output_format = agent_output_type()
+    repairs: Counter[str] = Counter()
+    data = {'memory': '', 'next_goal': '', 'evaluation_previous_goal': '', 'action': {'click': {'index': '3'}}}
+
+    parsed = output_format(**repair_data(data, output_format, repairs))
+
+    assert parsed.model_dump(exclude_unset=True)['action'] == [{'click': {'index': 3}}]
+    assert repairs['object->list'] == 1
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+from browser_use.llm.exceptions import ModelProviderError
+from langchain_core.messages import AIMessage
+
+from fix.chat import ChatLangchain
+from fix.retry import CircuitBreaker, CircuitOpenError, RetryPolicy, is_transient
+from tests.messages import agent_output_type, browser_state, step_messages
+
+VALID = '{"evaluation_previous_goal": "ok", "memory": "", "next_goal": "Check out", "action": [{"click": {"index": 40}}]}'
+
+
+class ServerError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f'Error code: {status_code}')
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def test_is_transient_follows_the_cause_chain():
+    try:
+        try:
+            raise APIConnectionError('connection refused')
+        except APIConnectionError as e:
+            raise ModelProviderError('LangChain wrapper error', model='qwen3-coder') from e
+    except ModelProviderError as wrapped:
+        assert is_transient(wrapped)
+
+
+@pytest.mark.parametrize(('error', 'expected'), [
+    (ServerError(503), True),
+    (ServerError(429), True),
+    (ServerError(400), False),
+    (TimeoutError(), True),
+    # 502 é o status padrão do ModelProviderError, não um erro do servidor
+    (ModelProviderError('bad output', model='qwen3-coder'), False),
+    (CircuitOpenError('open'), False),
+])
+def test_is_transient_by_status_and_type(error, expected):
+    assert is_transient(error) is expected
+
+
+def test_breaker_opens_after_threshold_and_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+
+    # reset_timeout=0: já em half-open; só uma chamada de teste por vez
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    breaker.record_success()
+
+    assert breaker.state == 'closed'
+
+
+def test_breaker_stays_open_until_the_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    breaker.record_failure()
+
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_backoff_is_bounded_by_max_delay():
+    policy = RetryPolicy(base_delay=0.5, max_delay=2.0)
+
+    delays = [policy.backoff(attempt) for attempt in range(1, 8) for _ in range(20)]
+
+    assert all(0 <= d <= 2.0 for d in delays)
+
+
+class FlakyChat:
+    """Modelo falso que levanta ou responde conforme o roteiro, e guarda as mensagens recebidas."""
+
+    model_name = 'qwen3-coder:30b'
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.received: list[list] = []
+
+    async def ainvoke(self, messages, **kwargs):
+        self.received.append(messages)
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return AIMessage(content=step)
+
+
+def _invoke(llm: ChatLangchain):
+    return asyncio.run(llm.ainvoke(step_messages(browser_state(['[40]<button>Checkout</button>'])), agent_output_type()))
+
+
+def test_transient_errors_are_retried():
+    fake = FlakyChat(ServerError(503), VALID)
+    llm = ChatLangchain(chat=fake, retry=RetryPolicy(base_delay=0.0, timeout=None))
+
+    result = _invoke(llm)
+
+    assert len(fake.received) == 2
+    assert result.completion.model_dump(exclude_unset=True)['action'] == [{'click': {'index': 40}}]
+
+
+def test_invalid_output_is_reprompted_with_the_error():
+    fake = FlakyChat('{"memory": "", "action": [{"click": {"index": "forty"}}]}', VALID)
+    llm = ChatLangchain(chat=fake, retry=RetryPolicy(base_delay=0.0, timeout=None))
+
+    _invoke(llm)
+
+    reprompt = fake.received[1]
+    assert len(reprompt) == len(fake.received[0]) + 2
+    assert reprompt[-2].content.startswith('{"memory": ""')
+    assert reprompt[-1].content.startswith('Your previous reply could not be used:')
+
+
+def test_request_errors_are_not_retried_and_open_breaker_fails_fast():
+    fake = FlakyChat(ServerError(400))
+    policy = RetryPolicy(base_delay=0.0, timeout=None, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60.0))
+    llm = ChatLangchain(chat=fake, retry=policy)
+
+    with pytest.raises(ModelProviderError):
+        _invoke(llm)
+    assert len(fake.received) == 1
+    assert policy.breaker.state == 'closed'
+
+    fake.script = [ServerError(503)] * 3
+    with pytest.raises(ModelProviderError):
+        _invoke(llm)
+    assert len(fake.received) == 2
+    assert policy.breaker.state == 'open'
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+from browser_use.llm.exceptions import ModelProviderError
+from browser_use.llm.views import ChatInvokeCompletion
+from pydantic import BaseModel
+
+from fix.metrics import ChatMetrics
+from fix.repair import OutputValidationError
+from fix.routing import ModelRouter
+from fix.trace import current_run
+from tests.messages import agent_output_type, browser_state, step_messages
+
+PAGE = ['[40]<button>Checkout</button>', '[41]<a>Cart</a>']
+CLICK = {'evaluation_previous_goal': 'Success - the cart is open.', 'memory': '', 'next_goal': 'Check out',
+         'action': [{'click': {'index': 40}}]}
+
+
+class Summary(BaseModel):
+    text: str
+
+
+class StubChat:
+    """Modelo browser-use falso: devolve as saídas de ``outputs`` em ordem (exceções são levantadas)."""
+
+    provider = 'stub'
+
+    def __init__(self, name: str, *outputs):
+        self.model = self.name = name
+        self.outputs = list(outputs)
+        self.calls = 0
+
+    async def ainvoke(self, messages, output_format=None, **kwargs):
+        self.calls += 1
+        output = self.outputs.pop(0) if len(self.outputs) > 1 else self.outputs[0]
+        if isinstance(output, Exception):
+            raise output
+        if output_format is not None and isinstance(output, dict):
+            output = output_format.model_validate(output)
+        return ChatInvokeCompletion(completion=output, usage=None)
+
+
+def _output(**changes):
+    return {**CLICK, **changes}
+
+
+def _step(router: ModelRouter, step: int = 1, elements=PAGE):
+    messages = step_messages(browser_state(elements, step=step))
+    return asyncio.run(router.ainvoke(messages, agent_output_type())).completion
+
+
+def _router(small: StubChat, **kwargs) -> tuple[ModelRouter, StubChat]:
+    large = StubChat('large', _output(next_goal='Large model step'))
+    return ModelRouter(small=small, large=large, **kwargs), large
+
+
+@pytest.fixture(autouse=True)
+def run_name():
+    token = current_run.set('checkout')
+    yield
+    current_run.reset(token)
+
+
+def test_confident_steps_stay_on_the_small_model():
+    router, large = _router(StubChat('small', _output()))
+
+    assert _step(router).next_goal == 'Check out'
+    assert _step(router, step=2).next_goal == 'Check out'
+    assert large.calls == 0
+    assert router.stats()['escalation_rate'] == 0.0
+
+
+@pytest.mark.parametrize(('error', 'reason'), [
+    (OutputValidationError('bad json', raw='{', error='Expecting value'), 'invalid'),
+    (ModelProviderError('Service Unavailable', status_code=503), 'unavailable'),
+    (ValueError('context length exceeded'), 'error'),
+])
+def test_failures_escalate_with_their_reason(error, reason):
+    router, large = _router(StubChat('small', error))
+
+    assert _step(router).next_goal == 'Large model step'
+    assert router.escalations == {reason: 1}
+
+
+def test_low_confidence_escalates():
+    missing_element = _output(action=[{'click': {'index': 99}}])
+    stuck = _output(evaluation_previous_goal='Failed - nothing happened.')
+    router, large = _router(StubChat('small', missing_element, stuck), sticky_steps=0)
+
+    _step(router)
+    _step(router, step=2)
+
+    assert large.calls == 2
+    assert router.escalations == {'low_confidence': 2}
+
+
+def test_done_and_the_last_step_go_to_the_large_model():
+    done = _output(action=[{'done': {'text': 'Bought.', 'success': True}}])
+    small = StubChat('small', done)
+    router, large = _router(small)
+
+    _step(router)
+    assert (small.calls, large.calls) == (1, 1)
+
+    _step(router, step=29)  # Step30 maximum:30
+    assert (small.calls, large.calls) == (1, 2)
+    assert router.escalations == {'final': 2}
+
+
+def test_escalation_sticks_for_the_run_then_de_escalates():
+    small = StubChat('small', OutputValidationError('bad json', raw='{', error='x'), _output())
+    router, large = _router(small, sticky_steps=2)
+
+    _step(router)
+    _step(router, step=2)
+    _step(router, step=3)
+    assert (small.calls, large.calls) == (1, 3)
+
+    _step(router, step=4)
+    assert (small.calls, large.calls) == (2, 3)
+
+
+def test_sticky_steps_are_per_run():
+    small = StubChat('small', OutputValidationError('bad json', raw='{', error='x'), _output())
+    router, large = _router(small, sticky_steps=1)
+
+    _step(router)
+    token = current_run.set('search')
+    try:
+        _step(router)
+    finally:
+        current_run.reset(token)
+
+    assert (small.calls, large.calls) == (2, 1)
+
+
+def test_calls_without_actions_always_use_the_small_model():
+    small = StubChat('small', Summary(text='ok'))
+    router, large = _router(small)
+
+    result = asyncio.run(router.ainvoke(step_messages(browser_state(PAGE)), Summary))
+
+    assert result.completion.text == 'ok'
+    assert large.calls == 0 and router.steps == 0
+
+
+def test_stats_report_rates_and_metrics_counters():
+    metrics = ChatMetrics()
+    small = StubChat('small', _output(), OutputValidationError('bad json', raw='{', error='x'), _output())
+    router, large = _router(small, sticky_steps=0, metrics=metrics)
+
+    for step in range(1, 5):
+        _step(router, step=step)
+
+    stats = router.stats()
+    assert {key: stats[key] for key in ('steps', 'small', 'large', 'escalations')} == {
+        'steps': 4, 'small': 3, 'large': 1, 'escalations': {'invalid': 1},
+    }
+    assert stats['escalation_rate'] == 0.25
+    assert stats['mean_step_seconds'] >= 0.0
+    assert metrics.events[('route_escalation_invalid', 'large')] == 1
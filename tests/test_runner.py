@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import runner
+from runner import BrowserPool
+
+SHOP = 'http://localhost:9990/en_US/cart'
+
+
+class StubSession:
+    """Sessão mantida viva com duas abas abertas, cookies e storage da loja."""
+
+    def __init__(self, started: bool = True, fail: bool = False):
+        self.pages = [
+            SimpleNamespace(target_id='T-8A1F', url=SHOP),
+            SimpleNamespace(target_id='T-C03E', url='https://payments.example.com:8443/checkout?id=1'),
+            SimpleNamespace(target_id='T-0001', url='chrome://newtab/'),
+        ] if started else []
+        self.fail = fail
+        self.closed: list[str] = []
+        self.cleared_origins: list[str] = []
+        self.cookies_cleared = False
+        self.navigated: list[str] = []
+        self.killed = False
+        storage = SimpleNamespace(clearDataForOrigin=self._clear_data_for_origin)
+        self.cdp_client = SimpleNamespace(send=SimpleNamespace(Storage=storage))
+
+    def get_page_targets(self):
+        return list(self.pages)
+
+    def get_focused_target(self):
+        return self.pages[1]
+
+    async def close_page(self, target_id):
+        self.closed.append(target_id)
+        self.pages = [page for page in self.pages if page.target_id != target_id]
+
+    async def _clear_data_for_origin(self, params):
+        assert params['storageTypes'] == 'all'
+        self.cleared_origins.append(params['origin'])
+
+    async def clear_cookies(self):
+        if self.fail:
+            raise ConnectionError('CDP socket closed')
+        self.cookies_cleared = True
+
+    async def navigate_to(self, url, new_tab=False):
+        self.navigated.append(url)
+
+    async def kill(self):
+        self.killed = True
+
+
+class StubPool(BrowserPool):
+    def _new_session(self):
+        return StubSession(started=False)
+
+
+def test_release_resets_tabs_cookies_and_storage():
+    pool = StubPool(size=1)
+    session = StubSession()
+
+    asyncio.run(pool.release(session))
+
+    assert session.closed == ['T-8A1F', 'T-0001']
+    assert [page.target_id for page in session.pages] == ['T-C03E']
+    assert sorted(session.cleared_origins) == ['http://localhost:9990', 'https://payments.example.com:8443']
+    assert session.cookies_cleared
+    assert session.navigated == ['about:blank']
+    assert not session.killed
+    assert pool._idle.get_nowait() is session
+
+
+def test_session_that_never_started_is_reused_as_is():
+    pool = StubPool(size=1)
+    session = StubSession(started=False)
+
+    asyncio.run(pool.release(session))
+
+    assert session.navigated == [] and not session.cookies_cleared
+    assert pool._idle.get_nowait() is session
+
+
+def test_failed_reset_replaces_the_session():
+    pool = StubPool(size=1)
+    session = StubSession(fail=True)
+
+    asyncio.run(pool.release(session))
+
+    assert session.killed
+    replacement = pool._idle.get_nowait()
+    assert replacement is not session and isinstance(replacement, StubSession)
+
+
+def test_origin_ignores_non_web_urls():
+    assert runner._origin('http://localhost:9990/en_US/') == 'http://localhost:9990'
+    assert runner._origin('about:blank') is None
+    assert runner._origin('chrome://newtab/') is None
@@ -0,0 +1,51 @@
+import pytest
+from browser_use.llm.messages import SystemMessage
+
+from fix.serializer import SERIALIZATION_CACHE_SIZE, LangChainMessageSerializer
+from tests.messages import browser_state, step_messages
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    LangChainMessageSerializer.clear_cache()
+    yield
+    LangChainMessageSerializer.clear_cache()
+
+
+def test_system_prompt_is_served_from_the_cache():
+    first = LangChainMessageSerializer.serialize_messages(step_messages(browser_state(['[40]<button>Checkout</button>'])))
+    second = LangChainMessageSerializer.serialize_messages(step_messages(browser_state(['[41]<button>Pay</button>'])))
+
+    assert second[0] is first[0]
+    assert second[1] is not first[1]
+    assert second[1].content != first[1].content
+
+
+def test_state_messages_and_screenshots_are_not_cached():
+    for step in range(10):
+        state = browser_state([f'[{step}]<button>Next</button>'], step=step)
+        LangChainMessageSerializer.serialize_messages(step_messages(state, screenshot=True))
+
+    assert len(LangChainMessageSerializer._cache) == 1
+
+
+def test_normalized_and_raw_system_prompts_are_cached_apart():
+    messages = [SystemMessage(content='    You are a browser automation agent.\n\n\n\n    Be brief.   ')]
+
+    raw = LangChainMessageSerializer.serialize_messages(messages)
+    normalized = LangChainMessageSerializer.serialize_messages(messages, normalize=True)
+
+    assert raw[0].content != normalized[0].content
+    assert normalized[0].content == 'You are a browser automation agent.\n\nBe brief.'
+    assert LangChainMessageSerializer.serialize_messages(messages, normalize=True)[0] is normalized[0]
+
+
+def test_cache_keeps_only_the_most_recent_system_prompts():
+    prompts = [SystemMessage(content=f'Agent {i}') for i in range(SERIALIZATION_CACHE_SIZE + 5)]
+    first = LangChainMessageSerializer.serialize_messages(prompts[:1])[0]
+    for prompt in prompts[1:]:
+        LangChainMessageSerializer.serialize_messages([prompt])
+
+    assert len(LangChainMessageSerializer._cache) == SERIALIZATION_CACHE_SIZE
+    assert LangChainMessageSerializer.serialize_messages(prompts[:1])[0] is not first
+    assert LangChainMessageSerializer.serialize_messages(prompts[-1:])[0].content == prompts[-1].content
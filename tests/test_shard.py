@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from runner import Scenario
+from shard import _isolate_outputs, claim, collect, enqueue, requeue, split
+
+SCENARIOS = [Scenario(name=f'scenario-{i:02d}', task=f'Task {i}') for i in range(11)]
+
+
+def _names(parts: list[list[Scenario]]) -> list[list[str]]:
+    return [[s.name for s in part] for part in parts]
+
+
+def test_round_robin_split_is_balanced_complete_and_deterministic():
+    parts = split(SCENARIOS, 4)
+
+    assert sorted(len(part) for part in parts) == [2, 3, 3, 3]
+    assert sorted(name for part in _names(parts) for name in part) == [s.name for s in SCENARIOS]
+    assert _names(split(list(reversed(SCENARIOS)), 4)) == _names(parts)
+
+
+def test_duration_split_places_the_longest_scenarios_first():
+    durations = {'scenario-00': 100.0, 'scenario-01': 60.0, 'scenario-02': 50.0, 'scenario-03': 10.0}
+
+    parts = split(SCENARIOS[:5], 2, durations)
+
+    # scenario-04 não tem duração gravada e conta como a média (55s)
+    assert _names(parts) == [['scenario-00', 'scenario-02'], ['scenario-01', 'scenario-04', 'scenario-03']]
+
+
+def test_queue_hands_each_scenario_out_once_in_suite_order(tmp_path):
+    queue = str(tmp_path)
+    enqueue(queue, SCENARIOS[:3])
+
+    claimed = [claim(queue), claim(queue), claim(queue)]
+
+    assert claim(queue) is None
+    assert [json.loads(f.read_text())['name'] for f in claimed] == ['scenario-00', 'scenario-01', 'scenario-02']
+    assert collect(queue) == ([], 3)
+
+
+def test_requeue_returns_stale_claims_without_results(tmp_path):
+    queue = str(tmp_path)
+    enqueue(queue, SCENARIOS[:2])
+    stale, finished = claim(queue), claim(queue)
+    old = time.time() - 3600
+    os.utime(stale, (old, old))
+    os.utime(finished, (old, old))
+    (tmp_path / 'results' / finished.name).write_text(json.dumps({'name': 'scenario-01'}))
+
+    assert requeue(queue, older_than=600) == 1
+    assert (tmp_path / 'pending' / stale.name).exists()
+
+
+def test_outputs_get_a_per_process_suffix(monkeypatch):
+    monkeypatch.setenv('LLM_TRACE_PATH', '.llm_traces/trace.jsonl.gz')
+    monkeypatch.setenv('LLM_METRICS_DIR', '.llm_metrics')
+
+    _isolate_outputs('shard-1')
+
+    assert os.environ['LLM_TRACE_PATH'] == os.path.join('.llm_traces', 'trace.shard-1.jsonl.gz')
+    assert os.environ['LLM_METRICS_DIR'] == os.path.join('.llm_metrics', 'shard-1')
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from langchain_core.messages import AIMessageChunk
+
+from fix.chat import ChatLangchain
+from fix.profiles import ModelProfile
+from fix.streaming import IncrementalJSONParser
+from tests.messages import agent_output_type, browser_state, step_messages
+
+OUTPUT = {
+    'evaluation_previous_goal': 'Success - cart page "Your cart" {open}.',
+    'memory': 'Path C:\\shop\\cart',
+    'next_goal': 'Check out.',
+    'action': [{'click': {'index': 40}}],
+}
+STREAMED = '```json\n' + json.dumps(OUTPUT) + '\n```\nI will now click the Checkout button.'
+
+
+def _chunks(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_parser_returns_the_object_as_soon_as_it_closes():
+    for size in (1, 2, 3, 7, len(STREAMED)):
+        parser = IncrementalJSONParser()
+        results = [parser.feed(chunk) for chunk in _chunks(STREAMED, size)]
+        closed = [r for r in results if r is not None]
+
+        assert len(closed) == 1, size
+        assert json.loads(closed[0]) == OUTPUT
+        assert parser.done
+
+
+def test_parser_without_closing_brace_keeps_the_raw_text():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"memory": "trunc') is None
+    assert parser.raw == '{"memory": "trunc'
+    assert not parser.done
+
+
+class StreamingChat:
+    model_name = 'qwen3-coder:30b'
+
+    def __init__(self, chunks: list[AIMessageChunk]):
+        self.chunks = chunks
+
+    async def astream(self, messages, **kwargs):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_streamed_call_parses_early_and_collects_usage_from_the_last_chunk():
+    text_chunks = [AIMessageChunk(content=part) for part in _chunks(STREAMED, 16)]
+    usage = AIMessageChunk(content='', usage_metadata={'input_tokens': 900, 'output_tokens': 60, 'total_tokens': 960})
+    fake = StreamingChat([*text_chunks, usage])
+    profile = ModelProfile(name='stream', structured_output='text', stream=True)
+    llm = ChatLangchain(chat=fake, profile=profile)
+
+    result = asyncio.run(llm.ainvoke(step_messages(browser_state(['[40]<button>Checkout</button>'])), agent_output_type()))
+
+    assert result.completion.model_dump(exclude_unset=True)['action'] == [{'click': {'index': 40}}]
+    assert result.usage.prompt_tokens == 900
+    assert result.usage.total_tokens == 960
@@ -0,0 +1,102 @@
+import asyncio
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+
+from bench.fake_server import load_responses
+from fix.serializer import LangChainMessageSerializer
+from fix.trace import TraceWriter, current_run
+from tests.messages import agent_output_type, browser_state, step_messages
+
+RAW = '```json\n{"memory": "", "next_goal": "Check out", "action": [{"click": {"element": 40}}]}\n```'
+OUTPUT = {'evaluation_previous_goal': 'ok', 'memory': '', 'next_goal': 'Check out', 'action': [{'click': {'index': 40}}]}
+USAGE = ChatInvokeUsage(
+    prompt_tokens=900, completion_tokens=60, total_tokens=960,
+    prompt_cached_tokens=None, prompt_cache_creation_tokens=None, prompt_image_tokens=None,
+)
+
+
+def _completion():
+    return ChatInvokeCompletion(completion=agent_output_type().model_validate(OUTPUT), usage=USAGE)
+
+
+def _read(path) -> list[dict]:
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def _agent(url: str, step: int):
+    """Agente falso com um único passo no histórico, no formato do AgentHistory do browser-use."""
+    item = SimpleNamespace(
+        model_output=agent_output_type().model_validate(OUTPUT),
+        metadata=SimpleNamespace(step_number=step, duration_seconds=1.23456),
+        state=SimpleNamespace(url=url),
+        result=[SimpleNamespace(error=None, is_done=False)],
+    )
+    return SimpleNamespace(history=SimpleNamespace(history=[item]))
+
+
+def _run(trace: TraceWriter, name: str, raw: str) -> None:
+    async def scenario():
+        current_run.set(name)
+        trace.record_call('qwen3-coder', [], _completion(), 1.5, details={'raw': raw, 'repairs': ['element->index']})
+        trace.record_error('qwen3-coder', 0.25, TimeoutError('read timed out'))
+        await trace.record_step(_agent('http://localhost:9990/en_US/cart', 3))
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('name', ['trace.jsonl', 'trace.jsonl.gz'])
+def test_trace_round_trips_through_the_fake_server(tmp_path, name):
+    path = tmp_path / name
+    # Duas execuções do runner anexando ao mesmo arquivo (no gzip, dois membros)
+    for run, raw in (('checkout', RAW), ('search', RAW.replace('40', '41'))):
+        trace = TraceWriter(path, flush_every=1)
+        _run(trace, run, raw)
+        trace.close()
+
+    records = _read(path)
+    assert [(r['kind'], r['run'], r.get('path')) for r in records] == [
+        ('llm', 'checkout', 'model'), ('llm', 'checkout', 'error'), ('step', 'checkout', None),
+        ('llm', 'search', 'model'), ('llm', 'search', 'error'), ('step', 'search', None),
+    ]
+    assert records[0]['action'] == [{'click': {'index': 40}}]
+    assert (records[0]['prompt_tokens'], records[0]['repairs']) == (900, ['element->index'])
+    assert records[1]['error'] == 'TimeoutError: read timed out'
+    assert records[2]['step'] == 3 and records[2]['duration'] == 1.2346 and not records[2]['done']
+    assert load_responses([str(path)]) == [RAW, RAW.replace('40', '41')]
+
+
+def test_compression_follows_the_suffix_unless_forced(tmp_path):
+    for name, compress, gzipped in (('a.jsonl', None, False), ('b.jsonl.gz', None, True), ('c.jsonl', True, True)):
+        trace = TraceWriter(tmp_path / name, compress=compress)
+        trace.write('llm', raw=RAW)
+        trace.close()
+        assert ((tmp_path / name).read_bytes()[:2] == b'\x1f\x8b') is gzipped
+
+
+def test_run_is_none_outside_a_scenario(tmp_path):
+    trace = TraceWriter(tmp_path / 'trace.jsonl')
+    trace.write('llm', raw=RAW)
+    trace.close()
+
+    assert _read(tmp_path / 'trace.jsonl')[0]['run'] is None
+
+
+def test_prompts_are_recorded_only_when_asked(tmp_path):
+    messages = LangChainMessageSerializer.serialize_messages(
+        step_messages(browser_state(['[40]<button>Checkout</button>']), screenshot=True)
+    )
+    for include_prompts in (False, True):
+        trace = TraceWriter(tmp_path / f'{include_prompts}.jsonl', include_prompts=include_prompts)
+        trace.record_call('qwen3-vl', messages, _completion(), 1.0)
+        trace.close()
+
+    assert 'prompt' not in _read(tmp_path / 'False.jsonl')[0]
+    prompt = _read(tmp_path / 'True.jsonl')[0]['prompt']
+    assert [p['role'] for p in prompt] == ['system', 'human']
+    assert prompt[1]['text'].endswith('Current screenshot:\n[image_url]')
@@ -0,0 +1,90 @@
+import base64
+import io
+
+from browser_use.llm.messages import ContentPartImageParam, ContentPartTextParam, ImageURL, UserMessage
+from PIL import Image
+
+from fix.vision import VisionBudget
+from tests.messages import PIXEL, browser_state, step_messages
+
+
+def _png(width: int, height: int, seed: int = 0) -> str:
+    image = Image.effect_noise((width, height), 64 + seed).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def _image(url: str) -> ContentPartImageParam:
+    return ContentPartImageParam(image_url=ImageURL(url=url, media_type='image/png'))
+
+
+def _screenshot_step(url: str, label: str = 'Current screenshot:') -> UserMessage:
+    return UserMessage(content=[ContentPartTextParam(text='state'), ContentPartTextParam(text=label), _image(url)])
+
+
+def _parts(message: UserMessage) -> list[str]:
+    return [part.text if part.type == 'text' else part.image_url.url for part in message.content]
+
+
+def _frame(i: int) -> str:
+    return f'data:image/png;base64,{PIXEL}#{i}'
+
+
+def test_only_the_most_recent_screenshots_are_kept():
+    messages = [_screenshot_step(_frame(i)) for i in range(4)]
+
+    result = VisionBudget(max_images=2).apply(messages)
+
+    assert [_parts(m)[2] for m in result] == [
+        '[older screenshot omitted]', '[older screenshot omitted]', _frame(2), _frame(3),
+    ]
+
+
+def test_identical_frames_keep_only_the_latest_copy():
+    messages = [_screenshot_step(_frame(0)), _screenshot_step(_frame(1)), _screenshot_step(_frame(1))]
+
+    result = VisionBudget(max_images=2).apply(messages)
+
+    assert [_parts(m)[2] for m in result] == [
+        _frame(0), '[screenshot omitted: identical to a later one]', _frame(1),
+    ]
+    assert [_parts(m)[2] for m in VisionBudget(max_images=2, dedupe=False).apply(messages)] == [
+        '[older screenshot omitted]', _frame(1), _frame(1),
+    ]
+
+
+def test_images_without_a_screenshot_label_pass_untouched():
+    sample = UserMessage(content=[ContentPartTextParam(text='Example of the page:'), _image(_frame(9))])
+    text_only = step_messages(browser_state(['[1]<a>Home</a>']))
+    messages = [*text_only, sample, _screenshot_step(_frame(0)), _screenshot_step(_frame(1))]
+
+    result = VisionBudget(max_images=1).apply(messages)
+
+    assert result[:3] == messages[:3]
+    assert result[0] is messages[0] and result[2] is sample
+    assert _parts(result[3])[2] == '[older screenshot omitted]'
+
+
+def test_large_screenshots_are_downscaled_to_jpeg_once():
+    original = _png(1024, 512)
+    budget = VisionBudget(max_side=256, detail='low')
+
+    first = budget.apply([_screenshot_step(original, 'Previous screenshot:')])[0].content[2]
+    second = budget.apply([_screenshot_step(original)])[0].content[2]
+
+    assert first.image_url.url.startswith('data:image/jpeg;base64,')
+    assert first.image_url.media_type == 'image/jpeg' and first.image_url.detail == 'low'
+    assert len(first.image_url.url) < len(original)
+    image = Image.open(io.BytesIO(base64.b64decode(first.image_url.url.partition(',')[2])))
+    assert image.size == (256, 128)
+    assert second.image_url.url is first.image_url.url
+
+
+def test_screenshot_is_sent_as_is_when_jpeg_would_be_larger():
+    url = f'data:image/png;base64,{PIXEL}'
+
+    part = VisionBudget().apply([_screenshot_step(url)])[0].content[2]
+
+    assert part.image_url.url == url
+    assert part.image_url.media_type == 'image/png'